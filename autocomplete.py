@@ -0,0 +1,152 @@
+"""As-you-type completion of the input field from the prompts and past questions.
+
+PrefixIndex keeps every question once, under its case-folded text, in a
+sorted list, so the questions starting with what has been typed are one
+contiguous range found by bisection. A sparse table over the times each was
+asked gives the most asked question of any range in two lookups, and the top
+k come from splitting the range around each pick, so a keystroke costs about
+2k lookups however many questions share the prefix.
+
+The table isn't updated in place; questions asked after it was built are
+kept apart and merged into each lookup.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import heappop, heappush
+
+from PySide6.QtCore import QStringListModel, Qt
+from PySide6.QtWidgets import QCompleter
+
+MAX_CHAR = '\U0010ffff'  # Sorts after every character a key can continue with
+MIN_PREFIX_CHARS = 2
+MAX_QUESTION_CHARS = 200  # Longer questions are pasted, not typed again
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def normalize_prefix(text):
+    """normalize(), keeping one trailing space so a finished word only matches whole"""
+    key = normalize(text)
+    return key + ' ' if key and text[-1].isspace() else key
+
+
+class PrefixIndex:
+    """Questions ranked by the times they were asked, looked up by prefix"""
+
+    def __init__(self, questions=()):
+        """questions: (text, times asked) pairs; a later spelling of a question is the one shown"""
+        merged = {}
+        for text, count in questions:
+            key = normalize(text)
+            if key:
+                previous = merged.get(key)
+                merged[key] = (text.strip(), count + (previous[1] if previous else 0))
+        self.keys = sorted(merged)
+        self.texts = [merged[key][0] for key in self.keys]
+        self.counts = array('l', [merged[key][1] for key in self.keys])
+        # levels[j][i] is the position of the most asked key in [i, i + 2**j)
+        self.levels = [array('l', range(len(self.keys)))]
+        width = 1
+        while width * 2 <= len(self.keys):
+            previous = self.levels[-1]
+            counts = self.counts
+            self.levels.append(array('l', [a if counts[a] >= counts[b] else b
+                                            for a, b in zip(previous, previous[width:])]))
+            width *= 2
+        self.added = Counter()  # Key -> times asked since the index was built
+        self.added_texts = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, text):
+        key = normalize(text)
+        if key and len(text) <= MAX_QUESTION_CHARS and '\n' not in text:
+            self.added[key] += 1
+            self.added_texts[key] = text.strip()
+
+    def best(self, lo, hi):
+        """Position of the most asked key in [lo, hi); ties go to the first"""
+        level = (hi - lo).bit_length() - 1
+        table = self.levels[level]
+        a, b = table[lo], table[hi - (1 << level)]
+        return a if self.counts[a] >= self.counts[b] else b
+
+    def top(self, prefix, k):
+        """Positions of the k most asked keys starting with prefix, most asked first"""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + MAX_CHAR, lo)
+        if lo >= hi or k <= 0:
+            return []
+        counts = self.counts
+        position = self.best(lo, hi)
+        heap = [(-counts[position], position, lo, hi)]
+        found = []
+        while heap and len(found) < k:
+            _, position, lo, hi = heappop(heap)
+            found.append(position)
+            for start, end in ((lo, position), (position + 1, hi)):
+                if start < end:
+                    best = self.best(start, end)
+                    heappush(heap, (-counts[best], best, start, end))
+        return found
+
+    def count(self, key):
+        position = bisect_left(self.keys, key)
+        found = position < len(self.keys) and self.keys[position] == key
+        return (self.counts[position] if found else 0) + self.added[key]
+
+    def complete(self, prefix, k):
+        """Up to k questions that continue the normalized prefix, most asked first"""
+        added = [key for key in self.added if key.startswith(prefix)]
+        counts = {}
+        # Enough from the table that the added questions can't push out one that belongs
+        for position in self.top(prefix, k + len(added) + 1):
+            counts[self.keys[position]] = self.counts[position]
+        for key in added:
+            counts[key] = self.count(key)
+        counts.pop(prefix.rstrip(), None)  # Already typed in full
+        ranked = sorted(counts, key=lambda key: (-counts[key], key))[:k]
+        return [self.added_texts.get(key) or self.texts[bisect_left(self.keys, key)]
+                for key in ranked]
+
+    def adopt_added(self, other):
+        """Carry over the questions asked since other was built"""
+        self.added.update(other.added)
+        self.added_texts.update(other.added_texts)
+
+
+class InputCompleter(QCompleter):
+    """Popup of PrefixIndex completions under a QLineEdit, refreshed on every edit"""
+
+    def __init__(self, line_edit, items=8):
+        super().__init__(line_edit)
+        self.items = items
+        self.index = PrefixIndex()  # Replaced by the full index once it's built
+        self.completions = QStringListModel(self)
+        self.setModel(self.completions)
+        # The list is already ranked and filtered; QCompleter only shows it
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        self.setMaxVisibleItems(items)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_completions)
+
+    def set_index(self, index):
+        index.adopt_added(self.index)
+        self.index = index
+
+    def add(self, text):
+        self.index.add(text)
+
+    def update_completions(self, text):
+        prefix = normalize_prefix(text)
+        completions = self.index.complete(prefix, self.items) if len(prefix) >= MIN_PREFIX_CHARS else []
+        self.completions.setStringList(completions)
+        if completions:
+            self.complete()
+        else:
+            self.popup().hide()
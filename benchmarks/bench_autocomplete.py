@@ -0,0 +1,121 @@
+"""Input completion latency per keystroke with a 100k-question history.
+
+Builds a PrefixIndex from linux_prompts.txt and --questions synthetic past
+questions, asked a Zipf-distributed number of times, then types --typed of
+them a character at a time and times every lookup:
+
+- scan: filtering every question by prefix and sorting the matches by count,
+  what a plain list would need
+- index: PrefixIndex.complete()
+- keystroke: InputCompleter.update_completions() on an offscreen QLineEdit,
+  the lookup plus refilling the popup's model and showing it
+
+    python benchmarks/bench_autocomplete.py --questions 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import config  # noqa: E402
+from autocomplete import MIN_PREFIX_CHARS, PrefixIndex, normalize, normalize_prefix  # noqa: E402
+
+STARTS = ("how do I", "how to", "what is", "why does", "show me how to", "can I",
+          "explain", "what does", "how can I", "is there a way to")
+VERBS = ("list", "find", "delete", "compress", "mount", "kill", "restart", "copy",
+         "watch", "check", "change", "search", "monitor", "install", "configure")
+OBJECTS = ("files", "hidden files", "a process", "the service", "disk usage", "a usb drive",
+           "permissions", "open ports", "the firewall", "log files", "a symlink", "the kernel",
+           "environment variables", "cron jobs", "a user", "ssh keys", "network interfaces")
+TAILS = ("", "recursively", "by name", "in the background", "older than a week",
+         "without sudo", "on boot", "over ssh", "in bash", "with find", "by size")
+
+
+def synthetic_questions(count, seed=0):
+    """count distinct questions with Zipf-distributed times asked"""
+    rng = random.Random(seed)
+    seen = set()
+    questions = []
+    while len(questions) < count:
+        text = ' '.join(filter(None, (rng.choice(STARTS), rng.choice(VERBS), rng.choice(OBJECTS),
+                                      rng.choice(TAILS), f"#{rng.randrange(10 ** 6)}"
+                                      if rng.random() < 0.9 else "")))
+        if text not in seen:
+            seen.add(text)
+            questions.append((text, min(int(rng.paretovariate(1.2)), 1000)))
+    return questions
+
+
+def scan(questions, prefix, k):
+    matches = [(count, key) for key, count in questions if key.startswith(prefix)]
+    matches.sort(key=lambda match: (-match[0], match[1]))
+    return matches[:k]
+
+
+def keystrokes(questions, typed, seed=1):
+    """Every prefix of typed random questions, as completion sees them"""
+    rng = random.Random(seed)
+    prefixes = []
+    for text, _count in rng.sample(questions, typed):
+        prefixes.extend(text[:end] for end in range(MIN_PREFIX_CHARS, len(text) + 1))
+    return prefixes
+
+
+def timed(function, prefixes):
+    times = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        function(prefix)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def report(name, times):
+    print(f"  {name:<10} median {statistics.median(times) * 1e6:8.1f} us   "
+          f"p99 {times[int(len(times) * 0.99)] * 1e6:8.1f} us   max {times[-1] * 1e6:8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--typed', type=int, default=200, help="questions typed out")
+    parser.add_argument('-k', type=int, default=8)
+    parser.add_argument('--scan-keystrokes', type=int, default=300,
+                        help="keystrokes timed for the slow scan")
+    args = parser.parse_args()
+
+    questions = [(prompt, 0) for prompt in config.load_prompts()]
+    questions.extend(synthetic_questions(args.questions))
+    start = time.perf_counter()
+    index = PrefixIndex(questions)
+    print(f"{len(index)} questions indexed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    prefixes = keystrokes(questions, args.typed)
+    print(f"{len(prefixes)} keystrokes, top {args.k}:")
+    normalized = [(normalize(text), count) for text, count in questions]
+    report("scan", timed(lambda prefix: scan(normalized, normalize_prefix(prefix), args.k),
+                         prefixes[:args.scan_keystrokes]))
+    report("index", timed(lambda prefix: index.complete(normalize_prefix(prefix), args.k),
+                          prefixes))
+
+    from PySide6.QtWidgets import QApplication, QLineEdit
+    from autocomplete import InputCompleter
+    app = QApplication([])
+    line_edit = QLineEdit()
+    line_edit.resize(600, 30)
+    line_edit.show()
+    completer = InputCompleter(line_edit, args.k)
+    completer.set_index(index)
+    app.processEvents()
+    report("keystroke", timed(completer.update_completions, prefixes))
+    completer.popup().hide()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""End-to-end streaming benchmark: MainWindow offscreen against the mock server.
+
+Starts benchmarks/mock_ollama.py in a separate process, opens MainWindow with
+QT_QPA_PLATFORM=offscreen and a throwaway home directory, sends --messages
+questions through the input field and waits for each answer. Reports:
+
+- time to first paint of the window, and of each answer's first token
+- UI frame stalls: gaps in a 16 ms timer on the GUI thread while streaming
+- render cost per token: stream handling (Markdown + item update) and painting
+- resident memory after startup and after every message
+
+    python benchmarks/bench_e2e.py --messages 50 --tokens 400 --token-rate 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FRAME_MS = 16
+
+
+def start_mock(args):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_ollama.py'), '--port', '0',
+         '--tokens', str(args.tokens), '--token-rate', str(args.token_rate),
+         '--first-token-delay', str(args.first_token_delay)],
+        stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if 'listening on' not in line:
+        process.kill()
+        raise RuntimeError("mock server did not start")
+    return process, line.split()[-1]
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--tokens', type=int, default=400, help="tokens per answer")
+    parser.add_argument('--token-rate', type=float, default=200.0,
+                        help="tokens per second from the mock; 0 for as fast as possible")
+    parser.add_argument('--first-token-delay', type=float, default=0.05)
+    parser.add_argument('--stall-ms', type=float, default=50.0,
+                        help="timer gap counted as a stall")
+    args = parser.parse_args()
+
+    mock, url = start_mock(args)
+    home = tempfile.TemporaryDirectory()
+    # Settings, history and caches all live under the throwaway home
+    os.environ['HOME'] = home.name
+    os.environ['XDG_CONFIG_HOME'] = os.path.join(home.name, '.config')
+    os.environ['OLLAMA_HOST'] = url
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    with open(os.path.join(home.name, '.ollama_chat_settings.json'), 'w') as f:
+        # Every question must reach the server, so the answer caches are off; so is
+        # retrieval, whose first index build would run during the measurement
+        json.dump({'default_model': 'mock:latest', 'response_cache': False,
+                   'pregenerated_answers': False, 'retrieval': False}, f)
+
+    try:
+        run(args)
+    finally:
+        mock.terminate()
+        mock.wait()
+        home.cleanup()
+
+
+def run(args):
+    started = time.perf_counter()
+    from PySide6.QtCore import QEvent, QObject, QTimer
+    from PySide6.QtWidgets import QApplication
+    app = QApplication([])
+    import main as app_main
+
+    class FirstPaint(QObject):
+        def __init__(self):
+            super().__init__()
+            self.at = None
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and self.at is None:
+                self.at = time.perf_counter()
+            return False
+
+    window = app_main.MainWindow()
+    window.resize(700, 900)
+    first_paint = FirstPaint()
+    window.input_field.installEventFilter(first_paint)
+    window.show()
+
+    def pump_until(condition, timeout=60):
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > deadline:
+                raise RuntimeError("timed out waiting for the app")
+            app.processEvents()
+            time.sleep(0.001)
+
+    pump_until(lambda: first_paint.at is not None)
+    pump_until(lambda: window.deferred_widgets_built and window.model_selector.count())
+    print(f"time to first paint: {(first_paint.at - started) * 1000:.0f} ms "
+          f"(including importing main)")
+    startup_rss = rss_mb()
+
+    # Timer ticks on the GUI thread; a late tick means the event loop was blocked
+    ticks = []
+    ticker = QTimer()
+    ticker.setInterval(FRAME_MS)
+    ticker.timeout.connect(lambda: ticks.append(time.perf_counter()))
+
+    view = window.transcript_view
+    paint_times = []
+    paint_event = view.paintEvent
+
+    def timed_paint(event):
+        start = time.perf_counter()
+        paint_event(event)
+        paint_times.append(time.perf_counter() - start)
+        if waiting['item'] is not None and waiting['item'].text:
+            waiting['painted'] = time.perf_counter()
+            waiting['item'] = None
+    view.paintEvent = timed_paint
+    waiting = {'item': None, 'painted': None}
+
+    first_token_paint, first_token_server = [], []
+    render_per_token, paint_per_token, gaps = [], [], []
+    memory = []
+    ticker.start()
+    for number in range(args.messages):
+        window.input_field.setText(f"Question {number}: how do I check disk usage?")
+        sent = time.perf_counter()
+        window.send_message()
+        generation = window.generations[-1]
+        waiting['item'] = generation.item
+        waiting['painted'] = None
+        ticks.clear()
+        paints_before = len(paint_times)
+        pump_until(lambda: not window.is_generating)
+        app.processEvents()
+
+        worker = generation.worker
+        if waiting['painted'] is not None:
+            first_token_paint.append(waiting['painted'] - sent)
+        if worker.first_token_at is not None:
+            first_token_server.append(worker.first_token_at - worker.request_started_at)
+        tokens = generation.stats.eval_count if generation.stats else args.tokens
+        render_per_token.append(sum(generation.render_scheduler.render_times) / tokens)
+        paint_per_token.append(sum(paint_times[paints_before:]) / tokens)
+        gaps.extend((b - a) * 1000 - FRAME_MS for a, b in zip(ticks, ticks[1:]))
+        memory.append(rss_mb())
+    ticker.stop()
+
+    stalls = [gap for gap in gaps if gap > args.stall_ms]
+    print(f"messages: {args.messages} × {args.tokens} tokens at "
+          f"{args.token_rate or 'unlimited'} tok/s")
+    print(f"first token painted after send: median {statistics.median(first_token_paint) * 1000:.1f} ms"
+          f", p95 {percentile(first_token_paint, 95) * 1000:.1f} ms"
+          f" (received after {statistics.median(first_token_server) * 1000:.1f} ms)")
+    print(f"frame stalls over {args.stall_ms:.0f} ms: {len(stalls)} of {len(gaps)} frames"
+          f", worst extra delay {max(gaps, default=0):.1f} ms"
+          f", p99 {percentile(gaps, 99):.1f} ms")
+    print(f"render cost per token: stream handling {statistics.median(render_per_token) * 1e6:.1f} µs"
+          f", painting {statistics.median(paint_per_token) * 1e6:.1f} µs (medians)")
+    print(f"  first message {render_per_token[0] * 1e6:.1f} µs, "
+          f"last {render_per_token[-1] * 1e6:.1f} µs stream handling")
+    print(f"memory: {startup_rss:.0f} MB after startup, {memory[-1]:.0f} MB after "
+          f"{args.messages} messages ({(memory[-1] - startup_rss) / args.messages * 1024:.0f} kB"
+          f" per message)")
+    window.cleanup()
+
+
+if __name__ == '__main__':
+    main()
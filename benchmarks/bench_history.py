@@ -0,0 +1,92 @@
+"""Time reopening a long conversation from the history store.
+
+Writes a conversation of --messages messages to a temporary database through
+ConversationStore, then measures what startup does with it: opening the store,
+finding the latest conversation, loading the last page and laying it out in
+the transcript view.
+
+    python benchmarks/bench_history.py --messages 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from chat_engine import TurnStats, turns_from_messages  # noqa: E402
+from conversation_store import ConversationStore  # noqa: E402
+
+ANSWER = ("Use `df -h` to see free space per mounted file system and `du -sh *` to find "
+          "what uses it.\n\n```bash\ndf -h\ndu -sh /var/log/*\n```\n\n"
+          "1. **Check** the largest directories first.\n2. **Rotate** old logs.\n")
+
+
+def fill(store, messages):
+    conversation_id = store.new_conversation_id()
+    stats = TurnStats({'eval_count': 120, 'eval_duration': 2 * 10 ** 9})
+    start = time.perf_counter()
+    for turn in range(1, messages // 2 + 1):
+        store.add_message(conversation_id, turn, 'user', f"Question {turn}: how do I free disk space?")
+        store.add_message(conversation_id, turn, 'assistant', ANSWER, 'bench', stats)
+    queued = time.perf_counter() - start
+    store.flush()
+    return queued, time.perf_counter() - start
+
+
+def reopen(path, page_size, view):
+    from transcript import MessageItem
+    start = time.perf_counter()
+    store = ConversationStore(path)
+    conversation_id = store.latest_conversation()
+    messages = store.load_messages(conversation_id, limit=page_size)
+    loaded = time.perf_counter()
+    items = []
+    for turn in turns_from_messages(messages):
+        items.append(MessageItem('user', turn.prompt))
+        items.append(MessageItem('ai', turn.response, turn=turn, markdown=True))
+    view.clear()
+    view.prepend(items)
+    view.repaint()
+    done = time.perf_counter()
+    store.close()
+    return loaded - start, done - start, len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    from PySide6.QtWidgets import QApplication
+    from transcript import TranscriptView
+    app = QApplication([])
+    view = TranscriptView()
+    view.resize(600, 900)
+    view.show()
+    app.processEvents()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'history.db')
+        store = ConversationStore(path)
+        queued, written = fill(store, args.messages)
+        store.close()
+        print(f"write {args.messages} messages: queued in {queued * 1000:.0f} ms, "
+              f"committed in {written * 1000:.0f} ms")
+
+        load_times, total_times = [], []
+        for _ in range(args.runs):
+            load_time, total_time, count = reopen(path, args.page_size, view)
+            load_times.append(load_time)
+            total_times.append(total_time)
+        print(f"reopen: {count} messages loaded in {statistics.median(load_times) * 1000:.1f} ms, "
+              f"shown in {statistics.median(total_times) * 1000:.1f} ms (median of {args.runs})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Compare full Markdown re-rendering with IncrementalMarkdownRenderer.
+
+Replays a synthetic token stream shaped like a Linux-admin answer (paragraphs,
+numbered lists and fenced shell snippets) and times the work done per token
+by each strategy.
+
+    python benchmarks/bench_markdown.py --tokens 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_renderer import IncrementalMarkdownRenderer, render_markdown  # noqa: E402
+
+WORDS = ("the file system process kernel user group permission network "
+         "interface service daemon package command option directory socket "
+         "memory disk partition mount log journal").split()
+COMMANDS = ["df -h", "du -sh /var/log/*", "ss -tulpn", "journalctl -u sshd --since today",
+            "chmod 640 /etc/shadow", "find / -xdev -size +100M", "systemctl status nginx"]
+
+
+def synthetic_tokens(count, seed=0):
+    """Yield roughly count tokens of Markdown in the shape the model produces"""
+    rng = random.Random(seed)
+    produced = 0
+    while produced < count:
+        kind = rng.random()
+        if kind < 0.5:
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))) + '.\n\n'
+        elif kind < 0.8:
+            text = ''.join(f"{i}. **{rng.choice(WORDS)}** {' '.join(rng.choice(WORDS) for _ in range(8))}\n"
+                           for i in range(1, rng.randint(3, 6))) + '\n'
+        else:
+            text = '```bash\n' + '\n'.join(rng.choice(COMMANDS) for _ in range(rng.randint(1, 4))) + '\n```\n\n'
+        # Split roughly the way a tokenizer would: words keep their leading space
+        for token in text.replace(' ', '\x00 ').replace('\n', '\x00\n').split('\x00'):
+            if token:
+                produced += 1
+                yield token
+                if produced >= count:
+                    return
+
+
+def bench_full(tokens, stride):
+    text = ''
+    elapsed = 0.0
+    renders = 0
+    for i, token in enumerate(tokens):
+        text += token
+        if i % stride == 0:
+            start = time.perf_counter()
+            render_markdown(text)
+            elapsed += time.perf_counter() - start
+            renders += 1
+    # Each sampled render stands in for `stride` renders of similar size
+    return elapsed * stride, renders, render_markdown(text)
+
+
+def bench_incremental(tokens):
+    renderer = IncrementalMarkdownRenderer()
+    start = time.perf_counter()
+    for token in tokens:
+        renderer.append(token)
+        renderer.html()
+    return time.perf_counter() - start, renderer.html()
+
+
+def normalized(html):
+    return ''.join(html.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=10000)
+    parser.add_argument('--stride', type=int, default=20,
+                        help="time only every Nth full re-render and extrapolate (1 = exact)")
+    args = parser.parse_args()
+
+    tokens = list(synthetic_tokens(args.tokens))
+    chars = sum(len(t) for t in tokens)
+    print(f"stream: {len(tokens)} tokens, {chars} chars")
+
+    full_time, samples, full_html = bench_full(tokens, args.stride)
+    inc_time, inc_html = bench_incremental(tokens)
+    label = "full re-render" + (f" (est. from {samples} samples)" if args.stride > 1 else "")
+    print(f"{label:<40} {full_time:9.3f} s  {full_time / len(tokens) * 1000:8.3f} ms/token")
+    print(f"{'incremental':<40} {inc_time:9.3f} s  {inc_time / len(tokens) * 1000:8.3f} ms/token")
+    print(f"speedup: {full_time / inc_time:.1f}x")
+    print("output identical (ignoring whitespace):", normalized(full_html) == normalized(inc_html))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Query latency of the local documentation index at about 50k passages.
+
+Builds a DocumentIndex in a temporary directory from --passages synthetic
+passages. The words follow a Zipf distribution over a 30k-word vocabulary,
+and the embeddings are --dimensions wide, drawn around 300 cluster centers
+the way real embeddings bunch by topic. It then reports, per search:
+
+- bm25: the inverted index, plus fetching the passages from SQLite
+- vectors: the reduced-dimension scan, the rerank on full vectors and the
+  fetch; the request that embeds the query is not included
+- vector recall: how many of the exact top-k the two-step search finds
+
+With --real the man pages and /usr/share/doc of this machine are indexed
+instead (BM25 only), reusing the index between runs.
+
+    python benchmarks/bench_retrieval.py --passages 50000 --queries 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+import retrieval  # noqa: E402
+
+REAL_QUERIES = ("how do I list hidden files", "extract a tar.gz archive",
+                "change file permissions recursively", "show disk usage of a directory",
+                "grep recursive ignore case", "restart a systemd service",
+                "find files modified in the last day", "add a user to a group",
+                "mount a usb drive", "kill a process by name")
+
+
+class SyntheticEmbeddings:
+    """Stands in for the client during indexing; the vector depends on the passage number"""
+
+    def __init__(self, dimensions, clusters=300, seed=0):
+        rng = np.random.default_rng(seed)
+        self.dimensions = dimensions
+        self.centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+        self.rng = rng
+
+    def vector(self):
+        center = self.centers[self.rng.integers(len(self.centers))]
+        return center + 0.6 * self.rng.standard_normal(self.dimensions).astype(np.float32)
+
+    def embeddings(self, model, text):
+        return self.vector()
+
+
+def synthetic_passages(count, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"w{number}" for number in range(30000)]
+    words = rng.zipf(1.3, size=count * 120) % len(vocabulary)
+    for number in range(count):
+        text = ' '.join(vocabulary[w] for w in words[number * 120:(number + 1) * 120])
+        yield f"page{number // 20}(1) DESCRIPTION", text
+
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(name, times):
+    times = sorted(times)
+    print(f"  {name:<8} median {statistics.median(times) * 1000:6.2f} ms   "
+          f"p99 {times[min(len(times) - 1, int(len(times) * 0.99))] * 1000:6.2f} ms   "
+          f"max {times[-1] * 1000:6.2f} ms")
+
+
+def run_synthetic(args):
+    directory = tempfile.TemporaryDirectory()
+    index = retrieval.DocumentIndex(directory.name, embedding_model='synthetic')
+    start = time.perf_counter()
+    passages = list(synthetic_passages(args.passages))
+    for number in range(0, len(passages), 20):
+        index.replace_file(f"/synthetic/{number}", 0, passages[number:number + 20])
+    stored = time.perf_counter()
+    embeddings = SyntheticEmbeddings(args.dimensions)
+    index.embed_missing(embeddings)
+    embedded = time.perf_counter()
+    index.build()
+    built = time.perf_counter()
+    index.load()
+    print(f"{len(index)} passages, {args.dimensions}-dimensional vectors: stored in "
+          f"{stored - start:.1f} s, embedded in {embedded - stored:.1f} s, "
+          f"indexes built in {built - embedded:.1f} s")
+
+    rng = np.random.default_rng(1)
+    queries = [' '.join(f"w{w}" for w in rng.integers(0, 2000, 4)) for _ in range(args.queries)]
+    vectors = [embeddings.vector() for _ in range(args.queries)]
+    bm25 = [timed(lambda q=q: index.passages(*index.search_bm25(q, args.k)), 1)[0]
+            for q in queries]
+    vector = [timed(lambda v=v: index.passages(*index.search_vectors(v, args.k)), 1)[0]
+              for v in vectors]
+    print(f"top {args.k} of {args.queries} queries:")
+    report("bm25", bm25)
+    report("vectors", vector)
+    matched = sum(1 for q in queries if len(index.search_bm25(q, args.k)[0]))
+    print(f"  bm25 found passages for {matched} of {len(queries)} queries; the rest fall "
+          f"below the relevance cutoff")
+
+    found = 0
+    full = np.asarray(index.vectors)
+    for v in vectors:
+        v = v / np.linalg.norm(v)
+        exact = set(np.argsort(-(full @ v))[:args.k].tolist())
+        rows, _scores = index.search_vectors(v, args.k)
+        found += len(exact & set(rows.tolist()))
+    print(f"  vector recall against an exact scan: {found / (args.k * len(vectors)):.3f}")
+    exact_scan = timed(lambda: np.argpartition(full @ vectors[0], -args.k), 20)
+    print(f"  (an exact scan alone takes {statistics.median(exact_scan) * 1000:.2f} ms)")
+    index.close()
+    directory.cleanup()
+
+
+def run_real(args):
+    path = os.path.join(tempfile.gettempdir(), 'bench_retrieval_index')
+    index = retrieval.DocumentIndex(path)
+    start = time.perf_counter()
+    index.update()
+    index.load()
+    print(f"{len(index)} passages from this machine, updated in "
+          f"{time.perf_counter() - start:.1f} s (index kept in {path})")
+    times = []
+    for _ in range(max(1, args.queries // len(REAL_QUERIES))):
+        for query in REAL_QUERIES:
+            times.extend(timed(lambda: index.search(query, args.k), 1))
+    report("bm25", times)
+    for query in REAL_QUERIES:
+        print(f"  {query!r}: {', '.join(p.title for p in index.search(query, args.k))}")
+    index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--passages', type=int, default=50000)
+    parser.add_argument('--dimensions', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--real', action='store_true',
+                        help="index this machine's man pages and docs instead")
+    args = parser.parse_args()
+    if args.real:
+        run_real(args)
+    else:
+        run_synthetic(args)
+
+
+if __name__ == '__main__':
+    main()
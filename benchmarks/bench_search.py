@@ -0,0 +1,74 @@
+"""Time history search queries over a large message store.
+
+Fills a temporary database with --messages synthetic questions and answers
+through ConversationStore, so the full-text index is built by the same
+triggers the app uses, then times queries from very common to rare terms.
+
+    python benchmarks/bench_search.py --messages 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_store import ConversationStore  # noqa: E402
+
+WORDS = ("the file system process kernel user group permission network interface service "
+         "daemon package command option directory socket memory disk partition mount log "
+         "journal firewall route address port cron backup archive shell variable").split()
+RARE = ["iptables", "nftables", "selinux", "apparmor", "tcpdump", "strace", "ebpf", "zram"]
+QUERIES = ["the", "kernel", "disk partition mount", "iptables port", "tcpdum",
+           "selinux permission", "no such words here"]
+
+
+def message_text(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(10, 80))]
+    if rng.random() < 0.01:
+        words.insert(rng.randrange(len(words)), rng.choice(RARE))
+    return ' '.join(words)
+
+
+def fill(store, messages, conversations, seed=0):
+    rng = random.Random(seed)
+    ids = [store.new_conversation_id() for _ in range(conversations)]
+    start = time.perf_counter()
+    for i in range(messages // 2):
+        conversation_id = ids[i * conversations // (messages // 2)]
+        store.add_message(conversation_id, i + 1, 'user', message_text(rng))
+        store.add_message(conversation_id, i + 1, 'assistant', message_text(rng))
+    store.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ConversationStore(os.path.join(directory, 'history.db'))
+        elapsed = fill(store, args.messages, args.conversations)
+        print(f"indexed {args.messages} messages in {elapsed:.1f} s "
+              f"({args.messages / elapsed:.0f} messages/s)")
+
+        print(f"{'query':<24} {'results':>7} {'median ms':>10} {'max ms':>8}")
+        for query in QUERIES:
+            times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                results = store.search(query)
+                times.append((time.perf_counter() - start) * 1000)
+            print(f"{query:<24} {len(results):>7} {statistics.median(times):>10.2f} "
+                  f"{max(times):>8.2f}")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Measure GUI startup: time to window and time to first interactive.
+
+Launches main.py with --startup-benchmark under `python -X importtime` and
+reports, from process launch:
+
+- window shown: the input field has been painted
+- interactive: the deferred widgets are built and the event loop is idle
+
+It also lists the imports with the highest cumulative import time. Like
+bench_e2e.py, the app runs with a throwaway home directory, shared by the
+runs so the later ones start with a model cache, and talks to
+benchmarks/mock_ollama.py instead of the real server.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_mock():
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_ollama.py'), '--port', '0'],
+        stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if 'listening on' not in line:
+        process.kill()
+        raise RuntimeError("mock server did not start")
+    return process, line.split()[-1]
+
+
+def run_once(home, url):
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # Settings, history and caches all live under the throwaway home
+    env['HOME'] = home
+    env['XDG_CONFIG_HOME'] = os.path.join(home, '.config')
+    env['OLLAMA_HOST'] = url
+    launched = time.time()
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'main.py', '--startup-benchmark'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    marks = {}
+    for line in result.stdout.splitlines():
+        if line.startswith('startup '):
+            _, name, value = line.split()
+            marks[name] = float(value) - launched
+    if 'interactive' not in marks:
+        raise RuntimeError(f"main.py did not report startup times:\n{result.stderr[-2000:]}")
+    return marks, result.stderr
+
+
+def slowest_imports(importtime_output, count):
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Nested imports are indented; keep top-level ones so a package isn't
+        # listed next to its own submodules
+        if not name.startswith('  '):
+            imports.append((int(cumulative_us), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--imports', type=int, default=10, help="number of slow imports to list")
+    args = parser.parse_args()
+
+    mock, url = start_mock()
+    home = tempfile.TemporaryDirectory()
+    with open(os.path.join(home.name, '.ollama_chat_settings.json'), 'w') as f:
+        json.dump({'default_model': 'mock:latest'}, f)
+    shown, interactive = [], []
+    importtime_output = ''
+    try:
+        for _ in range(args.runs):
+            marks, importtime_output = run_once(home.name, url)
+            shown.append(marks['window_shown'])
+            interactive.append(marks['interactive'])
+    finally:
+        mock.terminate()
+        mock.wait()
+        home.cleanup()
+
+    print(f"runs: {args.runs}")
+    print(f"time to window:           median {statistics.median(shown) * 1000:7.1f} ms"
+          f"  min {min(shown) * 1000:7.1f} ms")
+    print(f"time to first interactive: median {statistics.median(interactive) * 1000:7.1f} ms"
+          f"  min {min(interactive) * 1000:7.1f} ms")
+    print("\nslowest top-level imports (last run):")
+    for cumulative_us, name in slowest_imports(importtime_output, args.imports):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
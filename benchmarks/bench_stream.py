@@ -0,0 +1,217 @@
+"""NDJSON stream decoding: events per second of each way of reading a stream.
+
+Decoders compared:
+
+- iter_lines: response.iter_lines() with requests' default 512-byte chunks
+  and json.loads per line, as the streaming loops first did
+- split: iter_content(chunk_size=None), bytes.split on newlines and json.loads,
+  as GenerationWorker did before StreamDecoder
+- decoder-json, decoder-orjson: ollama_client.StreamDecoder with each backend
+
+Each is run twice:
+
+- memory: a recorded stream fed from memory in --read-size pieces (iter_lines
+  keeps its 512-byte pieces), so only the decoding is measured
+- http: the recorded stream replayed by a local server as fast as the socket
+  takes it, so the socket reads and chunked transfer decoding of requests count
+
+    python benchmarks/bench_stream.py --tokens 20000 --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ollama_client  # noqa: E402
+from mock_ollama import MockOllama  # noqa: E402
+
+DECODERS = ('iter_lines', 'split', 'decoder-json', 'decoder-orjson')
+
+
+def line_events(line, events):
+    """What the old loops took from each parsed line"""
+    message = json.loads(line)
+    if 'error' in message:
+        events.append(('error', message['error']))
+        return
+    content = message.get('message', {}).get('content')
+    if content:
+        events.append(('token', content))
+    if message.get('done'):
+        events.append(('done', message))
+
+
+def decode_iter_lines(response):
+    events = []
+    for line in response.iter_lines():
+        if line:
+            line_events(line, events)
+    return events
+
+
+def decode_split(chunks):
+    events = []
+    pending = b''
+    for data in chunks:
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                line_events(line, events)
+    return events
+
+
+def decode_with(chunks, orjson):
+    decoder = ollama_client.StreamDecoder()
+    if not orjson:
+        decoder.loads = json.loads
+    events = []
+    for data in chunks:
+        events.extend(decoder.feed(data))
+    events.extend(decoder.close())
+    return events
+
+
+def decode(name, chunks):
+    if name == 'split':
+        return decode_split(chunks)
+    return decode_with(chunks, name == 'decoder-orjson')
+
+
+def record_stream(tokens):
+    """NDJSON body of a /api/chat stream with tokens tokens"""
+    server = MockOllama(token_rate=0, first_token_delay=0, tokens=tokens).start()
+    try:
+        client = ollama_client.OllamaClient(server.url)
+        response = client.chat({'model': 'mock:latest', 'stream': True,
+                                'messages': [{'role': 'user', 'content': 'bench'}]}, stream=True)
+        body = response.content
+        client.close()
+    finally:
+        server.stop()
+    return body
+
+
+def buffered_response(body):
+    """A requests Response whose iter_lines() reads body from memory"""
+    import requests
+    response = requests.Response()
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+def bench_memory(body, read_size, runs):
+    chunks = [body[i:i + read_size] for i in range(0, len(body), read_size)]
+    results = {}
+    for name in DECODERS:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            if name == 'iter_lines':
+                events = decode_iter_lines(buffered_response(body))
+            else:
+                events = decode(name, chunks)
+            times.append(time.perf_counter() - start)
+        results[name] = (len(events), statistics.median(times))
+    return results
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Sends the recorded stream, one HTTP chunk per line as Ollama does, in one write"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.wfile.write(self.server.framed)
+
+
+def bench_http(body, runs):
+    lines = body.splitlines(keepends=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReplayHandler)
+    server.daemon_threads = True
+    server.framed = b''.join(b'%x\r\n%s\r\n' % (len(line), line) for line in lines) + b'0\r\n\r\n'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = ollama_client.OllamaClient('%s:%d' % server.server_address[:2])
+    payload = {'model': 'mock:latest', 'stream': True,
+               'messages': [{'role': 'user', 'content': 'bench'}]}
+    results = {}
+    try:
+        for name in DECODERS:
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                response = client.chat(payload, stream=True)
+                if name == 'iter_lines':
+                    events = decode_iter_lines(response)
+                else:
+                    events = decode(name, response.iter_content(chunk_size=None))
+                response.close()
+                times.append(time.perf_counter() - start)
+            results[name] = (len(events), statistics.median(times))
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def first_event_delay(token_rate):
+    """Seconds from the first token being sent to StreamDecoder returning it"""
+    server = MockOllama(token_rate=token_rate, first_token_delay=0.2, tokens=5).start()
+    client = ollama_client.OllamaClient(server.url)
+    try:
+        start = time.perf_counter()
+        response = client.chat({'model': 'mock:latest', 'stream': True,
+                                'messages': [{'role': 'user', 'content': 'bench'}]}, stream=True)
+        for events in ollama_client.iter_stream_events(response):
+            delay = time.perf_counter() - start - 0.2
+            break
+        response.close()
+    finally:
+        client.close()
+        server.stop()
+    return delay
+
+
+def report(title, results):
+    print(title)
+    for name, (count, seconds) in results.items():
+        print(f"  {name:<15} {count / seconds:>12,.0f} events/s  ({count} events, "
+              f"{seconds * 1000:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--read-size', type=int, default=4096,
+                        help="bytes per piece in the memory benchmark")
+    args = parser.parse_args()
+
+    if ollama_client.json_loader() is json.loads:
+        print("orjson is not installed; decoder-orjson falls back to json")
+    body = record_stream(args.tokens)
+    report(f"memory, {len(body) / 1e6:.1f} MB in {args.read_size}-byte reads:",
+           bench_memory(body, args.read_size, args.runs))
+    report("http, replayed from a local server:", bench_http(body, args.runs))
+    print(f"first token returned {first_event_delay(10) * 1000:.1f} ms after it was sent")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""Per-message styling cost: per-widget stylesheets, the theme, and the delegate.
+
+Adds --messages chat messages to a scrolling window offscreen, three ways:
+
+- widget-sheets: the old create_message_box, a QGroupBox per message with its
+  own setStyleSheet() and stylesheets on its Stop and reload buttons
+- theme: the same widgets, styled by object name and property selectors in
+  one application stylesheet, set once
+- delegate: MessageItems in the TranscriptView the app uses now
+
+Each runs in its own process, so the application stylesheet of one doesn't
+affect the others. Each message is timed in two phases, reported as medians
+over the first and last --batch messages:
+
+- style: creating the widgets and polishing them, which is where Qt parses
+  and resolves stylesheets (for the delegate, creating the item)
+- show: inserting into the layout, laying out and painting
+
+    python benchmarks/bench_styles.py --messages 300
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+STRATEGIES = ('widget-sheets', 'theme', 'delegate')
+TEXT = ("Use <code>df -h</code> to see free space per mounted file system and "
+        "<code>du -sh *</code> to find what uses it.")
+
+# The stylesheets create_message_box used to set on every message
+MESSAGE_SHEET = """
+    QGroupBox {
+        background-color: %s;
+        border: none;
+        border-radius: 8px;
+        margin: 0;
+        padding: 0;
+    }
+    QGroupBox::title {
+        border: none;
+        margin: 0;
+        padding: 0;
+        background: none;
+        subcontrol-origin: none;
+        subcontrol-position: none;
+    }
+    QGroupBox::indicator {
+        width: 0;
+        height: 0;
+        padding: 0;
+        margin: 0;
+    }
+"""
+STOP_SHEET = """
+    QPushButton {
+        background-color: #ff4444;
+        color: white;
+        border: none;
+        border-radius: 4px;
+        padding: 4px;
+    }
+    QPushButton:hover {
+        background-color: #ff6666;
+    }
+    QPushButton:disabled {
+        background-color: #cccccc;
+    }
+"""
+RELOAD_SHEET = """
+    QPushButton {
+        background-color: #4CAF50;
+        color: white;
+        border: none;
+        border-radius: 4px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #45a049;
+    }
+"""
+# The same rules as theme selectors
+MESSAGE_THEME = """
+    QGroupBox#message {
+        border: none;
+        border-radius: 8px;
+        margin: 0;
+        padding: 0;
+    }
+    QGroupBox#message[role="user"] {
+        background-color: #f8f9fa;
+    }
+    QGroupBox#message[role="ai"] {
+        background-color: #f0f7ff;
+    }
+    QGroupBox#message::title {
+        border: none;
+        margin: 0;
+        padding: 0;
+        background: none;
+        subcontrol-origin: none;
+        subcontrol-position: none;
+    }
+    QPushButton#messageStop {
+        background-color: #ff4444;
+        color: white;
+        border: none;
+        border-radius: 4px;
+        padding: 4px;
+    }
+    QPushButton#messageStop:hover {
+        background-color: #ff6666;
+    }
+    QPushButton#messageStop:disabled {
+        background-color: #cccccc;
+    }
+    QPushButton#messageReload {
+        background-color: #4CAF50;
+        color: white;
+        border: none;
+        border-radius: 4px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+    QPushButton#messageReload:hover {
+        background-color: #45a049;
+    }
+"""
+
+
+def message_box(is_user, themed):
+    from PySide6.QtCore import Qt
+    from PySide6.QtWidgets import QGroupBox, QHBoxLayout, QLabel, QPushButton, QVBoxLayout
+    box = QGroupBox()
+    if themed:
+        box.setObjectName("message")
+        box.setProperty('role', 'user' if is_user else 'ai')
+    else:
+        box.setStyleSheet(MESSAGE_SHEET % ("#f8f9fa" if is_user else "#f0f7ff"))
+    layout = QVBoxLayout(box)
+    layout.setContentsMargins(10, 10, 10, 10)
+    header = QHBoxLayout()
+    header.addWidget(QLabel("<b>You</b>" if is_user else "<b>AI:</b>"))
+    if not is_user:
+        stop_button = QPushButton("Stop")
+        stop_button.setFixedSize(60, 25)
+        reload_button = QPushButton("↻")
+        reload_button.setFixedSize(25, 25)
+        if themed:
+            stop_button.setObjectName("messageStop")
+            reload_button.setObjectName("messageReload")
+        else:
+            stop_button.setStyleSheet(STOP_SHEET)
+            reload_button.setStyleSheet(RELOAD_SHEET)
+        header.addWidget(stop_button)
+        header.addWidget(reload_button)
+    header.addStretch()
+    layout.addLayout(header)
+    label = QLabel(TEXT)
+    label.setWordWrap(True)
+    label.setTextFormat(Qt.RichText)
+    layout.addWidget(label)
+    return box
+
+
+def run_strategy(strategy, messages):
+    """(style, show) seconds of each message, in order"""
+    from PySide6.QtWidgets import QApplication, QScrollArea, QVBoxLayout, QWidget
+    import styles
+    app = QApplication([])
+    styles.apply_theme(app)
+    if strategy == 'theme':
+        app.setStyleSheet(styles.THEME + MESSAGE_THEME)
+
+    if strategy == 'delegate':
+        from transcript import MessageItem, TranscriptView
+        view = TranscriptView()
+        view.resize(600, 900)
+        view.show()
+
+        def style(number):
+            return MessageItem('user' if number % 2 == 0 else 'ai', TEXT, html=TEXT)
+
+        def add(item):
+            view.append(item)
+    else:
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.addStretch()
+        scroll_area.setWidget(container)
+        scroll_area.resize(600, 900)
+        scroll_area.show()
+
+        def style(number):
+            box = message_box(number % 2 == 0, strategy == 'theme')
+            box.setParent(container)  # Polished in place, under the window's styles
+            box.ensurePolished()
+            for child in box.findChildren(QWidget):
+                child.ensurePolished()
+            return box
+
+        def add(box):
+            layout.insertWidget(layout.count() - 1, box)
+    app.processEvents()
+
+    times = []
+    for number in range(messages):
+        start = time.perf_counter()
+        message = style(number)
+        styled = time.perf_counter()
+        add(message)
+        app.processEvents()  # Lay out and paint, as the event loop would
+        times.append((styled - start, time.perf_counter() - styled))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=50)
+    parser.add_argument('--strategy', choices=STRATEGIES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.strategy:
+        for style, show in run_strategy(args.strategy, args.messages):
+            print(f"{style:.6f} {show:.6f}")
+        return
+
+    print(f"median ms per message, first and last {args.batch} of {args.messages}")
+    print(f"{'strategy':<14} {'style first':>12} {'style last':>11} "
+          f"{'show first':>11} {'show last':>10}")
+    for strategy in STRATEGIES:
+        result = subprocess.run([sys.executable, __file__, '--strategy', strategy,
+                                 '--messages', str(args.messages)],
+                                capture_output=True, text=True, timeout=3600)
+        if result.returncode:
+            print(f"{strategy:<14} failed: {result.stderr.strip()[-500:]}")
+            continue
+        rows = [tuple(map(float, line.split())) for line in result.stdout.splitlines()]
+        columns = []
+        for phase in (0, 1):
+            values = [row[phase] for row in rows]
+            columns.append(statistics.median(values[:args.batch]) * 1000)
+            columns.append(statistics.median(values[-args.batch:]) * 1000)
+        print(f"{strategy:<14} {columns[0]:>12.3f} {columns[1]:>11.3f} "
+              f"{columns[2]:>11.2f} {columns[3]:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""Stand-in Ollama server for benchmarks and offline development.
+
+Implements the endpoints the app uses: /api/tags, /api/generate, /api/chat,
+/api/copy, /api/show and /api/embeddings. Answers are synthetic Markdown shaped
+like a Linux-admin reply, streamed at a configurable token rate after a
+configurable first-token delay, and the final object carries timings that
+match what was sent.
+
+    python benchmarks/mock_ollama.py --port 11434 --token-rate 50 --tokens 400
+    OLLAMA_HOST=127.0.0.1:11434 python main.py
+
+It can also run inside another script:
+
+    server = MockOllama(token_rate=0)
+    server.start()
+    ... server.url ...
+    server.stop()
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_markdown import synthetic_tokens  # noqa: E402
+
+DEFAULT_MODELS = ('mock:latest', 'mock-large:latest')
+CONTEXT_LENGTH = 8192
+EMBEDDING_DIMENSIONS = 64
+
+
+class MockOllama:
+    """Configuration, model list and HTTP server of one mock instance"""
+
+    def __init__(self, host='127.0.0.1', port=0, token_rate=50.0, first_token_delay=0.2,
+                 tokens=400, load_delay=0.0, models=DEFAULT_MODELS):
+        self.token_rate = token_rate  # Tokens per second; 0 sends them as fast as possible
+        self.first_token_delay = first_token_delay  # Seconds of "prompt evaluation"
+        self.tokens = tokens
+        self.load_delay = load_delay  # Seconds a preload request takes
+        self.models = {name: self.model_entry(name) for name in models}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def model_entry(name):
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return {'name': name, 'model': name, 'digest': digest, 'size': 2 * 10 ** 9,
+                'modified_at': '2024-01-01T00:00:00Z',
+                'details': {'family': 'llama', 'parameter_size': '3B',
+                            'quantization_level': 'Q4_K_M'}}
+
+    def answer_tokens(self, prompt):
+        # Seeded by the prompt, so a repeated question gets the same answer
+        seed = int.from_bytes(hashlib.sha256(prompt.encode()).digest()[:4], 'big')
+        return list(synthetic_tokens(self.tokens, seed))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        line = json.dumps(data).encode() + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            with self.mock.lock:
+                self.send_json({'models': list(self.mock.models.values())})
+        elif self.path == '/api/version':
+            self.send_json({'version': '0.0.0-mock'})
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json({'error': 'invalid JSON'}, 400)
+            return
+        model = body.get('model') or body.get('name')
+        if self.path in ('/api/generate', '/api/chat', '/api/show') and not self.known(model):
+            self.send_json({'error': f"model '{model}' not found"}, 404)
+        elif self.path == '/api/generate':
+            self.generate(body, chat=False)
+        elif self.path == '/api/chat':
+            self.generate(body, chat=True)
+        elif self.path == '/api/copy':
+            self.copy(body)
+        elif self.path == '/api/show':
+            self.send_json({'modelfile': f"FROM {model}\n",
+                            'parameters': 'stop "<|eot_id|>"',
+                            'details': self.mock.models[self.full_name(model)]['details'],
+                            'model_info': {'llama.context_length': CONTEXT_LENGTH}})
+        elif self.path == '/api/embeddings':
+            digest = hashlib.sha256(body.get('prompt', '').encode()).digest()
+            vector = [digest[i % len(digest)] / 255 - 0.5 for i in range(EMBEDDING_DIMENSIONS)]
+            self.send_json({'embedding': vector})
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+    def full_name(self, model):
+        return model if ':' in (model or '') else f"{model}:latest"
+
+    def known(self, model):
+        with self.mock.lock:
+            return self.full_name(model) in self.mock.models
+
+    def copy(self, body):
+        source = self.full_name(body.get('source'))
+        with self.mock.lock:
+            if source not in self.mock.models:
+                self.send_json({'error': f"model '{source}' not found"}, 404)
+                return
+            destination = self.full_name(body.get('destination'))
+            self.mock.models[destination] = dict(self.mock.models[source], name=destination,
+                                                 model=destination)
+        self.send_json({})
+
+    def generate(self, body, chat):
+        mock = self.mock
+        model = body['model']
+        if chat:
+            messages = body.get('messages') or []
+            prompt = ' '.join(m.get('content', '') for m in messages)
+        else:
+            prompt = body.get('prompt') or ''
+        if not prompt:
+            # A preload or, with keep_alive 0, an unload
+            unload = body.get('keep_alive') in (0, '0')
+            if not unload:
+                time.sleep(mock.load_delay)
+            done = {'model': model, 'done': True, 'done_reason': 'unload' if unload else 'load',
+                    'load_duration': int(mock.load_delay * 1e9)}
+            if chat:
+                done['message'] = {'role': 'assistant', 'content': ''}
+            else:
+                done['response'] = ''
+            self.send_json(done)
+            return
+
+        tokens = mock.answer_tokens(prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        started = time.perf_counter()
+
+        def part(text):
+            if chat:
+                return {'model': model, 'message': {'role': 'assistant', 'content': text},
+                        'done': False}
+            return {'model': model, 'response': text, 'done': False}
+
+        def final(eval_started):
+            now = time.perf_counter()
+            data = part('')
+            data.update({'done': True, 'done_reason': 'stop',
+                         'total_duration': int((now - started) * 1e9),
+                         'load_duration': 0,
+                         'prompt_eval_count': prompt_tokens,
+                         'prompt_eval_duration': int(mock.first_token_delay * 1e9),
+                         'eval_count': len(tokens),
+                         'eval_duration': int((now - eval_started) * 1e9)})
+            return data
+
+        if not body.get('stream', True):
+            time.sleep(mock.first_token_delay + (len(tokens) / mock.token_rate
+                                                  if mock.token_rate else 0))
+            data = final(started + mock.first_token_delay)
+            if chat:
+                data['message']['content'] = ''.join(tokens)
+            else:
+                data['response'] = ''.join(tokens)
+            self.send_json(data)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            time.sleep(mock.first_token_delay)
+            eval_started = time.perf_counter()
+            for i, token in enumerate(tokens):
+                if mock.token_rate:
+                    # Scheduled against the start, so sleep overhead doesn't lower the rate
+                    delay = eval_started + i / mock.token_rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.send_chunk(part(token))
+            self.send_chunk(final(eval_started))
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # The client stopped the stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434, help="0 picks a free port")
+    parser.add_argument('--token-rate', type=float, default=50.0,
+                        help="tokens per second; 0 streams as fast as possible")
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help="seconds")
+    parser.add_argument('--tokens', type=int, default=400, help="tokens per answer")
+    parser.add_argument('--load-delay', type=float, default=0.0,
+                        help="seconds a preload request takes")
+    parser.add_argument('--models', nargs='+', default=list(DEFAULT_MODELS))
+    args = parser.parse_args()
+
+    mock = MockOllama(args.host, args.port, args.token_rate, args.first_token_delay,
+                      args.tokens, args.load_delay, args.models)
+    # Printed once listening, so a parent process can wait for this line
+    print(f"mock ollama listening on {mock.url}", flush=True)
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Conversation state for multi-turn chat over Ollama's /api/chat endpoint."""
+import itertools
+import re
+
+DEFAULT_SYSTEM_PROMPT = """You are a highly experienced Linux system administrator and expert.
+Your role is to:
+- Provide accurate and detailed explanations of Linux commands, concepts, and best practices
+- Give practical examples and use cases
+- Explain security implications when relevant
+- Recommend modern and efficient solutions
+- Help users understand Linux system internals
+- Share professional tips and common pitfalls to avoid
+Be concise but thorough in your responses."""
+
+SUMMARY_PROMPT = """Summarize the following conversation between a user and a Linux assistant.
+Keep commands, file paths, versions and decisions that later questions may refer to.
+Answer with the summary only, in under 200 words."""
+
+DEFAULT_NUM_CTX = 2048        # Ollama's window when the request doesn't set num_ctx
+MESSAGE_OVERHEAD_TOKENS = 4   # Role markers the chat template adds around each message
+
+
+class TurnStats:
+    """Server-side timings from the final object of an Ollama stream"""
+
+    FIELDS = ('total_duration', 'load_duration', 'prompt_eval_count',
+              'prompt_eval_duration', 'eval_count', 'eval_duration')
+
+    def __init__(self, data=None):
+        data = data or {}
+        # Ollama omits the prompt_eval fields when the whole prompt came from its cache
+        for field in self.FIELDS:
+            setattr(self, field, data.get(field, 0) or 0)
+
+    @property
+    def eval_rate(self):
+        """Generated tokens per second"""
+        if not self.eval_duration:
+            return 0.0
+        return self.eval_count / (self.eval_duration / 1e9)
+
+    def summary(self):
+        return (f"prompt eval: {self.prompt_eval_count} tok in "
+                f"{self.prompt_eval_duration / 1e6:.0f} ms · eval: {self.eval_count} tok in "
+                f"{self.eval_duration / 1e9:.2f} s ({self.eval_rate:.1f} tok/s)")
+
+
+class ChatTurn:
+    """One user prompt and the assistant's answer to it"""
+
+    def __init__(self, turn_id, prompt):
+        self.id = turn_id
+        self.prompt = prompt
+        self.response = None  # Stays None until a generation completes
+        self.stats = None
+
+
+def turns_from_messages(messages):
+    """Rebuild ChatTurns from stored messages, as returned by ConversationStore
+
+    Answers are matched to their prompts by turn id: a follow-up queued while
+    an answer streams is stored before that answer.
+    """
+    turns = {}
+    answers = []
+    for message in messages:
+        if message['role'] == 'user':
+            turns[message['turn']] = ChatTurn(message['turn'], message['content'])
+        else:
+            answers.append(message)
+    for message in answers:
+        turn = turns.get(message['turn'])
+        if turn is not None:
+            turn.response = message['content']
+            turn.stats = TurnStats(message['stats']) if message['stats'] else None
+    return sorted(turns.values(), key=lambda turn: turn.id)
+
+
+def context_window_from_show(data, requested=None):
+    """Context window Ollama will use for a model, from an /api/show response
+
+    A num_ctx sent with the request wins, then one from the Modelfile
+    parameters, then the server default. The result is capped by the context
+    length the model was trained with.
+    """
+    window = requested or DEFAULT_NUM_CTX
+    match = re.search(r'^num_ctx\s+(\d+)', data.get('parameters') or '', re.MULTILINE)
+    if match and not requested:
+        window = int(match.group(1))
+    for key, value in (data.get('model_info') or {}).items():
+        if key.endswith('.context_length') and value:
+            window = min(window, int(value))
+    return window
+
+
+class ContextBudget:
+    """Keeps the prompt for one model under a fraction of its context window.
+
+    Token counts are estimated from character counts. When a request would pass
+    fraction * num_ctx, the oldest turns are dropped until it fits in
+    low_fraction * num_ctx. Trimming in one larger step leaves the prefix
+    unchanged for the next several turns, so they still hit the prompt cache
+    instead of missing on every turn as a sliding window would.
+    """
+
+    def __init__(self, num_ctx=DEFAULT_NUM_CTX, fraction=0.75, low_fraction=None,
+                 chars_per_token=3.5):
+        self.num_ctx = num_ctx
+        self.fraction = fraction
+        self.low_fraction = low_fraction if low_fraction is not None else fraction * 2 / 3
+        self.chars_per_token = chars_per_token
+
+    @property
+    def limit(self):
+        return int(self.num_ctx * self.fraction)
+
+    @property
+    def low_limit(self):
+        return int(self.num_ctx * self.low_fraction)
+
+    def estimate(self, text):
+        return int(len(text) / self.chars_per_token) + MESSAGE_OVERHEAD_TOKENS
+
+    def estimate_messages(self, messages):
+        return sum(self.estimate(message['content']) for message in messages)
+
+    def observe(self, messages, prompt_eval_count):
+        """Correct the estimate with a server count
+
+        prompt_eval_count never exceeds the real prompt size (cached tokens
+        aren't counted), so it can only show that the estimate is too low.
+        """
+        if prompt_eval_count > self.estimate_messages(messages):
+            chars = sum(len(message['content']) for message in messages)
+            overhead = MESSAGE_OVERHEAD_TOKENS * len(messages)
+            self.chars_per_token = max(1.0, chars / max(1, prompt_eval_count - overhead))
+
+
+class Conversation:
+    """Builds /api/chat message lists with a stable prefix.
+
+    The system prompt always comes first and earlier turns are resent with the
+    exact text the model produced, so every request starts with the tokens of
+    the previous one and Ollama can reuse its KV cache instead of evaluating
+    the whole history again.
+    """
+
+    def __init__(self, system_prompt=DEFAULT_SYSTEM_PROMPT):
+        self.system_prompt = system_prompt
+        self.turns = []
+        self.context_start = 0  # Id of the oldest turn still sent to the model
+        self.summary = None     # Summary of the turns that were dropped, if enabled
+        self._ids = itertools.count(1)
+
+    def add_turn(self, prompt):
+        turn = ChatTurn(next(self._ids), prompt)
+        self.turns.append(turn)
+        return turn
+
+    def restore_turns(self, turns):
+        """Put turns loaded from history in front of the current ones
+
+        Restored turns keep their ids. Turns that arrive after the conversation
+        already has some are only for display: the context window keeps
+        starting where it did, so the next request's prefix doesn't change.
+        """
+        if not turns:
+            return
+        if self.turns:
+            self.context_start = max(self.context_start, self.turns[0].id)
+        self.turns[:0] = turns
+        newest = max(turn.id for turn in self.turns)
+        self._ids = itertools.count(newest + 1)
+
+    def history_before(self, turn):
+        """Completed turns in the context window that precede turn"""
+        history = []
+        for previous in self.turns:
+            if previous is turn:
+                break
+            if previous.response is not None and previous.id >= self.context_start:
+                history.append(previous)
+        return history
+
+    def messages_for(self, turn, budget=None):
+        """Message list that asks the model to answer turn
+
+        With a budget, the oldest turns are dropped once the estimate passes
+        its limit. Returns the messages and the turns dropped by this call,
+        which the caller may summarize into self.summary.
+        """
+        history = self.history_before(turn)
+        dropped = []
+        if budget is not None:
+            sizes = [budget.estimate(t.prompt) + budget.estimate(t.response) for t in history]
+            fixed = budget.estimate(turn.prompt) + self._prefix_tokens(budget)
+            if fixed + sum(sizes) > budget.limit:
+                while history and fixed + sum(sizes) > budget.low_limit:
+                    dropped.append(history.pop(0))
+                    sizes.pop(0)
+                self.context_start = history[0].id if history else turn.id
+
+        messages = self._prefix_messages()
+        for previous in history:
+            messages.append({"role": "user", "content": previous.prompt})
+            messages.append({"role": "assistant", "content": previous.response})
+        messages.append({"role": "user", "content": turn.prompt})
+        return messages, dropped
+
+    def _prefix_messages(self):
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.summary:
+            messages.append({"role": "system",
+                             "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return messages
+
+    def _prefix_tokens(self, budget):
+        return budget.estimate_messages(self._prefix_messages())
+
+    def complete_turn(self, turn, response, stats=None):
+        """Record the answer; a regenerated turn replaces its previous answer"""
+        turn.response = response
+        turn.stats = stats
+
+    def clear(self):
+        self.turns = []
+        self.context_start = 0
+        self.summary = None
+        self._ids = itertools.count(1)
+
+
+def summarize_turns(client, model, turns, previous_summary=None):
+    """Ask the model for a short summary of turns, folding in an earlier summary"""
+    parts = []
+    if previous_summary:
+        parts.append(f"Earlier summary:\n{previous_summary}")
+    for turn in turns:
+        parts.append(f"User: {turn.prompt}\nAssistant: {turn.response}")
+    response = client.chat({
+        "model": model,
+        "messages": [{"role": "system", "content": SUMMARY_PROMPT},
+                     {"role": "user", "content": "\n\n".join(parts)}],
+        "stream": False
+    })
+    response.raise_for_status()
+    return response.json()['message']['content'].strip()
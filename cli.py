@@ -0,0 +1,360 @@
+"""Command-line tools that run without the GUI.
+
+    python cli.py                       # interactive chat, like the app's
+    python cli.py "how do I list open ports?"
+    python cli.py < questions.txt       # one question per line
+    python cli.py --pregenerate --model llama3.2
+
+Without a tool flag, cli.py chats with the model: answers stream to stdout
+and everything else goes to stderr, so output can be piped. An interactive
+session is one conversation, sent with the app's system prompt and history
+trimming; questions given as arguments or piped in are each asked on their
+own. Conversations are saved to the app's history unless --no-history is
+given. Ctrl-C stops an answer; Ctrl-D ends the session. `main.py --cli`
+runs the same mode. Qt is never imported.
+
+--pregenerate asks the model every question in linux_prompts.txt and stores
+the answers, so clicking a suggestion in the app shows one instantly. Answers
+already stored for the model's current digest are skipped unless --force is
+given, so an interrupted run picks up where it stopped.
+
+    python cli.py --export-stats stats.csv
+
+--export-stats writes the timings recorded for every answer (see
+telemetry.py) as CSV, or as JSON when the file name ends in .json; --model
+limits the export to one model.
+
+    python cli.py --index-docs
+
+--index-docs builds or updates the index of local man pages and docs that
+answers are grounded in (see retrieval.py) when the retrieval setting is
+on. The app then does this in the background at startup; chat mode only
+uses an index that already exists.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import config
+import ollama_client
+from chat_engine import (Conversation, ContextBudget, DEFAULT_NUM_CTX, DEFAULT_SYSTEM_PROMPT,
+                         TurnStats, summarize_turns)
+from ollama_client import OllamaClient
+
+
+def model_digest(client, model):
+    """Full name of model and its digest from /api/tags; None if the server doesn't have it"""
+    response = client.tags()
+    response.raise_for_status()
+    for entry in response.json().get('models', []):
+        if entry['name'] == model or entry['name'] == f"{model}:latest":
+            return entry['name'], entry.get('digest')
+    return model, None
+
+
+def pregenerate(client, settings, model, prompts, force=False):
+    from pregenerated import PregeneratedAnswers
+
+    model, digest = model_digest(client, model)
+    if not digest:
+        print(f"Model {model} is not available on {client.base_url}", file=sys.stderr)
+        return 1
+    answers = PregeneratedAnswers()
+    removed = answers.purge({model: digest})
+    if removed:
+        print(f"Removed {removed} answers from an older version of {model}", file=sys.stderr)
+
+    options = {"num_ctx": settings['num_ctx']} if settings['num_ctx'] else None
+    conversation = Conversation(DEFAULT_SYSTEM_PROMPT)
+    generated = skipped = 0
+    try:
+        for number, prompt in enumerate(prompts, 1):
+            if not force and answers.get(model, prompt, digest, DEFAULT_SYSTEM_PROMPT) is not None:
+                skipped += 1
+                continue
+            # Built the same way as the first turn of a chat in the app
+            conversation.clear()
+            messages, _ = conversation.messages_for(conversation.add_turn(prompt))
+            payload = {"model": model, "messages": messages, "stream": False,
+                       "keep_alive": settings['keep_alive']}
+            if options:
+                payload["options"] = options
+            start = time.perf_counter()
+            response = client.chat(payload)
+            response.raise_for_status()
+            answers.put(model, prompt, digest, DEFAULT_SYSTEM_PROMPT,
+                        response.json()['message']['content'])
+            generated += 1
+            print(f"[{number}/{len(prompts)}] {time.perf_counter() - start:5.1f} s  {prompt}",
+                  file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted; answers generated so far are kept", file=sys.stderr)
+        return 130
+    except (ollama_client.RequestException, KeyError, ValueError) as e:
+        print(f"Error generating answers: {e}", file=sys.stderr)
+        return 1
+    finally:
+        answers.close()
+    print(f"{generated} answers generated, {skipped} already up to date", file=sys.stderr)
+    return 0
+
+
+def stream_answer(client, payload, out):
+    """Write the streamed answer to out; returns (answer, TurnStats or None)
+
+    A KeyboardInterrupt stops the stream and keeps the part received so far.
+    """
+    parts = []
+    stats = None
+    response = client.chat(payload, stream=True)
+    try:
+        response.raise_for_status()
+        for events in ollama_client.iter_stream_events(response):
+            for kind, value in events:
+                if kind == ollama_client.TOKEN:
+                    parts.append(value)
+                    out.write(value)
+                elif kind == ollama_client.DONE:
+                    stats = TurnStats(value)
+                else:
+                    raise ValueError(value)
+            out.flush()
+    except KeyboardInterrupt:
+        print("\n[stopped]", file=sys.stderr)
+    finally:
+        response.close()
+    return ''.join(parts), stats
+
+
+class HeadlessChat:
+    """The app's conversation handling, writing answers to a stream"""
+
+    def __init__(self, client, settings, model, out=sys.stdout, show_stats=False,
+                 save_history=True):
+        self.client = client
+        self.settings = settings
+        self.model = model
+        self.out = out
+        self.show_stats = show_stats
+        self.conversation = Conversation(DEFAULT_SYSTEM_PROMPT)
+        # Without /api/show the default window is assumed, as the app does until it answers
+        self.budget = ContextBudget(settings['num_ctx'] or DEFAULT_NUM_CTX,
+                                    settings['context_fraction'])
+        self.documents = None  # DocumentIndex, opened with the first question
+        self.documents_opened = not settings['retrieval']
+        self.history = None
+        self.conversation_id = None
+        if save_history and settings['save_history']:
+            from conversation_store import ConversationStore
+            try:
+                self.history = ConversationStore()
+                self.conversation_id = self.history.new_conversation_id()
+            except Exception as e:
+                print(f"Error opening history: {e}", file=sys.stderr)
+
+    def new_conversation(self):
+        self.conversation.clear()
+        if self.history:
+            self.conversation_id = self.history.new_conversation_id()
+
+    def document_index(self):
+        """The index the app or --index-docs built, if there is one"""
+        if not self.documents_opened:
+            self.documents_opened = True
+            try:
+                from retrieval import DocumentIndex
+                index = DocumentIndex.from_settings(self.settings)
+            except ImportError:
+                return None
+            if index.load():
+                self.documents = index
+            else:
+                index.close()
+        return self.documents
+
+    def ask(self, prompt):
+        turn = self.conversation.add_turn(prompt)
+        self.save(turn, 'user', prompt)
+        documents = self.document_index()
+        messages, dropped = self.conversation.messages_for(turn, self.budget)
+        if dropped and self.settings['summarize_history']:
+            try:
+                self.conversation.summary = summarize_turns(
+                    self.client, self.model, dropped, self.conversation.summary)
+                messages, _ = self.conversation.messages_for(turn, self.budget)
+            except (ollama_client.RequestException, KeyError, ValueError) as e:
+                print(f"Error summarizing history: {e}", file=sys.stderr)
+        if documents:
+            from retrieval import fit_passages, ground_prompt, passage_room
+            passages = documents.search(prompt, self.settings['retrieval_top_k'], self.client)
+            passages = fit_passages(passages, passage_room(self.budget, messages))
+            if passages:
+                messages[-1] = {"role": "user", "content": ground_prompt(prompt, passages)}
+                if self.show_stats:
+                    print(f"docs: {', '.join(p.title for p in passages)}", file=sys.stderr)
+        payload = {"model": self.model, "messages": messages, "stream": True,
+                   "keep_alive": self.settings['keep_alive']}
+        if self.settings['num_ctx']:
+            payload["options"] = {"num_ctx": self.settings['num_ctx']}
+
+        answer, stats = stream_answer(self.client, payload, self.out)
+        if not answer.endswith('\n'):
+            self.out.write('\n')
+        self.out.flush()
+        if stats:
+            self.budget.observe(messages, stats.prompt_eval_count)
+            if self.show_stats:
+                print(stats.summary(), file=sys.stderr)
+        self.conversation.complete_turn(turn, answer, stats)
+        self.save(turn, 'assistant', answer, stats)
+        return answer
+
+    def save(self, turn, role, content, stats=None):
+        if self.history:
+            self.history.add_message(self.conversation_id, turn.id, role, content, self.model,
+                                     stats)
+
+    def close(self):
+        if self.history:
+            self.history.close()
+            self.history = None
+        if self.documents:
+            self.documents.close()
+            self.documents = None
+
+
+def chat(client, settings, model, prompts=None, show_stats=False, save_history=True):
+    """Answer prompts, piped stdin or an interactive session"""
+    # Importing requests and connecting take longer than starting up; do both while reading
+    threading.Thread(target=lambda: client.session, daemon=True).start()
+    session = HeadlessChat(client, settings, model, show_stats=show_stats,
+                           save_history=save_history)
+    interactive = prompts is None and sys.stdin.isatty()
+    if prompts is None and not interactive:
+        prompts = (line.strip() for line in sys.stdin)
+    try:
+        if not interactive:
+            for prompt in prompts:
+                if prompt:
+                    session.new_conversation()  # Batch questions don't share context
+                    session.ask(prompt)
+            return 0
+        try:
+            import readline  # noqa: F401  Line editing and recall for input()
+        except ImportError:
+            pass
+        print(f"Chatting with {model}; Ctrl-D to quit", file=sys.stderr)
+        while True:
+            try:
+                prompt = input(">>> ").strip()
+            except KeyboardInterrupt:
+                print(file=sys.stderr)
+                continue
+            except EOFError:
+                print(file=sys.stderr)
+                return 0
+            if not prompt:
+                continue
+            try:
+                session.ask(prompt)
+            except (ollama_client.RequestException, ValueError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+    except (ollama_client.RequestException, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader went away (`| head`); keep the interpreter from failing to flush stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        session.close()
+
+
+def index_docs(client, settings):
+    try:
+        from retrieval import DocumentIndex
+        index = DocumentIndex.from_settings(settings)
+    except ImportError:
+        print("Indexing documentation needs numpy", file=sys.stderr)
+        return 1
+
+    def progress(stage, done, total):
+        print(f"\r{stage} {done}/{total}", end='', file=sys.stderr, flush=True)
+    try:
+        index.update(settings['retrieval_paths'], client, progress)
+        index.load()
+    except KeyboardInterrupt:
+        print(file=sys.stderr)
+        return 130
+    finally:
+        index.close()
+    print(f"\r{len(index)} passages indexed", file=sys.stderr)
+    return 0
+
+
+def export_stats(path, model=None):
+    from telemetry import Telemetry, export
+
+    telemetry = Telemetry()
+    try:
+        samples = telemetry.samples(model)
+        export(samples, path)
+    except OSError as e:
+        print(f"Error exporting stats: {e}", file=sys.stderr)
+        return 1
+    finally:
+        telemetry.close()
+    print(f"Exported {len(samples)} samples to {path}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ollama Linux Chat command-line tools")
+    parser.add_argument('prompt', nargs='*',
+                        help="question to ask; without one, read questions from stdin")
+    parser.add_argument('--pregenerate', action='store_true',
+                        help="store answers to the suggestion prompts for instant replies")
+    parser.add_argument('--export-stats', metavar='FILE',
+                        help="write the recorded answer timings to a .csv or .json file")
+    parser.add_argument('--index-docs', action='store_true',
+                        help="build or update the index of local man pages and docs")
+    parser.add_argument('--model', help="model to use (default: the app's default model)")
+    parser.add_argument('--prompts', default=config.PROMPTS_FILE,
+                        help="file with one prompt per line")
+    parser.add_argument('--force', action='store_true',
+                        help="regenerate answers that are already stored")
+    parser.add_argument('--stats', action='store_true',
+                        help="print the server timings of each answer to stderr")
+    parser.add_argument('--no-history', action='store_true',
+                        help="don't save the conversation to the app's history")
+    args = parser.parse_args(argv)
+
+    if args.export_stats:
+        return export_stats(args.export_stats, args.model)
+    settings = config.load_settings()
+    if args.index_docs:
+        client = OllamaClient.from_settings(settings)
+        try:
+            return index_docs(client, settings)
+        finally:
+            client.close()
+    model = args.model or settings.get('default_model')
+    if not model:
+        parser.error("no --model given and no default model set in the app")
+    client = OllamaClient.from_settings(settings)
+    try:
+        if args.pregenerate:
+            return pregenerate(client, settings, model, config.load_prompts(args.prompts),
+                               args.force)
+        return chat(client, settings, model, [' '.join(args.prompt)] if args.prompt else None,
+                    args.stats, not args.no_history)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
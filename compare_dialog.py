@@ -0,0 +1,284 @@
+"""Compare mode: one prompt streamed from several models side by side."""
+import os
+from html import escape
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (QDialog, QFrame, QHBoxLayout, QLabel, QLineEdit, QListWidget,
+                               QListWidgetItem, QPushButton, QScrollArea, QSpinBox, QTextBrowser,
+                               QVBoxLayout, QWidget)
+
+from chat_engine import Conversation, TurnStats
+from generation import GenerationScheduler, GenerationWorker, RenderScheduler
+from markdown_renderer import IncrementalMarkdownRenderer
+from styles import MESSAGE_DOCUMENT_CSS, set_style_property
+
+DEFAULT_CONCURRENCY = 2
+
+
+def default_concurrency(settings):
+    """Streams to run at once: the setting, else the server's OLLAMA_NUM_PARALLEL
+
+    The environment variable is only visible here when the server runs
+    locally under the same environment.
+    """
+    if settings.get('compare_concurrency'):
+        return int(settings['compare_concurrency'])
+    try:
+        return max(1, int(os.environ.get('OLLAMA_NUM_PARALLEL', '')))
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+
+
+class CompareColumn(QFrame):
+    """Streamed answer and timings of one model"""
+
+    def __init__(self, dialog, model):
+        super().__init__()
+        self.dialog = dialog
+        self.model = model
+        self.handle = None
+        self.worker = None
+        self.stats = None
+        self.renderer = IncrementalMarkdownRenderer()
+        self.render_scheduler = RenderScheduler(self)
+        self.setObjectName("compareColumn")
+        self.state = 'queued'  # queued, running, done, cancelled or failed
+        self.setMinimumWidth(320)
+
+        layout = QVBoxLayout(self)
+        header = QHBoxLayout()
+        title = QLabel(f"<b>{escape(model)}</b>")
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+        header.addWidget(title)
+        header.addStretch()
+        header.addWidget(self.cancel_button)
+        layout.addLayout(header)
+
+        self.status_label = QLabel("Queued")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+        self.output = QTextBrowser()
+        self.output.document().setDefaultStyleSheet(MESSAGE_DOCUMENT_CSS)
+        layout.addWidget(self.output)
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        self._state = state
+        set_style_property(self, 'state', state)  # The theme outlines running and failed columns
+
+    def create_worker(self):
+        """Called by the dialog's scheduler when a stream slot is free"""
+        dialog = self.dialog
+        settings = dialog.settings
+        self.state = 'running'
+        self.status_label.setText("Waiting for the first token…")
+        self.render_scheduler.start(self.render)
+        options = {"num_ctx": settings['num_ctx']} if settings['num_ctx'] else None
+        # Timings should reflect the model, so the response cache is never used here.
+        # Each worker gets its own copy, since a summary could be inserted into it
+        worker = GenerationWorker(dialog.client, self.model, list(dialog.messages), options,
+                                  keep_alive=settings['keep_alive'])
+        worker.chunk_received.connect(self.on_chunk)
+        worker.stats_received.connect(self.on_stats)
+        worker.error.connect(self.on_error)
+        self.worker = worker
+        return worker
+
+    def cancel(self):
+        if self.state == 'running':
+            self.state = 'cancelled'
+        if self.handle:
+            self.handle.cancel()  # on_finished reports the result
+
+    def on_chunk(self, chunk):
+        if self.state != 'running':
+            return
+        if self.renderer.text == '':
+            self.status_label.setText("Streaming…")
+        self.render_scheduler.push(chunk)
+
+    def render(self, text):
+        self.renderer.append(text)
+        scrollbar = self.output.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.output.setHtml(self.renderer.html())
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def on_stats(self, data):
+        self.stats = TurnStats(data)
+
+    def on_error(self, message):
+        self.state = 'failed'
+        self.render_scheduler.cancel()
+        self.output.setPlainText(message)
+
+    def on_finished(self):
+        self.cancel_button.setEnabled(False)
+        if self.worker is None:
+            self.state = 'cancelled'
+            self.status_label.setText("Cancelled before it started")
+            return
+        self.render_scheduler.finish()
+        if self.state == 'running':
+            self.state = 'done'
+            if self.stats and self.dialog.record_telemetry:
+                self.dialog.record_telemetry(self.model, self.stats, self.worker, self.render_scheduler)
+        self.status_label.setText(self.summary())
+
+    def time_to_first_token(self):
+        worker = self.worker
+        if worker is None or worker.first_token_at is None or worker.request_started_at is None:
+            return None
+        return worker.first_token_at - worker.request_started_at
+
+    def total_seconds(self):
+        if self.stats and self.stats.total_duration:
+            return self.stats.total_duration / 1e9
+        worker = self.worker
+        if worker is None or worker.request_started_at is None or worker.finished_at is None:
+            return None
+        return worker.finished_at - worker.request_started_at
+
+    def summary(self):
+        parts = [{'done': "Done", 'cancelled': "Cancelled", 'failed': "Failed"}.get(self.state, "")]
+        ttft = self.time_to_first_token()
+        if ttft is not None:
+            parts.append(f"first token {ttft:.2f} s")
+        if self.stats and self.stats.eval_rate:
+            parts.append(f"{self.stats.eval_rate:.1f} tok/s")
+        total = self.total_seconds()
+        if total is not None:
+            parts.append(f"total {total:.2f} s")
+        return " · ".join(parts)
+
+
+class CompareDialog(QDialog):
+    """Sends one prompt to the selected models, at most `concurrency` at a time"""
+
+    def __init__(self, client, settings, system_prompt, parent=None, record_telemetry=None):
+        super().__init__(parent)
+        self.client = client
+        # Called with (model, stats, worker, render scheduler) for every completed stream
+        self.record_telemetry = record_telemetry
+        self.settings = settings
+        self.system_prompt = system_prompt
+        self.columns = []
+        self.messages = None
+        self.scheduler = GenerationScheduler(parent=self)
+        self.scheduler.queue_changed.connect(self.on_queue_changed)
+        self.setWindowTitle("Compare Models")
+        self.resize(1100, 700)
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.model_list = QListWidget()
+        self.model_list.setMaximumHeight(110)
+        controls.addWidget(self.model_list, 1)
+
+        options = QVBoxLayout()
+        self.prompt_field = QLineEdit()
+        self.prompt_field.setPlaceholderText("prompt to send to every selected model")
+        self.prompt_field.returnPressed.connect(self.run)
+        options.addWidget(self.prompt_field)
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Parallel streams"))
+        self.concurrency_box = QSpinBox()
+        self.concurrency_box.setRange(1, 16)
+        self.concurrency_box.setValue(default_concurrency(settings))
+        self.concurrency_box.setToolTip("Keep at or below the server's OLLAMA_NUM_PARALLEL; "
+                                        "1 gives each model the whole machine")
+        row.addWidget(self.concurrency_box)
+        row.addStretch()
+        self.run_button = QPushButton("Run")
+        self.run_button.clicked.connect(self.run)
+        self.cancel_all_button = QPushButton("Cancel All")
+        self.cancel_all_button.clicked.connect(self.cancel_all)
+        self.cancel_all_button.setEnabled(False)
+        row.addWidget(self.run_button)
+        row.addWidget(self.cancel_all_button)
+        options.addLayout(row)
+        controls.addLayout(options, 2)
+        layout.addLayout(controls)
+
+        self.columns_widget = QWidget()
+        self.columns_layout = QHBoxLayout(self.columns_widget)
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(self.columns_widget)
+        layout.addWidget(scroll_area, 1)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+    def set_models(self, models, selected=()):
+        checked = {self.model_list.item(i).text() for i in range(self.model_list.count())
+                   if self.model_list.item(i).checkState() == Qt.Checked} or set(selected)
+        self.model_list.clear()
+        for model in models:
+            item = QListWidgetItem(model)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if model in checked else Qt.Unchecked)
+            self.model_list.addItem(item)
+
+    def selected_models(self):
+        return [self.model_list.item(i).text() for i in range(self.model_list.count())
+                if self.model_list.item(i).checkState() == Qt.Checked]
+
+    def run(self):
+        prompt = self.prompt_field.text().strip()
+        models = self.selected_models()
+        if not prompt or not models or self.scheduler.busy:
+            return
+        for column in self.columns:
+            self.columns_layout.removeWidget(column)
+            column.hide()
+            column.deleteLater()
+        self.columns = [CompareColumn(self, model) for model in models]
+        for column in self.columns:
+            self.columns_layout.addWidget(column)
+        self.summary_label.clear()
+        self.run_button.setEnabled(False)
+        self.cancel_all_button.setEnabled(True)
+
+        conversation = Conversation(self.system_prompt)
+        self.messages, _ = conversation.messages_for(conversation.add_turn(prompt))
+        self.scheduler.max_concurrent = self.concurrency_box.value()
+        self.scheduler.max_queued = len(self.columns)
+        for column in self.columns:
+            column.handle = self.scheduler.submit(column.create_worker)
+            column.handle.finished.connect(column.on_finished)
+
+    def on_queue_changed(self):
+        if not self.scheduler.busy and self.columns:
+            self.run_button.setEnabled(True)
+            self.cancel_all_button.setEnabled(False)
+            self.summary_label.setText(self.summary())
+
+    def summary(self):
+        finished = [column for column in self.columns
+                    if column.state == 'done' and column.stats and column.stats.eval_rate]
+        if not finished:
+            return ""
+        fastest = max(finished, key=lambda column: column.stats.eval_rate)
+        parts = [f"Fastest generation: {fastest.model} ({fastest.stats.eval_rate:.1f} tok/s)"]
+        responsive = [column for column in finished if column.time_to_first_token() is not None]
+        if responsive:
+            first = min(responsive, key=lambda column: column.time_to_first_token())
+            parts.append(f"fastest first token: {first.model} ({first.time_to_first_token():.2f} s)")
+        return " · ".join(parts)
+
+    def cancel_all(self):
+        for column in self.columns:
+            if column.state == 'running':
+                column.state = 'cancelled'
+        self.scheduler.cancel_all()
+
+    def stop(self):
+        """Stop every stream and wait for the worker threads"""
+        self.scheduler.stop()
@@ -0,0 +1,97 @@
+"""Settings shared by the GUI and the command-line tools."""
+import json
+import os
+
+PROMPTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linux_prompts.txt")
+SETTINGS_FILE = os.path.expanduser("~/.ollama_chat_settings.json")
+MODELS_CACHE_FILE = os.path.expanduser("~/.ollama_chat_models.json")
+CONFIG_DIR = os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser("~/.config"),
+                          "ollama_chat")
+HISTORY_DB = os.path.join(CONFIG_DIR, "history.db")
+RESPONSE_CACHE_DB = os.path.join(CONFIG_DIR, "response_cache.db")
+PREGENERATED_DB = os.path.join(CONFIG_DIR, "pregenerated.db")
+TELEMETRY_DB = os.path.join(CONFIG_DIR, "telemetry.db")
+RETRIEVAL_DIR = os.path.join(CONFIG_DIR, "retrieval")
+
+DEFAULT_SETTINGS = {
+    'ollama_url': 'http://localhost:11434',
+    'connect_timeout': 3.05,   # Seconds to establish a connection
+    'read_timeout': 300,       # Seconds between bytes; covers model load before the first token
+    'max_retries': 3,
+    'retry_backoff': 0.5,      # urllib3 backoff factor between retries
+    'num_ctx': None,           # Context window to request; None keeps the model's own
+    'context_fraction': 0.75,  # Share of the window the prompt may use before history is trimmed
+    'summarize_history': False,  # Replace trimmed turns with a model-written summary
+    'keep_alive': '30m',       # How long Ollama keeps a model loaded after its last request
+    'model_refresh_interval': 0,  # Seconds between background model list refreshes; 0 disables
+    'save_history': True,      # Keep conversations in HISTORY_DB across restarts
+    'history_page_size': 50,   # Messages loaded at startup and per scroll back
+    'response_cache': True,    # Answer repeated questions from RESPONSE_CACHE_DB
+    'response_cache_ttl': 7 * 24 * 3600,  # Seconds a cached answer stays valid
+    'response_cache_max_mb': 50,
+    'semantic_cache': False,   # Also answer similar questions; needs numpy and an embedding model
+    'embedding_model': 'nomic-embed-text',
+    'semantic_threshold': 0.92,  # Cosine similarity a question needs to reuse an answer
+    'pregenerated_answers': True,  # Answer suggestions from `cli.py --pregenerate` output
+    'max_concurrent_generations': 2,  # Chat answers streamed at once; more are queued
+    'max_queued_generations': 8,
+    'compare_concurrency': None,  # Streams compare mode runs at once; None follows OLLAMA_NUM_PARALLEL
+    'telemetry': True,         # Record timings of every answer in TELEMETRY_DB
+    'telemetry_window': 100,   # Answers per model the stats panel's percentiles cover
+    'syntax_highlighting': True,  # Color fenced code blocks with pygments, if installed
+    'code_style': 'default',      # pygments style name
+    'highlight_cache_size': 256,  # Highlighted code blocks kept in memory
+    'retrieval': False,        # Put passages from local man pages and docs in front of questions
+    'retrieval_paths': ['/usr/share/man', '/usr/share/doc'],
+    'retrieval_top_k': 3,
+    'retrieval_embeddings': False,  # Search by embedding_model vectors instead of BM25
+    'autocomplete': True,      # Complete the input from the prompts and past questions
+    'autocomplete_items': 8,
+}
+
+
+def load_settings(path=SETTINGS_FILE):
+    """Return the stored settings merged over DEFAULT_SETTINGS"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                settings.update(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Error loading settings: {e}")
+    return settings
+
+
+def save_settings(updates, path=SETTINGS_FILE):
+    """Merge updates into the settings file, keeping keys written by other features"""
+    stored = {}
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    stored.update(updates)
+    with open(path, 'w') as f:
+        json.dump(stored, f, indent=2)
+
+
+def load_model_cache(path=MODELS_CACHE_FILE):
+    """Return the model list from the last successful /api/tags call"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_model_cache(models, path=MODELS_CACHE_FILE):
+    """Store name and digest of each model; the rest of /api/tags isn't needed at startup"""
+    with open(path, 'w') as f:
+        json.dump([{'name': m['name'], 'digest': m.get('digest')} for m in models], f)
+
+
+def load_prompts(path=PROMPTS_FILE):
+    """Suggestion prompts, one per non-empty line"""
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
@@ -0,0 +1,257 @@
+"""Conversation history kept in SQLite across restarts.
+
+Messages are appended from the GUI thread into a queue and written by a
+background thread in batched transactions, so a slow disk never stalls a
+frame. The database runs in WAL mode, which lets the GUI thread read pages of
+older messages while the writer commits. An FTS5 index over the messages is
+kept up to date by triggers in the same transactions.
+"""
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    role TEXT NOT NULL,        -- 'user' or 'assistant'
+    content TEXT NOT NULL,
+    model TEXT,
+    stats TEXT,                -- JSON of the TurnStats fields
+    created REAL NOT NULL,
+    UNIQUE (conversation_id, turn, role)
+);
+"""
+
+# External-content index: the text lives once, in messages, and the triggers
+# keep the index in step with every insert and regenerated answer
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+SNIPPET_START = '\x02'  # Marks around matched terms in snippets; no message contains them
+SNIPPET_END = '\x03'
+WORD_RE = re.compile(r'\w+')
+
+
+def search_query(text):
+    """FTS5 query matching every word of text, the last one also as a prefix
+
+    Words are quoted, so operators and punctuation typed by the user are
+    matched literally instead of being parsed as query syntax.
+    """
+    words = WORD_RE.findall(text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'  # The last word is usually still being typed
+    return ' '.join(terms)
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only risks the last commits on power loss, never corruption
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class ConversationStore:
+    """Append-only message log with paged reads
+
+    A regenerated answer replaces the stored one for its turn, keeping its
+    position. Writes are queued and applied in order by a single writer
+    thread; reads use a separate connection owned by the caller's thread.
+    """
+
+    def __init__(self, path=config.HISTORY_DB, batch_interval=0.05):
+        self.path = path
+        self.batch_interval = batch_interval  # Seconds to gather writes into one transaction
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._reader = connect(path)
+        self._reader.executescript(SCHEMA)
+        self.searchable = self._create_search_index()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    # Writing
+
+    def new_conversation_id(self):
+        """Id for a new conversation; it's stored with its first message"""
+        return uuid.uuid4().hex
+
+    def add_message(self, conversation_id, turn, role, content, model=None, stats=None):
+        """Queue a message write; returns immediately"""
+        if stats is not None and not isinstance(stats, dict):
+            stats = {field: getattr(stats, field) for field in stats.FIELDS}
+        self._put((conversation_id, turn, role, content, model,
+                   json.dumps(stats) if stats else None, time.time()))
+
+    def flush(self):
+        """Block until every queued write is committed"""
+        if self._writer:
+            self._queue.join()
+
+    def close(self):
+        if self._writer:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._reader.close()
+
+    def _put(self, record):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="history-writer",
+                                            daemon=True)
+            self._writer.start()
+        self._queue.put(record)
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            # Whatever arrives shortly after goes into the same transaction
+            deadline = time.monotonic() + self.batch_interval
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+            records = [record for record in batch if record is not None]
+            try:
+                with connection:
+                    self._write(connection, records)
+            except sqlite3.Error as e:
+                print(f"Error saving history: {e}")
+            for _ in batch:
+                self._queue.task_done()
+        connection.close()
+
+    def _write(self, connection, records):
+        for conversation_id, turn, role, content, model, stats, created in records:
+            if role == 'user':
+                connection.execute(
+                    "INSERT OR IGNORE INTO conversations (id, created, title) VALUES (?, ?, ?)",
+                    (conversation_id, created, content[:100]))
+            connection.execute(
+                "INSERT INTO messages (conversation_id, turn, role, content, model, stats, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (conversation_id, turn, role) DO UPDATE SET"
+                " content = excluded.content, model = excluded.model,"
+                " stats = excluded.stats, created = excluded.created",
+                (conversation_id, turn, role, content, model, stats, created))
+
+    def _create_search_index(self):
+        exists = self._reader.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        try:
+            with self._reader:
+                self._reader.executescript(SEARCH_SCHEMA)
+                if not exists:
+                    # Index messages written before search existed
+                    self._reader.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            print(f"History search unavailable: {e}")  # SQLite built without FTS5
+            return False
+        return True
+
+    # Reading
+
+    def latest_conversation(self):
+        """Id of the conversation with the most recent message, or None"""
+        row = self._reader.execute(
+            "SELECT conversation_id FROM messages ORDER BY id DESC LIMIT 1").fetchone()
+        return row['conversation_id'] if row else None
+
+    def load_messages(self, conversation_id, before_turn=None, limit=50):
+        """About limit of the newest messages older than before_turn, by turn, prompt first
+
+        Pages always hold whole turns, so a prompt is never separated from its
+        answer. Each message is a dict with turn, role, content, model and stats.
+        """
+        before_turn = before_turn if before_turn is not None else 2 ** 62
+        boundary = self._reader.execute(
+            "SELECT turn FROM messages WHERE conversation_id = ? AND turn < ?"
+            " ORDER BY turn DESC, id DESC LIMIT 1 OFFSET ?",
+            (conversation_id, before_turn, max(0, limit - 1))).fetchone()
+        rows = self._reader.execute(
+            "SELECT turn, role, content, model, stats FROM messages"
+            " WHERE conversation_id = ? AND turn >= ? AND turn < ?"
+            " ORDER BY turn, role = 'assistant'",
+            (conversation_id, boundary['turn'] if boundary else 0, before_turn)).fetchall()
+        messages = []
+        for row in rows:
+            message = dict(row)
+            message['stats'] = json.loads(row['stats']) if row['stats'] else None
+            messages.append(message)
+        return messages
+
+    def count_messages(self, conversation_id, from_turn, before_turn=None):
+        """Number of messages in turns from_turn up to before_turn"""
+        before_turn = before_turn if before_turn is not None else 2 ** 62
+        return self._reader.execute(
+            "SELECT COUNT(*) FROM messages WHERE conversation_id = ? AND turn >= ? AND turn < ?",
+            (conversation_id, from_turn, before_turn)).fetchone()[0]
+
+    def question_counts(self, max_chars=200):
+        """(question, times asked) of every single-line question, the last asked last
+
+        Reads through a connection of its own, so any thread may call it.
+        """
+        connection = connect(self.path)
+        try:
+            return connection.execute(
+                "SELECT content, COUNT(*) FROM messages WHERE role = 'user'"
+                " AND length(content) <= ? AND instr(content, char(10)) = 0"
+                " GROUP BY content ORDER BY MAX(id)", (max_chars,)).fetchall()
+        finally:
+            connection.close()
+
+    def search(self, text, limit=50):
+        """Newest messages containing every word of text
+
+        Each result is a dict with conversation_id, turn, role, created, the
+        conversation title and a snippet whose matches are wrapped in
+        SNIPPET_START and SNIPPET_END. Walking the index newest first lets a
+        common word stop after limit hits instead of ranking every match.
+        """
+        query = search_query(text)
+        if not self.searchable or query is None:
+            return []
+        rows = self._reader.execute(
+            "SELECT m.conversation_id, m.turn, m.role, m.created, c.title,"
+            " snippet(messages_fts, 0, ?, ?, '…', 16) AS snippet"
+            " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+            " LEFT JOIN conversations c ON c.id = m.conversation_id"
+            " WHERE messages_fts MATCH ? ORDER BY messages_fts.rowid DESC LIMIT ?",
+            (SNIPPET_START, SNIPPET_END, query, limit)).fetchall()
+        return [dict(row) for row in rows]
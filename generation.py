@@ -0,0 +1,366 @@
+"""Streaming chat completions off the GUI thread, a few at a time, and showing them at frame rate."""
+import threading
+import time
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+import ollama_client
+from chat_engine import summarize_turns
+
+
+class GenerationWorker(QThread):
+    """Streams a chat completion from Ollama off the GUI thread"""
+    chunk_received = Signal(str)
+    stats_received = Signal(dict)  # Final stream object with the server timings
+    summary_ready = Signal(str)
+    passages_found = Signal(list)  # Titles of the documentation passages put before the question
+    cache_hit = Signal(object)  # CacheHit; the answer follows as one chunk
+    completed = Signal()
+    error = Signal(str)
+
+    def __init__(self, client, model_name, messages, options=None, summarize=None,
+                 keep_alive=None, cache=None, use_cache=True, retriever=None, top_k=3,
+                 budget=None):
+        super().__init__()
+        self.client = client
+        self.model_name = model_name
+        self.messages = messages
+        self.options = options
+        self.keep_alive = keep_alive
+        # Answers are stored in cache; use_cache=False only skips the lookup
+        self.cache = cache
+        self.use_cache = use_cache
+        # (previous summary, dropped turns) to condense before the request is sent
+        self.summarize = summarize
+        # DocumentIndex whose best passages go in front of the question, in the
+        # room the ContextBudget leaves after the history
+        self.retriever = retriever
+        self.top_k = top_k
+        self.budget = budget
+        self._is_running = True
+        self._response = None
+        self._lock = threading.Lock()
+        # perf_counter() times, set by the worker thread and read once it has finished
+        self.request_started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+
+    def stop(self):
+        """Cancel the stream, interrupting a blocked socket read"""
+        self._is_running = False
+        with self._lock:
+            response = self._response
+        if response is not None:
+            # shutdown() wakes a reader blocked in recv(); close() alone waits for the next line
+            shutdown = getattr(response.raw, 'shutdown', None)
+            if shutdown:
+                shutdown()
+            response.close()
+
+    def run(self):
+        response = None
+        try:
+            if self.summarize:
+                self.add_summary(*self.summarize)
+            cache_request = None
+            if self.cache:
+                cache_request = self.cache.request(self.model_name, self.messages, self.options)
+                hit = self.cache.lookup(cache_request, self.client) if self.use_cache else None
+                if hit:
+                    self.cache_hit.emit(hit)
+                    self.chunk_received.emit(hit.response)
+                    return
+            if self.retriever:
+                self.add_passages()
+            payload = {
+                "model": self.model_name,
+                "messages": self.messages,
+                "stream": True
+            }
+            if self.options:
+                payload["options"] = self.options
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            self.request_started_at = time.perf_counter()
+            response = self.client.chat(payload, stream=True)
+            with self._lock:
+                self._response = response
+            if not self._is_running:
+                return
+
+            if response.status_code != 200:
+                self.error.emit("Error: Failed to get response from Ollama")
+                return
+
+            # Emit every token decoded from one network read as a single batch
+            parts = []
+            done = False
+            for events in ollama_client.iter_stream_events(response):
+                if not self._is_running:
+                    break
+                batch = []
+                for kind, value in events:
+                    if kind == ollama_client.TOKEN:
+                        batch.append(value)
+                    elif kind == ollama_client.DONE:
+                        done = True
+                        self.stats_received.emit(value)
+                    else:
+                        self.error.emit(f"Error: {value}")
+                        return
+                if batch:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    parts.extend(batch)
+                    self.chunk_received.emit(''.join(batch))
+            if done and self._is_running and cache_request:
+                self.cache.put(cache_request, ''.join(parts))
+        except ollama_client.RequestException as e:
+            if self._is_running:
+                self.error.emit(f"Error: Cannot connect to Ollama service: {str(e)}")
+        except Exception as e:
+            # A stopped stream surfaces as an arbitrary read error on the closed socket
+            if self._is_running:
+                self.error.emit(f"Error: {str(e)}")
+        finally:
+            self.finished_at = time.perf_counter()
+            with self._lock:
+                self._response = None
+            if response is not None:
+                response.close()
+            self.completed.emit()
+
+    def add_passages(self):
+        """Ground the question in the passages of the local documentation that match it best
+
+        Only the request changes; the conversation and the cache keep the bare question.
+        """
+        from retrieval import fit_passages, ground_prompt, passage_room
+        question = self.messages[-1]['content']
+        try:
+            passages = self.retriever.search(question, self.top_k, self.client)
+        except Exception as e:
+            print(f"Error searching documentation: {str(e)}")
+            return
+        if self.budget:
+            passages = fit_passages(passages, passage_room(self.budget, self.messages))
+        if passages:
+            self.messages[-1] = {"role": "user", "content": ground_prompt(question, passages)}
+            self.passages_found.emit([passage.title for passage in passages])
+
+    def add_summary(self, previous_summary, turns):
+        """Summarize trimmed turns and put the summary after the system prompt"""
+        try:
+            summary = summarize_turns(self.client, self.model_name, turns, previous_summary)
+        except (ollama_client.RequestException, KeyError, ValueError) as e:
+            print(f"Error summarizing history: {str(e)}")
+            return
+        if previous_summary:
+            del self.messages[1]
+        self.messages.insert(1, {"role": "system",
+                                 "content": f"Summary of the earlier conversation:\n{summary}"})
+        self.summary_ready.emit(summary)
+
+
+class RenderScheduler(QObject):
+    """Coalesces streamed tokens so the message widget updates at most once per frame"""
+    FRAME_INTERVAL_MS = 16
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.flush_callback = None
+        self.pending = []
+        self.first_pending_at = None
+        self.latencies = []    # Token arrival to widget update, in seconds
+        self.render_times = []  # Time spent in flush_callback, in seconds
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def start(self, flush_callback):
+        """Begin a new stream; flush_callback receives the text collected during a frame"""
+        self.cancel()
+        self.flush_callback = flush_callback
+        self.latencies = []
+        self.render_times = []
+
+    def push(self, text):
+        if not self.pending:
+            self.first_pending_at = time.perf_counter()
+        self.pending.append(text)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        if not self.pending:
+            self.timer.stop()
+            return
+        text = ''.join(self.pending)
+        self.pending = []
+        started = time.perf_counter()
+        if self.flush_callback:
+            self.flush_callback(text)
+        finished = time.perf_counter()
+        self.render_times.append(finished - started)
+        self.latencies.append(finished - self.first_pending_at)
+        self.first_pending_at = None
+
+    def finish(self):
+        """Flush whatever is left and stop the frame timer"""
+        self.flush()
+        self.timer.stop()
+        self.flush_callback = None
+
+    def cancel(self):
+        """Drop pending text without rendering it"""
+        self.timer.stop()
+        self.pending = []
+        self.first_pending_at = None
+        self.flush_callback = None
+
+    def latency_summary(self):
+        if not self.latencies:
+            return ""
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (f"{len(latencies)} frames · token-to-update latency avg "
+                f"{sum(latencies) / len(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms · render avg "
+                f"{sum(self.render_times) / len(self.render_times) * 1000:.1f} ms")
+
+
+class GenerationHandle(QObject):
+    """One request submitted to a GenerationScheduler
+
+    The scheduler deletes it after `finished`, so keep only Python state
+    (state, worker) once it has fired.
+    """
+    finished = Signal()  # Also emitted for a request cancelled while queued
+
+    def __init__(self, scheduler, create_worker, after=()):
+        super().__init__(scheduler)
+        self.scheduler = scheduler
+        self.create_worker = create_worker
+        self.after = [handle for handle in after if handle.active]
+        self.state = 'queued'  # queued, running, done or cancelled
+        self.worker = None
+
+    @property
+    def active(self):
+        return self.state in ('queued', 'running')
+
+    @property
+    def cancelled(self):
+        return self.state == 'cancelled'
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+
+class GenerationScheduler(QObject):
+    """Runs generation requests with bounded concurrency and a bounded queue.
+
+    submit() takes a function that builds the GenerationWorker; it's called
+    only when the request starts, so a queued request sees everything that
+    finished before it (a queued follow-up question includes the answer it
+    follows). A request can also wait for other handles, and starts once all
+    of them are finished, in submission order otherwise.
+    """
+    queue_changed = Signal()
+
+    def __init__(self, max_concurrent=1, max_queued=8, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queued = []
+        self.running = []
+        self.workers = set()  # Keep workers alive until their thread exits, even when cancelled
+
+    @property
+    def busy(self):
+        return bool(self.queued or self.running)
+
+    @property
+    def full(self):
+        return len(self.queued) >= self.max_queued
+
+    def submit(self, create_worker, after=()):
+        """Queue a request; returns its handle, or None when the queue is full"""
+        if self.full:
+            return None
+        handle = GenerationHandle(self, create_worker, after)
+        self.queued.append(handle)
+        self.start_ready()
+        self.queue_changed.emit()
+        return handle
+
+    def start_ready(self):
+        for handle in list(self.queued):
+            if len(self.running) >= self.max_concurrent:
+                break
+            if any(dependency.active for dependency in handle.after):
+                continue
+            self.queued.remove(handle)
+            self.running.append(handle)
+            handle.state = 'running'
+            worker = handle.create_worker()
+            handle.worker = worker
+            # Connected after the owner's slots, so they see the last chunk first
+            worker.completed.connect(self.on_worker_completed)
+            worker.finished.connect(self.on_worker_thread_finished)
+            self.workers.add(worker)
+            worker.start()
+
+    def cancel(self, handle):
+        if handle.state == 'queued':
+            self.queued.remove(handle)
+            handle.state = 'cancelled'
+            self.finish(handle)
+            self.start_ready()
+            self.queue_changed.emit()
+        elif handle.state == 'running':
+            handle.state = 'cancelled'
+            handle.worker.stop()  # on_worker_completed finishes it
+
+    def cancel_all(self):
+        if not self.busy:
+            return
+        # Drop the queue first so cancelling a running request doesn't start the next one
+        queued, self.queued = self.queued, []
+        for handle in queued:
+            handle.state = 'cancelled'
+            self.finish(handle)
+        for handle in list(self.running):
+            self.cancel(handle)
+        self.queue_changed.emit()
+
+    def stop(self):
+        """Cancel everything and wait for the worker threads"""
+        self.cancel_all()
+        for worker in list(self.workers):
+            worker.wait()
+        self.workers.clear()
+
+    def on_worker_completed(self):
+        worker = self.sender()
+        handle = next((h for h in self.running if h.worker is worker), None)
+        if handle is None:
+            return
+        self.running.remove(handle)
+        if handle.state == 'running':
+            handle.state = 'done'
+        self.finish(handle)
+        self.start_ready()
+        self.queue_changed.emit()
+
+    def finish(self, handle):
+        handle.finished.emit()
+        # Each handle holds its owner through create_worker; don't keep them for the session
+        handle.create_worker = None
+        handle.after = []
+        handle.deleteLater()
+
+    def on_worker_thread_finished(self):
+        worker = self.sender()
+        self.workers.discard(worker)
+        worker.deleteLater()
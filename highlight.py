@@ -0,0 +1,106 @@
+"""Syntax highlighting of fenced code blocks, off the GUI thread.
+
+markdown2 marks each closed fence with its language (the highlightjs-lang
+extra) instead of running pygments inline. CodeHighlighter.apply() swaps in
+highlighted HTML for blocks it has already seen and hands the others to a
+thread pool; `highlighted` fires when results arrive so views can repaint.
+A fence that is still streaming has no closing line, so markdown2 doesn't
+mark it and it isn't highlighted until it's complete.
+
+pygments is optional; without it code blocks stay plain.
+"""
+import hashlib
+import importlib.util
+import re
+from collections import OrderedDict
+from html import unescape
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+CODE_BLOCK_RE = re.compile(r'<pre><code class="([\w+-]+) language-\1">(.*?)</code></pre>', re.S)
+
+
+def highlight_code(language, code, style='default'):
+    """HTML spans with inline colors for code; None if pygments doesn't know the language"""
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+    try:
+        lexer = get_lexer_by_name(language, stripnl=False)
+    except ClassNotFound:
+        return None
+    # QTextDocument ignores stylesheet classes on spans, so colors are inlined
+    html = highlight(code, lexer, HtmlFormatter(nowrap=True, noclasses=True, style=style))
+    return html[:-1] if html.endswith('\n') and not code.endswith('\n') else html
+
+
+class HighlightSignals(QObject):
+    done = Signal(object, object)  # Cache key, HTML or None
+
+
+class HighlightJob(QRunnable):
+    def __init__(self, key, language, code, style):
+        super().__init__()
+        self.key = key
+        self.language = language
+        self.code = code
+        self.style = style
+        self.signals = HighlightSignals()
+
+    def run(self):
+        try:
+            html = highlight_code(self.language, self.code, self.style)
+        except Exception as e:
+            print(f"Error highlighting code: {e}")
+            html = None
+        self.signals.done.emit(self.key, html)
+
+
+class CodeHighlighter(QObject):
+    """Highlighted code blocks by (language, code hash), kept in an LRU"""
+    highlighted = Signal()
+
+    def __init__(self, parent=None, cache_size=256, threads=2, style='default'):
+        super().__init__(parent)
+        self.available = importlib.util.find_spec('pygments') is not None
+        self.cache_size = cache_size
+        self.style = style
+        self.cache = OrderedDict()  # Key -> highlighted HTML, or None for unknown languages
+        self.pending = {}  # Key -> running HighlightJob
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+
+    def apply(self, html):
+        """html with every finished code block that has been highlighted colored"""
+        if not self.available or 'language-' not in html:
+            return html
+        return CODE_BLOCK_RE.sub(self.substitute, html)
+
+    def substitute(self, match):
+        language, escaped = match.group(1), match.group(2)
+        key = (language, hashlib.sha1(escaped.encode()).digest())
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            colored = self.cache[key]
+            if colored is not None:
+                return f'<pre><code>{colored}</code></pre>'
+        elif key not in self.pending:
+            job = HighlightJob(key, language, unescape(escaped), self.style)
+            job.signals.done.connect(self.on_done)
+            self.pending[key] = job
+            self.pool.start(job)
+        return match.group(0)
+
+    def on_done(self, key, html):
+        self.pending.pop(key, None)
+        self.cache[key] = html
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        if html is not None:
+            self.highlighted.emit()
+
+    def stop(self):
+        """Wait for running jobs; call before the application exits"""
+        self.pool.clear()
+        self.pool.waitForDone()
@@ -1,44 +1,94 @@
-from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, 
-                             QVBoxLayout, QTextEdit, QLineEdit, QPushButton,
+import sys
+
+if __name__ == '__main__' and '--cli' in sys.argv:
+    # Headless mode; dispatched before anything imports Qt
+    import cli
+    sys.exit(cli.main([arg for arg in sys.argv[1:] if arg != '--cli']))
+
+from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget,
+                             QVBoxLayout, QLineEdit, QPushButton,
                              QComboBox, QHBoxLayout, QGroupBox, QLabel,
-                             QProgressDialog, QDialog, QFrame)
-from PySide6.QtCore import Qt, QTimer, QSize, QThread, Signal
+                             QFrame, QMenu)
+from PySide6.QtCore import Qt, QTimer, QThread, Signal, QObject, QEvent, QRectF
 # Explicitly import each QtGui component
-from PySide6.QtGui import (QPainter,  # Add this explicit import
+from PySide6.QtGui import (QPainter,
                           QColor,
                           QRadialGradient,
-                          QPen,
-                          QTextCursor)  # Add QTextCursor import
-import sys
-import requests
-import json
-import os
+                          QPixmap,
+                          QKeySequence,
+                          QShortcut)
 import random
-import threading
-import markdown2  # Replace markdown with markdown2 for better HTML conversion
+from html import escape
+import time
 # Add this import at the top with other imports
-from styles import (GLOBAL_STYLE, WELCOME_BOX_STYLE, SUGGESTIONS_BOX_STYLE,
-                   CHAT_DISPLAY_STYLE, LOADING_OVERLAY_STYLE, USER_MESSAGE_STYLE,
-                   AI_MESSAGE_STYLE, STOP_BUTTON_STYLE, RELOAD_BUTTON_STYLE,
-                   SYSTEM_MESSAGE_STYLE, REFRESH_BUTTON_STYLE, DISABLED_INPUT_STYLE)
-from PySide6.QtWidgets import QScrollArea
+from styles import apply_theme
+from transcript import MessageItem, TranscriptView
+from markdown_renderer import IncrementalMarkdownRenderer
+from generation import GenerationScheduler, GenerationWorker, RenderScheduler
+import ollama_client
+from ollama_client import OllamaClient
+from chat_engine import (Conversation, ContextBudget, DEFAULT_NUM_CTX, DEFAULT_SYSTEM_PROMPT,
+                         TurnStats, context_window_from_show,
+                         turns_from_messages)
+import config
 
 class QProgressIndicator(QWidget):
+    """Spinner that only animates while it is visible and its window isn't minimized"""
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.angle = 0
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.rotate)
-        self.timer.start(16)  # ~60 FPS for smoother animation
+        self.timer.setInterval(16)  # ~60 FPS for smoother animation
         self.setFixedSize(96, 96)  # Even bigger size
         self.opacity = 1.0
+        self.frame = None  # Arcs pre-rendered at angle 0, rotated when painting
+        self.watched_window = None
 
     def rotate(self):
         self.angle = (self.angle + 5) % 360  # Smaller increments for smoother rotation
         self.update()
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Watch the top-level window so the animation pauses while it is minimized
+        window = self.window()
+        if window is not self and window is not self.watched_window:
+            if self.watched_window is not None:
+                self.watched_window.removeEventFilter(self)
+            window.installEventFilter(self)
+            self.watched_window = window
+        self.update_animation()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.update_animation()
+        return False
+
+    def update_animation(self):
+        if self.isVisible() and not self.window().isMinimized():
+            if not self.timer.isActive():
+                self.timer.start()
+        else:
+            self.timer.stop()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.frame = None
+
+    def render_frame(self):
+        """Draw the gradient arcs once; every tick only rotates this image"""
+        ratio = self.devicePixelRatioF()
+        frame = QPixmap(self.size() * ratio)
+        frame.setDevicePixelRatio(ratio)
+        frame.fill(Qt.transparent)
+
+        painter = QPainter(frame)
         painter.setRenderHint(QPainter.Antialiasing)
         
         # Center point
@@ -63,83 +113,339 @@ class QProgressIndicator(QWidget):
         for i in range(3):
             painter.setOpacity(1.0 - (i * 0.3))
             span = 120 - (i * 30)  # Decreasing span for trailing effect
-            painter.drawPie(rect, (self.angle - i * 10) * 16, span * 16)
+            painter.drawPie(rect, (-i * 10) * 16, span * 16)
+        painter.end()
+        return frame
+
+    def paintEvent(self, event):
+        if self.frame is None:
+            self.frame = self.render_frame()
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        # The gradient is radial, so rotating the frame matches redrawing it at the new angle
+        center = QRectF(self.rect()).center()
+        painter.translate(center)
+        painter.rotate(-self.angle)  # drawPie angles run counter-clockwise
+        painter.translate(-center)
+        painter.drawPixmap(0, 0, self.frame)
 
-# Add new worker class for async reload
-class ReloadWorker(QThread):
-    finished = Signal()
+class ModelLifecycleWorker(QThread):
+    """Loads or unloads a model in the background"""
+    completed = Signal(str, str)  # Last action, model name
     error = Signal(str)
-    
-    def __init__(self, model_name):
+
+    def __init__(self, client, model_name, actions, keep_alive=None):
         super().__init__()
+        self.client = client
         self.model_name = model_name
+        self.actions = actions  # Sequence of 'unload' / 'preload'
+        self.keep_alive = keep_alive
         self._is_running = True
-        
+
     def stop(self):
         self._is_running = False
-        
+
     def run(self):
-        if not self._is_running:
-            return
         try:
-            # First copy the model to unload it from memory
-            requests.post('http://localhost:11434/api/copy',
-                        json={"source": self.model_name, "destination": self.model_name})
-            
-            # Create a new session to force model reload
-            requests.post('http://localhost:11434/api/generate',
-                        json={
-                            "model": self.model_name,
-                            "prompt": "test",
-                            "stream": False
-                        })
-            self.finished.emit()
-        except requests.exceptions.RequestException:
+            for action in self.actions:
+                if not self._is_running:
+                    return
+                if action == 'unload':
+                    response = self.client.unload(self.model_name)
+                else:
+                    response = self.client.preload(self.model_name, self.keep_alive)
+                if response.status_code != 200:
+                    self.error.emit(f"Failed to {action} {self.model_name}")
+                    return
+            self.completed.emit(self.actions[-1], self.model_name)
+        except ollama_client.RequestException:
             self.error.emit("Cannot connect to Ollama service")
 
+class ModelListWorker(QThread):
+    """Fetches the installed models from /api/tags in the background"""
+    models_received = Signal(list)
+    error = Signal(str)
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def run(self):
+        try:
+            response = self.client.tags()
+            if response.status_code == 200:
+                self.models_received.emit(response.json()['models'])
+            else:
+                self.error.emit("Error: Failed to fetch models")
+        except ollama_client.RequestException:
+            self.error.emit("Error: Cannot connect to Ollama service")
+
+class ModelInfoWorker(QThread):
+    """Fetches /api/show for a model in the background"""
+    info_received = Signal(str, dict)
+
+    def __init__(self, client, model_name):
+        super().__init__()
+        self.client = client
+        self.model_name = model_name
+
+    def run(self):
+        try:
+            response = self.client.show(self.model_name)
+            if response.status_code == 200:
+                self.info_received.emit(self.model_name, response.json())
+        except ollama_client.RequestException as e:
+            print(f"Error fetching model info: {str(e)}")
+
+class DocumentIndexWorker(QThread):
+    """Brings the local documentation index up to date in the background"""
+    index_ready = Signal(object)  # DocumentIndex, loaded
+
+    def __init__(self, client, settings):
+        super().__init__()
+        self.client = client
+        self.settings = settings
+        self._is_running = True
+
+    def stop(self):
+        self._is_running = False
+
+    def run(self):
+        try:
+            from retrieval import DocumentIndex
+            index = DocumentIndex.from_settings(self.settings)
+        except ImportError:
+            print("Documentation retrieval disabled: numpy is not installed")
+            return
+        except Exception as e:
+            print(f"Error opening documentation index: {e}")
+            return
+        try:
+            # After the first run this only compares file mtimes
+            if (index.update(self.settings['retrieval_paths'], self.client,
+                             should_stop=lambda: not self._is_running) and index.load()):
+                self.index_ready.emit(index)
+                return
+        except Exception as e:
+            print(f"Error indexing documentation: {e}")
+        index.close()
+
+class CompletionIndexWorker(QThread):
+    """Builds the input field's completion index from the prompts and the history"""
+    index_ready = Signal(object)  # PrefixIndex
+
+    def __init__(self, prompts, history):
+        super().__init__()
+        self.prompts = prompts
+        self.history = history
+
+    def run(self):
+        from autocomplete import MAX_QUESTION_CHARS, PrefixIndex
+        questions = [(prompt, 0) for prompt in self.prompts]
+        try:
+            if self.history:
+                questions.extend(self.history.question_counts(MAX_QUESTION_CHARS))
+        except Exception as e:
+            print(f"Error reading past questions: {e}")
+        self.index_ready.emit(PrefixIndex(questions))
+
+class ChatGeneration(QObject):
+    """State of one answer being generated into a transcript item"""
+
+    def __init__(self, window, item, use_cache=True):
+        super().__init__(window)
+        self.window = window
+        self.item = item
+        self.turn = item.turn
+        self.use_cache = use_cache
+        self.model = window.model_selector.currentText()
+        self.handle = None
+        self.worker = None
+        self.stats = None
+        self.cache_hit = None
+        self.sources = []  # Titles of the documentation passages the question was sent with
+        self.failed = False
+        self.discarded = False  # The chat was cleared; late signals are ignored
+        self.messages = None
+        self.budget = None
+        self.renderer = IncrementalMarkdownRenderer()
+        self.render_scheduler = RenderScheduler(self)
+        # A reloaded answer stays on screen until the first chunk replaces it
+        self.previous_stats_text = item.stats_text
+        self.previous_tooltip = item.tooltip
+
+    def create_worker(self):
+        """Called by the scheduler when the request starts, so earlier answers are included"""
+        window = self.window
+        item = self.item
+        item.stats_text = self.previous_stats_text  # Drops "Queued…"
+        window.transcript_view.update_item(item)
+        self.render_scheduler.start(self.render)
+
+        self.budget = window.context_budget(self.model)
+        settings = window.settings
+        retriever = window.document_index
+        self.messages, dropped = window.conversation.messages_for(self.turn, self.budget)
+        summarize = None
+        if dropped and window.settings['summarize_history']:
+            summarize = (window.conversation.summary, dropped)
+        options = {"num_ctx": settings['num_ctx']} if settings['num_ctx'] else None
+        worker = GenerationWorker(window.client, self.model, self.messages, options, summarize,
+                                  settings['keep_alive'], window.response_cache, self.use_cache,
+                                  retriever, settings['retrieval_top_k'], self.budget)
+        worker.cache_hit.connect(self.on_cache_hit)
+        worker.chunk_received.connect(self.on_chunk)
+        worker.stats_received.connect(self.on_stats)
+        worker.summary_ready.connect(self.on_summary)
+        worker.passages_found.connect(self.on_passages)
+        worker.error.connect(self.on_error)
+        self.worker = worker
+        return worker
+
+    def on_chunk(self, chunk):
+        if self.handle.cancelled or self.discarded:
+            return
+        self.render_scheduler.push(chunk)
+
+    def render(self, text):
+        """Append coalesced stream text to the AI message"""
+        if not self.renderer.text:
+            self.item.stats_text = ''
+            self.item.tooltip = ''
+        self.renderer.append(text)
+        try:
+            self.item.set_html(self.renderer.html(), self.renderer.text)
+            self.window.transcript_view.update_item(self.item)
+        except Exception as e:
+            print(f"Error formatting response: {str(e)}")
+
+    def on_stats(self, data):
+        self.stats = TurnStats(data)
+        self.budget.observe(self.messages, self.stats.prompt_eval_count)
+
+    def on_cache_hit(self, hit):
+        self.cache_hit = hit
+
+    def on_passages(self, titles):
+        self.sources = titles
+
+    def on_summary(self, summary):
+        if not self.discarded:
+            self.window.conversation.summary = summary
+
+    def on_error(self, error_message):
+        if self.discarded:
+            return
+        self.failed = True
+        self.render_scheduler.cancel()
+        self.item.set_html(escape(error_message), error_message)
+        self.window.transcript_view.update_item(self.item)
+
+    def on_finished(self):
+        # The worker and handle are deleted by the scheduler; the transcript item keeps the answer
+        self.deleteLater()
+        if self.discarded:
+            self.render_scheduler.cancel()
+            return
+        window = self.window
+        window.generations.remove(self)
+        item = self.item
+        item.generating = False
+        if self.worker is None:
+            # Cancelled while queued; a reloaded answer keeps its old text
+            item.stats_text = "Cancelled before it started"
+            window.transcript_view.update_item(item)
+            return
+        self.render_scheduler.finish()
+        if self.handle.cancelled and not self.renderer.text and not self.failed:
+            # Stopped before any text: a reloaded answer stays, in the conversation and history
+            if self.turn.response is None:
+                item.stats_text = "Stopped before the first token"
+            else:
+                item.stats_text = self.previous_stats_text
+                item.tooltip = self.previous_tooltip
+            window.transcript_view.update_item(item)
+            return
+        item.tooltip = self.render_scheduler.latency_summary()
+        if not self.failed:
+            # A stopped turn keeps its partial answer, which matches what the server cached
+            window.conversation.complete_turn(self.turn, self.renderer.text, self.stats)
+            window.save_history_message(self.turn, 'assistant', self.renderer.text, self.model,
+                                        self.stats)
+        if self.cache_hit:
+            item.stats_text = f"{self.cache_hit.summary()} · ↻ to regenerate"
+        elif self.stats:
+            item.stats_text = self.stats.summary()
+            worker = self.worker
+            if worker.first_token_at is not None:
+                first_token = worker.first_token_at - worker.request_started_at
+                item.stats_text = f"first token {first_token:.2f} s · {item.stats_text}"
+            if window.telemetry and not self.handle.cancelled:
+                window.record_telemetry(self.model, self.stats, worker, self.render_scheduler)
+        if self.sources and not self.cache_hit:
+            sources = f"docs: {', '.join(self.sources)}"
+            item.stats_text = f"{item.stats_text} · {sources}" if item.stats_text else sources
+        window.transcript_view.update_item(item)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.current_prompt = None  # Add this line to store the original message
         self.reload_worker = None
-        self.current_ai_labels = {}  # Add this line to store AI message labels
+        self.model_workers = set()  # Lifecycle workers that are still running
+        self.model_list_worker = None
+        self.model_digests = {}  # Model name -> digest reported by /api/tags
+        self.context_budgets = {}  # Model name -> ContextBudget
+        self.model_info_workers = set()
+        self.generations = []  # ChatGeneration of every queued or running answer
         # Add system prompt constant at the start of the class
-        self.SYSTEM_PROMPT = """You are a highly experienced Linux system administrator and expert.
-Your role is to:
-- Provide accurate and detailed explanations of Linux commands, concepts, and best practices
-- Give practical examples and use cases
-- Explain security implications when relevant
-- Recommend modern and efficient solutions
-- Help users understand Linux system internals
-- Share professional tips and common pitfalls to avoid
-Be concise but thorough in your responses."""
+        self.SYSTEM_PROMPT = DEFAULT_SYSTEM_PROMPT
+        self.conversation = Conversation(self.SYSTEM_PROMPT)
+        self.history = None  # ConversationStore, opened after the window is shown
+        self.conversation_id = None
+        self.oldest_loaded_turn = None
+        self.history_exhausted = True
+        self.search_dialog = None
+        self.response_cache = None  # ResponseCache, opened after the window is shown
+        self.pregenerated = None  # PregeneratedAnswers for the suggestion prompts
+        self.telemetry = None  # Telemetry of every streamed answer
+        self.highlighter = None  # Colors code blocks off the GUI thread
+        self.document_index = None  # DocumentIndex of local man pages and docs, once it's ready
+        self.document_index_worker = None
+        self.completer = None  # InputCompleter of the input field
+        self.completion_index_worker = None
+        self.stats_dialog = None
+        self.compare_dialog = None
 
         # Load Linux prompts from file
         self.linux_prompts = []
         try:
-            prompts_file = os.path.join(os.path.dirname(__file__), 'linux_prompts.txt')
-            with open(prompts_file, 'r') as f:
-                self.linux_prompts = [line.strip() for line in f if line.strip()]
+            self.linux_prompts = config.load_prompts()
         except Exception as e:
             print(f"Error loading prompts: {e}")
             # Fallback to empty list if file can't be loaded
             self.linux_prompts = []
 
         self.setWindowTitle("Ollama Chat")
-        self.settings_file = os.path.expanduser("~/.ollama_chat_settings.json")
+        self.settings_file = config.SETTINGS_FILE
+        self.settings = config.load_settings(self.settings_file)
+        self.client = OllamaClient.from_settings(self.settings)
         
         # Get screen dimensions
         screen = QApplication.primaryScreen().geometry()
         width = int(screen.width() * 0.25)  # 25% of screen width
         self.setGeometry(0, 0, width, screen.height())
         
-        # Set global font size for the application
-        self.setStyleSheet(GLOBAL_STYLE)
+        # Every widget is styled by the application theme, set once
+        apply_theme(QApplication.instance())
         
         # Create central widget and layout
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
+        self.main_layout = layout
         
         # Create model control container
         model_container = QWidget()
@@ -151,25 +457,110 @@ Be concise but thorough in your responses."""
         self.refresh_button = QPushButton("Refresh Models")
         self.set_default_button = QPushButton("Set as Default")
         self.reload_button = QPushButton("Reload Model")
-        self.progress_indicator = QProgressIndicator()
-        self.progress_indicator.hide()  # Hidden by default
+        self.unload_button = QPushButton("Unload Model")
         
-        self.refresh_button.clicked.connect(self.fetch_models)
+        self.model_selector.currentTextChanged.connect(self.on_model_changed)
+        self.refresh_button.clicked.connect(lambda: self.fetch_models())
         self.set_default_button.clicked.connect(self.set_default_model)
         self.reload_button.clicked.connect(self.reload_model)
+        self.unload_button.clicked.connect(self.unload_model)
+
+        # Preload the selected model once the selection settles
+        self.preload_timer = QTimer(self)
+        self.preload_timer.setSingleShot(True)
+        self.preload_timer.setInterval(300)
+        self.preload_timer.timeout.connect(self.preload_selected_model)
         
         model_layout.addWidget(self.model_selector)
         model_layout.addWidget(self.refresh_button)
         model_layout.addWidget(self.set_default_button)
         model_layout.addWidget(self.reload_button)
-        model_layout.addWidget(self.progress_indicator)
+        model_layout.addWidget(self.unload_button)
+        self.model_layout = model_layout
         
         model_container_layout.addLayout(model_layout)
         layout.addWidget(model_container)
         
+        # Messages are painted by a delegate; only the visible ones are laid out
+        self.transcript_view = TranscriptView()
+        self.transcript = self.transcript_view.transcript
+        self.transcript_view.message_delegate.stop_requested.connect(self.stop_message)
+        self.transcript_view.message_delegate.reload_requested.connect(self.reload_message)
+        self.transcript_view.context_menu_requested.connect(self.show_message_menu)
+        self.transcript_view.top_reached.connect(self.on_transcript_top_reached)
+        layout.addWidget(self.transcript_view)
+        
+        # Create input field with random placeholder
+        self.input_field = QLineEdit()
+        self.input_field.setPlaceholderText("type here or choose a suggestion")
+        self.input_field.returnPressed.connect(self.send_message)
+        layout.addWidget(self.input_field)
+        
+        # Create button layout (remove refresh suggestions button from here)
+        button_layout = QHBoxLayout()
+        
+        # Create send button
+        self.send_button = QPushButton("Send")
+        self.send_button.clicked.connect(self.send_message)
+        
+        # Add stop button
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_generation)
+        self.stop_button.setEnabled(False)
+        
+        # Create clear button
+        self.clear_button = QPushButton("Clear Chat")
+        self.clear_button.clicked.connect(self.clear_chat)
+        
+        button_layout.addWidget(self.send_button)
+        button_layout.addWidget(self.stop_button)
+        button_layout.addWidget(self.clear_button)
+
+        self.search_button = QPushButton("Search")
+        self.search_button.clicked.connect(self.open_search)
+        button_layout.addWidget(self.search_button)
+        QShortcut(QKeySequence.Find, self, self.open_search)
+
+        self.compare_button = QPushButton("Compare")
+        self.compare_button.clicked.connect(self.open_compare)
+        button_layout.addWidget(self.compare_button)
+
+        self.stats_button = QPushButton("Stats")
+        self.stats_button.clicked.connect(self.open_stats)
+        button_layout.addWidget(self.stats_button)
+        layout.addLayout(button_layout)
+        
+        self.generation_scheduler = GenerationScheduler(
+            self.settings['max_concurrent_generations'], self.settings['max_queued_generations'],
+            self)
+        self.generation_scheduler.queue_changed.connect(self.on_generation_queue_changed)
+        
+        self.move(0, 0)
+        
+        # Show the cached model list right away and refresh it in the background
+        self.update_model_list(config.load_model_cache())
+
+        self.model_refresh_timer = QTimer(self)
+        self.model_refresh_timer.timeout.connect(lambda: self.fetch_models(quiet=True))
+
+        # Everything the input field doesn't need is built once the window is up
+        self.loading_overlay = None
+        self.deferred_widgets_built = False
+        QTimer.singleShot(0, self.build_deferred_widgets)
+
+    def build_deferred_widgets(self):
+        """Build the non-critical widgets and start network activity after the first paint"""
+        if self.deferred_widgets_built:
+            return
+        self.deferred_widgets_built = True
+        layout = self.main_layout
+
+        self.progress_indicator = QProgressIndicator()
+        self.progress_indicator.hide()  # Hidden by default
+        self.model_layout.addWidget(self.progress_indicator)
+
         # Create welcome box
         welcome_box = QGroupBox("Welcome to Ollama Linux Chat")
-        welcome_box.setStyleSheet(WELCOME_BOX_STYLE)
         welcome_layout = QVBoxLayout()
         welcome_text = QLabel("""
 • Ask any Linux-related questions
@@ -180,11 +571,11 @@ Start by typing your question below or choose from the suggestions.""")
         welcome_text.setWordWrap(True)
         welcome_layout.addWidget(welcome_text)
         welcome_box.setLayout(welcome_layout)
-        layout.addWidget(welcome_box)
+        layout.insertWidget(1, welcome_box)
 
         # Create suggestions box with custom title widget
         suggestions_box = QGroupBox()
-        suggestions_box.setStyleSheet(SUGGESTIONS_BOX_STYLE)
+        suggestions_box.setObjectName("suggestionsBox")
         suggestions_layout = QVBoxLayout()
         
         # Create title widget with refresh button
@@ -192,10 +583,10 @@ Start by typing your question below or choose from the suggestions.""")
         title_layout = QHBoxLayout(title_widget)
         title_layout.setContentsMargins(0, 0, 0, 0)
         title_label = QLabel("Example Questions")
-        title_label.setStyleSheet("font-weight: bold; font-size: 12pt;")
+        title_label.setObjectName("suggestionsTitle")
         refresh_button = QPushButton("⟳")  # Using unicode refresh symbol
         refresh_button.setFixedSize(25, 25)
-        refresh_button.setStyleSheet(REFRESH_BUTTON_STYLE)
+        refresh_button.setObjectName("refreshButton")
         refresh_button.clicked.connect(self.refresh_suggestions)
         
         title_layout.addWidget(title_label)
@@ -211,21 +602,22 @@ Start by typing your question below or choose from the suggestions.""")
             suggestions_layout.addWidget(suggestion_button)
         
         suggestions_box.setLayout(suggestions_layout)
-        layout.addWidget(suggestions_box)
-
-        # Replace chat display with scroll area and widget
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)  # Hide vertical scrollbar
-        scroll_container = QWidget()
-        self.chat_layout = QVBoxLayout(scroll_container)
-        self.chat_layout.addStretch()
-        scroll_area.setWidget(scroll_container)
-        layout.addWidget(scroll_area)
-        
-        # Initialize loading overlay right after chat display
-        self.loading_overlay = QFrame(scroll_container)
-        self.loading_overlay.setStyleSheet(LOADING_OVERLAY_STYLE)
+        layout.insertWidget(2, suggestions_box)
+
+        self.load_history()
+        self.open_response_cache()
+        self.open_telemetry()
+        self.open_highlighter()
+        self.open_document_index()
+        self.open_autocomplete()
+        self.load_pregenerated_answers()
+        self.fetch_models()
+        if self.settings['model_refresh_interval']:
+            self.model_refresh_timer.start(int(self.settings['model_refresh_interval'] * 1000))
+
+    def build_loading_overlay(self):
+        self.loading_overlay = QFrame(self.transcript_view)
+        self.loading_overlay.setObjectName("loadingOverlay")
         
         # Create overlay layout
         overlay_layout = QVBoxLayout(self.loading_overlay)
@@ -241,89 +633,280 @@ Start by typing your question below or choose from the suggestions.""")
         
         self.loading_overlay.hide()
 
-        # Create input field with random placeholder
-        self.input_field = QLineEdit()
-        self.input_field.setPlaceholderText("type here or choose a suggestion")
-        self.input_field.returnPressed.connect(self.send_message)
-        layout.addWidget(self.input_field)
-        
-        # Create button layout (remove refresh suggestions button from here)
-        button_layout = QHBoxLayout()
-        
-        # Create send button
-        self.send_button = QPushButton("Send")
-        self.send_button.clicked.connect(self.send_message)
-        
-        # Add stop button
-        self.stop_button = QPushButton("Stop")
-        self.stop_button.clicked.connect(self.stop_generation)
-        self.stop_button.setEnabled(False)
-        
-        # Create clear button
-        self.clear_button = QPushButton("Clear Chat")
-        self.clear_button.clicked.connect(self.clear_chat)
-        
-        button_layout.addWidget(self.send_button)
-        button_layout.addWidget(self.stop_button)
-        button_layout.addWidget(self.clear_button)
-        layout.addLayout(button_layout)
-        
-        # Add generation control flag
-        self.is_generating = False
-        self.should_stop = False
-        
-        self.move(0, 0)
-        
-        # Fetch models when starting
-        self.fetch_models()
-
     def __del__(self):
         self.cleanup()
 
     def cleanup(self):
         """Cleanup threads before destruction"""
+        self.stop_reload_worker()
+        if self.model_list_worker:
+            self.model_list_worker.wait()
+            self.model_list_worker = None
+        self.generation_scheduler.stop()
+        if self.compare_dialog:
+            self.compare_dialog.stop()
+        for worker in list(self.model_info_workers):
+            worker.wait()
+        self.model_info_workers.clear()
+        for worker in list(self.model_workers):
+            worker.stop()
+            worker.wait()
+        self.model_workers.clear()
+        if self.history:
+            self.history.close()  # Commits any queued messages
+            self.history = None
+        if self.response_cache:
+            self.response_cache.close()
+            self.response_cache = None
+        if self.pregenerated:
+            self.pregenerated.close()
+            self.pregenerated = None
+        if self.telemetry:
+            self.telemetry.close()
+            self.telemetry = None
+        if self.highlighter:
+            self.highlighter.stop()
+            self.highlighter = None
+        if self.document_index_worker:
+            self.document_index_worker.stop()
+            self.document_index_worker.wait()
+            self.document_index_worker = None
+        if self.document_index:
+            self.document_index.close()
+            self.document_index = None
+        if self.completion_index_worker:
+            self.completion_index_worker.wait()
+            self.completion_index_worker = None
+        self.client.close()
+
+    def stop_reload_worker(self):
         if self.reload_worker:
             self.reload_worker.stop()
-            self.reload_worker.wait()
             self.reload_worker = None
 
     def load_settings(self):
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
-                    return settings.get('default_model')
-        except Exception:
-            return None
-        return None
+        self.settings = config.load_settings(self.settings_file)
+        return self.settings.get('default_model')
 
     def save_settings(self, model):
         try:
-            with open(self.settings_file, 'w') as f:
-                json.dump({'default_model': model}, f)
+            config.save_settings({'default_model': model}, self.settings_file)
+            self.settings['default_model'] = model
         except Exception as e:
             self.display_system_message(f"Error saving settings: {str(e)}")
 
+    def load_history(self):
+        """Open the history store and show the end of the last conversation"""
+        if not self.settings['save_history']:
+            return
+        # Imported here so sqlite3 stays out of the time to first paint
+        from conversation_store import ConversationStore
+        try:
+            self.history = ConversationStore()
+            self.conversation_id = self.history.latest_conversation()
+        except Exception as e:
+            print(f"Error opening history: {e}")
+            self.history = None
+            return
+        if self.conversation_id is None:
+            self.conversation_id = self.history.new_conversation_id()
+            return
+        self.history_exhausted = False
+        self.load_older_messages()
+
+    def load_older_messages(self, limit=None):
+        """Show the page of messages before the oldest one on screen"""
+        if not self.history or self.history_exhausted:
+            return
+        try:
+            messages = self.history.load_messages(self.conversation_id, self.oldest_loaded_turn,
+                                                  limit or self.settings['history_page_size'])
+        except Exception as e:
+            print(f"Error loading history: {e}")
+            messages = []
+        turns = turns_from_messages(messages)
+        if not turns:
+            self.history_exhausted = True
+            return
+        self.oldest_loaded_turn = turns[0].id
+        self.conversation.restore_turns(turns)
+        items = []
+        for turn in turns:
+            items.append(MessageItem('user', turn.prompt, turn=turn))
+            if turn.response is not None:
+                item = MessageItem('ai', turn.response, turn=turn, markdown=True)
+                if turn.stats:
+                    item.stats_text = turn.stats.summary()
+                items.append(item)
+        self.transcript_view.prepend(items)
+
+    def on_transcript_top_reached(self):
+        if not self.history_exhausted:
+            # Not from inside the scroll bar's signal, since loading moves the scroll bar
+            QTimer.singleShot(0, self.load_older_messages)
+
+    def open_response_cache(self):
+        if not self.settings['response_cache']:
+            return
+        from response_cache import ResponseCache
+        try:
+            self.response_cache = ResponseCache.from_settings(self.settings)
+        except Exception as e:
+            print(f"Error opening response cache: {e}")
+
+    def load_pregenerated_answers(self):
+        if not self.settings['pregenerated_answers']:
+            return
+        from pregenerated import PregeneratedAnswers
+        try:
+            self.pregenerated = PregeneratedAnswers()
+            self.pregenerated.purge(self.model_digests)
+        except Exception as e:
+            print(f"Error loading pregenerated answers: {e}")
+            self.pregenerated = None
+
+    def show_pregenerated_answer(self, prompt):
+        """Answer a suggestion from the stored answers; False if there's none for this model"""
+        model = self.model_selector.currentText()
+        if not self.pregenerated or not model:
+            return False
+        response = self.pregenerated.get(model, prompt, self.model_digests.get(model),
+                                         self.SYSTEM_PROMPT)
+        if response is None:
+            return False
+        turn = self.conversation.add_turn(prompt)
+        self.current_user_item = self.transcript_view.append(MessageItem('user', prompt, turn=turn))
+        self.save_history_message(turn, 'user', prompt, model)
+        item = MessageItem('ai', response, turn=turn, markdown=True)
+        item.stats_text = "Pre-generated answer · ↻ to regenerate"
+        self.current_ai_item = self.transcript_view.append(item)
+        self.conversation.complete_turn(turn, response)
+        self.save_history_message(turn, 'assistant', response, model)
+        return True
+
+    def open_compare(self):
+        """Open compare mode with the installed models and the typed prompt"""
+        if self.compare_dialog is None:
+            from compare_dialog import CompareDialog
+            self.compare_dialog = CompareDialog(self.client, self.settings, self.SYSTEM_PROMPT, self,
+                                                self.record_telemetry)
+        models = [self.model_selector.itemText(i) for i in range(self.model_selector.count())]
+        self.compare_dialog.set_models(models, [self.model_selector.currentText()])
+        if self.input_field.text():
+            self.compare_dialog.prompt_field.setText(self.input_field.text())
+        self.compare_dialog.show()
+        self.compare_dialog.raise_()
+        self.compare_dialog.activateWindow()
+
+    def open_telemetry(self):
+        if not self.settings['telemetry']:
+            return
+        from telemetry import Telemetry
+        try:
+            self.telemetry = Telemetry()
+        except Exception as e:
+            print(f"Error opening telemetry: {e}")
+
+    def open_highlighter(self):
+        if not self.settings['syntax_highlighting']:
+            return
+        from highlight import CodeHighlighter
+        self.highlighter = CodeHighlighter(self, self.settings['highlight_cache_size'],
+                                           style=self.settings['code_style'])
+        if not self.highlighter.available:
+            self.highlighter = None  # Without pygments code blocks stay plain
+            return
+        self.transcript_view.set_highlighter(self.highlighter)
+
+    def open_document_index(self):
+        if not self.settings['retrieval']:
+            return
+        self.document_index_worker = DocumentIndexWorker(self.client, self.settings)
+        self.document_index_worker.index_ready.connect(self.on_document_index_ready)
+        self.document_index_worker.start()
+
+    def on_document_index_ready(self, index):
+        self.document_index = index
+
+    def open_autocomplete(self):
+        if not self.settings['autocomplete']:
+            return
+        from autocomplete import InputCompleter
+        self.completer = InputCompleter(self.input_field, self.settings['autocomplete_items'])
+        # Until the index arrives only questions asked in this session complete
+        self.completion_index_worker = CompletionIndexWorker(self.linux_prompts, self.history)
+        self.completion_index_worker.index_ready.connect(self.completer.set_index)
+        self.completion_index_worker.start()
+
+    def record_telemetry(self, model, stats, worker, render_scheduler=None):
+        """Store the timings of a completed stream"""
+        if not self.telemetry:
+            return
+        from telemetry import sample_from
+        try:
+            self.telemetry.add(sample_from(model, self.model_digests.get(model), stats, worker,
+                                           render_scheduler))
+        except Exception as e:
+            print(f"Error recording telemetry: {e}")
+
+    def open_stats(self):
+        if not self.telemetry:
+            self.display_system_message("Telemetry is turned off")
+            return
+        if self.stats_dialog is None:
+            from stats_dialog import StatsDialog
+            self.stats_dialog = StatsDialog(self.telemetry, self.settings['telemetry_window'], self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+        self.stats_dialog.activateWindow()
+
+    def open_search(self):
+        if not self.history or not self.history.searchable:
+            self.display_system_message("History search is not available")
+            return
+        if self.search_dialog is None:
+            from search_dialog import SearchDialog
+            self.search_dialog = SearchDialog(self.history, self)
+            self.search_dialog.message_selected.connect(self.show_history_message)
+        self.history.flush()  # Include the messages still queued for writing
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def show_history_message(self, conversation_id, turn_id, role):
+        """Scroll to a stored message, opening its conversation if needed"""
+        if conversation_id != self.conversation_id:
+            self.clear_chat()
+            self.conversation_id = conversation_id
+            self.history_exhausted = False
+        if self.oldest_loaded_turn is None or turn_id < self.oldest_loaded_turn:
+            # Load everything down to the message in one page
+            count = self.history.count_messages(conversation_id, turn_id, self.oldest_loaded_turn)
+            self.load_older_messages(max(count, self.settings['history_page_size']))
+        role = 'user' if role == 'user' else 'ai'
+        for item in self.transcript.items:
+            if item.role == role and item.turn is not None and item.turn.id == turn_id:
+                self.transcript_view.scroll_to_item(item)
+                break
+
+    def save_history_message(self, turn, role, content, model, stats=None):
+        """Store a message with the model it was sent to or written by
+
+        The caller passes the model: the selection may have changed since
+        the request started.
+        """
+        if self.history:
+            self.history.add_message(self.conversation_id, turn.id, role, content, model, stats)
+
     def display_system_message(self, message):
-        """Display a system message in the chat layout"""
-        system_box = QGroupBox()
-        system_box.setStyleSheet(SYSTEM_MESSAGE_STYLE)
-        
-        box_layout = QVBoxLayout(system_box)
-        box_layout.setContentsMargins(10, 10, 10, 10)
-        
-        label = QLabel(message)
-        label.setWordWrap(True)
-        box_layout.addWidget(label)
-        
-        self.chat_layout.addWidget(system_box)
-        
-        # Scroll to bottom after adding system message
-        scroll_area = self.findChild(QScrollArea)
-        if scroll_area:
-            scroll_area.verticalScrollBar().setValue(
-                scroll_area.verticalScrollBar().maximum()
-            )
+        """Display a system message in the transcript"""
+        self.transcript_view.append(MessageItem('system', message))
+
+    def show_message_menu(self, item, pos):
+        menu = QMenu(self)
+        copy_action = menu.addAction("Copy")
+        if menu.exec(pos) is copy_action:
+            QApplication.clipboard().setText(item.text)
 
     def set_default_model(self):
         current_model = self.model_selector.currentText()
@@ -331,324 +914,283 @@ Start by typing your question below or choose from the suggestions.""")
             self.save_settings(current_model)
             self.display_system_message(f"Set {current_model} as default model")
 
-    def fetch_models(self):
+    def fetch_models(self, quiet=False):
+        """Refresh the model list in the background; quiet skips error messages"""
+        if self.model_list_worker:
+            return
+        self.model_list_worker = ModelListWorker(self.client)
+        self.model_list_worker.models_received.connect(self.on_models_received)
+        if not quiet:
+            self.model_list_worker.error.connect(self.display_system_message)
+        self.model_list_worker.finished.connect(self.on_model_list_thread_finished)
+        self.model_list_worker.start()
+
+    def on_model_list_thread_finished(self):
+        self.model_list_worker = None
+
+    def on_models_received(self, models):
+        self.update_model_list(models)
+        if self.pregenerated:
+            # A model that was pulled again gets a new digest; its stored answers are stale
+            self.pregenerated.purge(self.model_digests)
         try:
-            response = requests.get('http://localhost:11434/api/tags')
-            if response.status_code == 200:
-                models = response.json()['models']
-                current_model = self.model_selector.currentText()
-                self.model_selector.clear()
-                default_model = self.load_settings()
-                default_index = 0
-                
-                for i, model in enumerate(models):
-                    self.model_selector.addItem(model['name'])
-                    if default_model and model['name'] == default_model:
-                        default_index = i
-                    # Keep the previously selected model if it exists
-                    elif current_model and model['name'] == current_model:
-                        default_index = i
-                
-                self.model_selector.setCurrentIndex(default_index)
-            else:
-                self.display_system_message("Error: Failed to fetch models")
-        except requests.exceptions.RequestException:
-            self.display_system_message("Error: Cannot connect to Ollama service")
+            config.save_model_cache(models)
+        except OSError as e:
+            print(f"Error saving model cache: {e}")
+
+    def update_model_list(self, models):
+        """Bring the combo box in line with models, touching only the entries that changed"""
+        self.model_digests = {model['name']: model.get('digest') for model in models}
+        names = [model['name'] for model in models]
+        previous_model = self.model_selector.currentText()
+        existing = [self.model_selector.itemText(i) for i in range(self.model_selector.count())]
+        if names == existing:
+            return
+
+        self.model_selector.blockSignals(True)
+        for i in reversed(range(len(existing))):
+            if existing[i] not in names:
+                self.model_selector.removeItem(i)
+        for i, name in enumerate(names):
+            if self.model_selector.itemText(i) != name:
+                index = self.model_selector.findText(name)
+                if index >= 0:
+                    self.model_selector.removeItem(index)
+                self.model_selector.insertItem(i, name)
+
+        # Keep the previously selected model if it exists, else fall back to the default
+        default_model = self.load_settings()
+        if previous_model in names:
+            self.model_selector.setCurrentIndex(names.index(previous_model))
+        elif default_model in names:
+            self.model_selector.setCurrentIndex(names.index(default_model))
+        elif names:
+            self.model_selector.setCurrentIndex(0)
+        self.model_selector.blockSignals(False)
+
+        if self.model_selector.currentText() != previous_model:
+            self.on_model_changed(self.model_selector.currentText())
+
+    @property
+    def is_generating(self):
+        return self.generation_scheduler.busy
 
     def stop_generation(self):
-        """Stop the current generation"""
-        self.should_stop = True
-        self.stop_button.setEnabled(False)
-        self.send_button.setEnabled(True)
-        self.input_field.setEnabled(True)
-
-    def disable_input(self):
-        """Disable input controls"""
-        self.input_field.setEnabled(False)
-        self.send_button.setEnabled(False)
-        self.input_field.setStyleSheet(DISABLED_INPUT_STYLE)
-        
-    def enable_input(self):
-        """Enable input controls"""
-        self.input_field.setEnabled(True)
-        self.send_button.setEnabled(True)
-        self.input_field.setStyleSheet("")
-
-    def create_message_box(self, is_user, message):
-        box = QGroupBox()
-        box.setStyleSheet(USER_MESSAGE_STYLE if is_user else AI_MESSAGE_STYLE)
-        
-        box_layout = QVBoxLayout(box)
-        box_layout.setContentsMargins(10, 10, 10, 10)
-        box_layout.setSpacing(5)  # Added spacing between elements
-        
-        # Create header layout for the role label and stop button
-        header_layout = QHBoxLayout()
-        role_label = QLabel("<b>You</b>" if is_user else "<b>AI:</b>")
-        header_layout.addWidget(role_label)
-        
-        if not is_user:
-            # Create button container for better alignment
-            button_container = QWidget()
-            button_layout = QHBoxLayout(button_container)
-            button_layout.setSpacing(5)
-            button_layout.setContentsMargins(0, 0, 0, 0)
-            
-            # Stop button
-            stop_button = QPushButton("Stop")
-            stop_button.setFixedSize(60, 25)
-            stop_button.setStyleSheet(STOP_BUTTON_STYLE)
-            stop_button.clicked.connect(self.stop_generation)
-            stop_button.setEnabled(False)
-            self.stop_button = stop_button
-            
-            # Reload button
-            reload_button = QPushButton("↻")
-            reload_button.setFixedSize(25, 25)
-            reload_button.setStyleSheet(RELOAD_BUTTON_STYLE)
-            label = QLabel()  # Create label here to reference it in lambda
-            reload_button.clicked.connect(lambda: self.reload_message(box, label))
-            
-            button_layout.addWidget(stop_button)
-            button_layout.addWidget(reload_button)
-            header_layout.addWidget(button_container)
+        """Stop every running and queued generation"""
+        self.generation_scheduler.cancel_all()
 
-        header_layout.addStretch()
-        box_layout.addLayout(header_layout)
-        
-        # Message content
-        label = QLabel(message)
-        label.setWordWrap(True)
-        label.setTextFormat(Qt.RichText)
-        box_layout.addWidget(label)
-        
-        if not is_user:
-            box.original_prompt = self.current_prompt  # Store the prompt with the box
-            
-        return box, label if not is_user else None
+    def on_generation_queue_changed(self):
+        self.stop_button.setEnabled(self.generation_scheduler.busy)
+
+    def generation_for(self, item):
+        return next((g for g in self.generations if g.item is item), None)
 
-    def reload_message(self, box, label):
+    def reload_message(self, item):
         """Replace the specific AI response with a new one"""
-        if not hasattr(box, 'original_prompt'):
+        if item.turn is None or self.generation_for(item) or not self.can_queue_generation():
             return
-            
-        self.is_generating = True
-        self.should_stop = False
-        self.disable_input()
-        
-        try:
-            response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    "model": self.model_selector.currentText(),
-                    "prompt": box.original_prompt,
-                    "system": self.SYSTEM_PROMPT,
-                    "stream": True
-                },
-                stream=True
-            )
-            
-            if response.status_code == 200:
-                complete_response = []
-                
-                for line in response.iter_lines():
-                    if self.should_stop:
-                        response.close()
-                        break
-                        
-                    if line:
-                        json_response = json.loads(line)
-                        if 'response' in json_response:
-                            chunk = json_response['response']
-                            complete_response.append(chunk)
-                            
-                            try:
-                                markdown_text = ''.join(complete_response)
-                                html_content = markdown2.markdown(
-                                    markdown_text,
-                                    extras=['fenced-code-blocks', 'code-friendly']
-                                )
-                                label.setText(f"<b>AI:</b> {html_content}")
-                                QApplication.processEvents()
-                                
-                            except Exception as e:
-                                print(f"Error formatting response: {str(e)}")
-            else:
-                label.setText("<b>AI:</b> Error: Failed to get response from Ollama")
-        
-        except requests.exceptions.RequestException as e:
-            label.setText(f"<b>AI:</b> Error: Cannot connect to Ollama service: {str(e)}")
-        
-        self.is_generating = False
-        self.should_stop = False
-        self.enable_input()
+
+        # Reloading a cached answer is how a fresh one is requested
+        self.start_generation(item, use_cache=False)
+
+    def stop_message(self, item):
+        generation = self.generation_for(item)
+        if generation:
+            generation.handle.cancel()
+
+    def can_queue_generation(self):
+        if self.generation_scheduler.full:
+            self.display_system_message("Too many requests are waiting; "
+                                        "send this once one of them has started")
+            return False
+        return True
 
     def send_message(self):
         user_message = self.input_field.text()
-        if not user_message or self.is_generating:
+        if not user_message or not self.can_queue_generation():
             return
             
         self.current_prompt = user_message
-        self.is_generating = True
-        self.should_stop = False
-        self.disable_input()
-        
-        # Store references to message boxes
-        user_box, _ = self.create_message_box(True, user_message)
-        self.current_user_box = user_box
-        self.chat_layout.addWidget(user_box)
-        
-        ai_box, ai_label = self.create_message_box(False, "")
-        self.current_ai_box = ai_box
-        self.current_ai_label = ai_label
-        self.chat_layout.addWidget(ai_box)
-        
-        # Scroll to bottom after adding new message
-        scroll_area = self.findChild(QScrollArea)
-        if scroll_area:
-            scroll_area.verticalScrollBar().setValue(
-                scroll_area.verticalScrollBar().maximum()
-            )
-        
-        # Enable stop button at the start of generation
-        self.stop_button.setEnabled(True)
-        
-        try:
-            response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    "model": self.model_selector.currentText(),
-                    "prompt": user_message,
-                    "system": self.SYSTEM_PROMPT,
-                    "stream": True
-                },
-                stream=True
-            )
-            
-            if response.status_code == 200:
-                complete_response = []
-                
-                for line in response.iter_lines():
-                    if self.should_stop:
-                        response.close()
-                        break
-                        
-                    if line:
-                        json_response = json.loads(line)
-                        if 'response' in json_response:
-                            chunk = json_response['response']
-                            complete_response.append(chunk)
-                            
-                            try:
-                                markdown_text = ''.join(complete_response)
-                                html_content = markdown2.markdown(
-                                    markdown_text,
-                                    extras=['fenced-code-blocks', 'code-friendly']
-                                )
-                                ai_label.setText(f"<b>AI:</b> {html_content}")
-                                QApplication.processEvents()
-                                
-                            except Exception as e:
-                                print(f"Error formatting response: {str(e)}")
-            else:
-                ai_label.setText("<b>AI:</b> Error: Failed to get response from Ollama")
+        self.input_field.clear()
         
-        except requests.exceptions.RequestException as e:
-            ai_label.setText(f"<b>AI:</b> Error: Cannot connect to Ollama service: {str(e)}")
+        turn = self.conversation.add_turn(user_message)
+        self.current_user_item = self.transcript_view.append(
+            MessageItem('user', user_message, turn=turn))
+        # The generation below is created now too, so it's sent to this model
+        self.save_history_message(turn, 'user', user_message, self.model_selector.currentText())
+        if self.completer:
+            self.completer.add(user_message)
+        self.current_ai_item = self.transcript_view.append(MessageItem('ai', turn=turn))
         
-        self.is_generating = False
-        self.should_stop = False
-        self.stop_button.setEnabled(False)
-        self.enable_input()
-        self.input_field.clear()
+        self.start_generation(self.current_ai_item)
+
+    def start_generation(self, item, use_cache=True):
+        """Queue the answer to item's conversation turn
+
+        It starts once every earlier turn that is still being answered has
+        finished, since their answers are part of its context.
+        """
+        turn = item.turn
+        after = [g.handle for g in self.generations if g.turn.id < turn.id]
+        generation = ChatGeneration(self, item, use_cache)
+        handle = self.generation_scheduler.submit(generation.create_worker, after)
+        if handle is None:
+            return
+        generation.handle = handle
+        handle.finished.connect(generation.on_finished)
+        self.generations.append(generation)
+        item.generating = True
+        if handle.state == 'queued':
+            item.stats_text = "Queued…"
+        self.transcript_view.update_item(item)
+
+    def context_budget(self, model):
+        """Prompt budget for model; a default window is used until /api/show answers"""
+        if model not in self.context_budgets:
+            self.context_budgets[model] = ContextBudget(
+                self.settings['num_ctx'] or DEFAULT_NUM_CTX, self.settings['context_fraction'])
+            self.request_model_info(model)
+        return self.context_budgets[model]
+
+    def on_model_changed(self, model):
+        if model:
+            self.context_budget(model)
+            self.preload_timer.start()
+
+    def request_model_info(self, model):
+        worker = ModelInfoWorker(self.client, model)
+        worker.info_received.connect(self.on_model_info)
+        worker.finished.connect(self.on_model_info_thread_finished)
+        self.model_info_workers.add(worker)
+        worker.start()
+
+    def on_model_info_thread_finished(self):
+        self.model_info_workers.discard(self.sender())
+
+    def on_model_info(self, model, info):
+        budget = self.context_budget(model)
+        budget.num_ctx = context_window_from_show(info, self.settings['num_ctx'])
 
     def clear_chat(self):
         """Clear all chat messages and reset references"""
-        # First stop any ongoing generation
-        if self.is_generating:
-            self.should_stop = True
-            self.stop_button.setEnabled(False)
-            self.send_button.setEnabled(True)
-            self.input_field.setEnabled(True)
-            self.is_generating = False
-            QApplication.processEvents()  # Process any pending events
-        
-        print(f"Items in chat layout before clearing: {self.chat_layout.count()}")
-        
-        # Remove ALL items from the layout, including the stretch
-        while self.chat_layout.count():
-            item = self.chat_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # Add a new stretch at the end
-        self.chat_layout.addStretch()
-        
-        # Force update the layout
-        self.chat_layout.update()
-        QApplication.processEvents()
-        
-        # Reset all references
-        self.current_prompt = None
-        self.current_user_box = None
-        self.current_ai_box = None
-        self.current_ai_label = None
+        # First stop every generation; their late signals mustn't touch the cleared transcript
+        for generation in self.generations:
+            generation.discarded = True
+        self.generations = []
+        self.generation_scheduler.cancel_all()
+        
+        self.transcript_view.clear()
         
-        print(f"Items in chat layout after clearing: {self.chat_layout.count()}")
+        # Reset all references; the old conversation stays in the history store
+        self.conversation.clear()
+        if self.history:
+            self.conversation_id = self.history.new_conversation_id()
+        self.oldest_loaded_turn = None
+        self.history_exhausted = True
+        self.current_prompt = None
+        self.current_user_item = None
+        self.current_ai_item = None
 
     def get_random_prompt(self):
         return random.choice(self.linux_prompts)
 
     def show_loading_overlay(self, show=True):
+        if self.loading_overlay is None:
+            if not show:
+                return
+            self.build_loading_overlay()
         if show:
             # Calculate size relative to chat display
-            overlay_width = min(300, self.chat_display.width() - 40)
-            overlay_height = min(200, self.chat_display.height() - 40)
+            overlay_width = min(300, self.transcript_view.width() - 40)
+            overlay_height = min(200, self.transcript_view.height() - 40)
             self.loading_overlay.resize(overlay_width, overlay_height)
             # Center in chat display
-            x = (self.chat_display.width() - self.loading_overlay.width()) // 2
-            y = (self.chat_display.height() - self.loading_overlay.height()) // 2
+            x = (self.transcript_view.width() - self.loading_overlay.width()) // 2
+            y = (self.transcript_view.height() - self.loading_overlay.height()) // 2
             self.loading_overlay.move(x, y)
+            self.loading_overlay.raise_()
             self.loading_overlay.show()
         else:
             self.loading_overlay.hide()
 
     def reload_model(self):
+        """Unload the selected model and load it again"""
+        self.run_model_action(['unload', 'preload'], "Reloading Model...")
+
+    def unload_model(self):
+        """Free the memory held by the selected model"""
+        self.run_model_action(['unload'], "Unloading Model...")
+
+    def run_model_action(self, actions, message):
         current_model = self.model_selector.currentText()
         if not current_model:
             return
         
         # Cleanup any existing worker
-        self.cleanup()
+        self.stop_reload_worker()
+        self.preload_timer.stop()
         
         # Show centered loading overlay and disable reload button
         self.show_loading_overlay(True)
+        self.loading_label.setText(message)
         self.reload_button.setEnabled(False)
+        self.unload_button.setEnabled(False)
         
         # Create and start worker thread
-        self.reload_worker = ReloadWorker(current_model)
-        self.reload_worker.finished.connect(self.on_reload_finished)
+        self.reload_worker = self.start_model_worker(current_model, actions)
+        self.reload_worker.completed.connect(self.on_reload_finished)
         self.reload_worker.error.connect(self.on_reload_error)
-        self.reload_worker.start()
+
+    def preload_selected_model(self):
+        """Load the selected model in the background so the next message starts warm"""
+        current_model = self.model_selector.currentText()
+        if current_model:
+            worker = self.start_model_worker(current_model, ['preload'])
+            worker.error.connect(self.on_preload_error)
+
+    def start_model_worker(self, model, actions):
+        worker = ModelLifecycleWorker(self.client, model, actions, self.settings['keep_alive'])
+        worker.finished.connect(self.on_model_worker_thread_finished)
+        self.model_workers.add(worker)
+        worker.start()
+        return worker
+
+    def on_model_worker_thread_finished(self):
+        self.model_workers.discard(self.sender())
+
+    def on_preload_error(self, error_message):
+        print(f"Error preloading model: {error_message}")
 
     def closeEvent(self, event):
         """Handle application closing"""
         self.cleanup()
         super().closeEvent(event)
 
-    def on_reload_finished(self):
+    def on_reload_finished(self, action, model):
+        if self.sender() is not self.reload_worker:
+            return
+        self.reload_worker = None
         self.show_loading_overlay(False)
         self.reload_button.setEnabled(True)
+        self.unload_button.setEnabled(True)
         self.model_selector.setEnabled(True)
+        if action == 'unload':
+            self.display_system_message(f"Unloaded {model}")
 
     def on_reload_error(self, error_message):
+        if self.sender() is not self.reload_worker:
+            return
+        self.reload_worker = None
         self.display_system_message(f"Error: {error_message}")
         self.show_loading_overlay(False)
         self.reload_button.setEnabled(True)
+        self.unload_button.setEnabled(True)
         self.model_selector.setEnabled(True)
 
     def use_suggestion(self, suggestion):
         """Handle suggestion button clicks"""
+        if not self.is_generating and self.show_pregenerated_answer(suggestion):
+            return
         self.input_field.setText(suggestion)
         self.send_message()
 
@@ -671,8 +1213,38 @@ Start by typing your question below or choose from the suggestions.""")
                 suggestion_button.clicked.connect(lambda checked, p=prompt: self.use_suggestion(p))
                 layout.addWidget(suggestion_button)
 
+class StartupProbe(QObject):
+    """Prints startup timestamps for benchmarks/bench_startup.py, then quits"""
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.window_shown = None
+        window.input_field.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.window_shown is None:
+            self.window_shown = time.time()
+            QTimer.singleShot(0, self.check_interactive)
+        return False
+
+    def check_interactive(self):
+        if not self.window.deferred_widgets_built:
+            QTimer.singleShot(0, self.check_interactive)
+            return
+        # One more pass so the deferred widgets are laid out and painted
+        QTimer.singleShot(0, self.report)
+
+    def report(self):
+        print(f"startup window_shown {self.window_shown:.6f}")
+        print(f"startup interactive {time.time():.6f}")
+        sys.stdout.flush()
+        QApplication.instance().quit()
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = MainWindow()
+    if '--startup-benchmark' in sys.argv:
+        probe = StartupProbe(window)
     window.show()
     sys.exit(app.exec())
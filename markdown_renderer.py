@@ -0,0 +1,138 @@
+"""Incremental Markdown rendering for streamed responses."""
+import re
+
+# highlightjs-lang keeps markdown2 from running pygments inline and tags closed
+# fences with their language; highlight.CodeHighlighter colors them off-thread
+MARKDOWN_EXTRAS = ['fenced-code-blocks', 'code-friendly', 'highlightjs-lang']
+
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+LIST_ITEM_RE = re.compile(r'^ {0,3}([*+-]|\d+[.)])\s')
+LINK_DEFINITION_RE = re.compile(r'^ {0,3}\[[^\]]+\]:[ \t]*\S')
+
+
+def render_markdown(text):
+    """Convert a complete Markdown document to HTML"""
+    import markdown2  # Deferred until the first response so it stays out of startup
+    return markdown2.markdown(text, extras=MARKDOWN_EXTRAS)
+
+
+class IncrementalMarkdownRenderer:
+    """Render a growing Markdown document without re-converting finished blocks.
+
+    The text is split into blocks at blank lines outside fenced code and after
+    closing fences. A block is final once the line that starts the next block
+    has arrived, so its HTML is cached and only the trailing open block is
+    converted again on every update. List items separated by blank lines are
+    kept in one block so ordered lists keep their numbering.
+
+    Reference link definitions apply to the whole document, so they are
+    appended to every block that is converted, and the finished blocks are
+    converted again whenever a new one arrives.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._text = ''
+        self._blocks = []        # [source, HTML] of finished blocks, in order
+        self._definitions = []   # Reference link definition lines outside fenced code
+        self._rendered_definitions = ''  # The definitions the finished blocks were converted with
+        self._committed = 0      # Offset where the open block starts
+        self._scan = 0           # Offset of the next line that hasn't been classified
+        self._fence = None       # Opening fence marker while inside fenced code
+        self._block_is_list = False
+        self._block_empty = True
+        self._block_has_content = False  # Holds more than link definitions
+        self._blank_seen = False
+        self._tail_html = ''
+        self._tail_dirty = False
+
+    @property
+    def text(self):
+        return self._text
+
+    def append(self, chunk):
+        """Add streamed text to the document"""
+        if not chunk:
+            return
+        self._text += chunk
+        self._tail_dirty = True
+        self._advance()
+
+    def html(self):
+        """Return the HTML for everything appended so far"""
+        if self._tail_dirty:
+            # The unfinished last line counts once it reads as a whole definition
+            partial = self._text[self._scan:]
+            is_definition = not self._fence and LINK_DEFINITION_RE.match(partial)
+            definitions = '\n'.join(self._definitions + ([partial] if is_definition else []))
+            if definitions != self._rendered_definitions:
+                self._rendered_definitions = definitions
+                for block in self._blocks:
+                    if ']' in block[0]:
+                        block[1] = self._render(block[0])
+            has_content = self._block_has_content or (partial.strip() and not is_definition)
+            tail = self._text[self._committed:]
+            self._tail_html = self._render(tail) if has_content else ''
+            self._tail_dirty = False
+        return ''.join(block[1] for block in self._blocks) + self._tail_html
+
+    def _render(self, block):
+        if self._rendered_definitions:
+            block += '\n\n' + self._rendered_definitions
+        return render_markdown(block)
+
+    def _commit(self, end):
+        block = self._text[self._committed:end]
+        if self._block_has_content:
+            self._blocks.append([block, self._render(block)])
+        self._committed = end
+        self._block_is_list = False
+        self._block_empty = True
+        self._block_has_content = False
+        self._blank_seen = False
+
+    def _advance(self):
+        # Only complete lines are classified; a partial line stays in the open block
+        while True:
+            newline = self._text.find('\n', self._scan)
+            if newline == -1:
+                return
+            start, end = self._scan, newline + 1
+            line = self._text[start:newline]
+            self._scan = end
+
+            if self._fence:
+                stripped = line.strip()
+                if (stripped.startswith(self._fence)
+                        and stripped.strip(self._fence[0]) == ''):
+                    self._fence = None
+                    if not self._block_is_list:
+                        self._commit(end)
+                continue
+
+            if not line.strip():
+                if not self._block_empty:
+                    self._blank_seen = True
+                continue
+
+            if self._blank_seen:
+                continues_list = self._block_is_list and (
+                    LIST_ITEM_RE.match(line) or line[:1] in (' ', '\t'))
+                if not continues_list:
+                    self._commit(start)
+                self._blank_seen = False
+
+            if self._block_empty:
+                self._block_is_list = bool(LIST_ITEM_RE.match(line))
+                self._block_empty = False
+
+            if LINK_DEFINITION_RE.match(line):
+                self._definitions.append(line)
+                continue
+            self._block_has_content = True
+
+            fence = FENCE_RE.match(line)
+            if fence:
+                self._fence = fence.group(1)
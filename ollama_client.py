@@ -0,0 +1,203 @@
+"""HTTP client shared by every call to the Ollama API.
+
+requests is imported on first use, normally from a worker thread, so that
+importing this module costs nothing at startup.
+"""
+import json
+import os
+import threading
+
+from config import DEFAULT_SETTINGS
+
+
+def __getattr__(name):
+    # Lets callers write `except ollama_client.RequestException` without importing requests
+    if name == 'RequestException':
+        from requests.exceptions import RequestException
+        return RequestException
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class OllamaClient:
+    """Keep-alive connection pool with timeouts and retries for one Ollama server.
+
+    Connection errors are retried for every request. HTTP 502/503/504 are only
+    retried for idempotent methods, so a generation is never submitted twice.
+    """
+
+    def __init__(self, base_url=DEFAULT_SETTINGS['ollama_url'],
+                 connect_timeout=DEFAULT_SETTINGS['connect_timeout'],
+                 read_timeout=DEFAULT_SETTINGS['read_timeout'],
+                 max_retries=DEFAULT_SETTINGS['max_retries'],
+                 retry_backoff=DEFAULT_SETTINGS['retry_backoff'],
+                 pool_size=10):
+        self.base_url = normalize_base_url(base_url)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled requests.Session, created on first use"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(total=self.max_retries, connect=self.max_retries, read=0,
+                              status=self.max_retries, backoff_factor=self.retry_backoff,
+                              status_forcelist=(502, 503, 504), raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                      max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a client from a settings dict; OLLAMA_HOST overrides the stored URL"""
+        return cls(base_url=os.environ.get('OLLAMA_HOST') or settings['ollama_url'],
+                   connect_timeout=settings['connect_timeout'],
+                   read_timeout=settings['read_timeout'],
+                   max_retries=settings['max_retries'],
+                   retry_backoff=settings['retry_backoff'])
+
+    def url(self, path):
+        return self.base_url + path
+
+    def get(self, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(self.url(path), **kwargs)
+
+    def post(self, path, payload, stream=False, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.post(self.url(path), json=payload, stream=stream, **kwargs)
+
+    def tags(self):
+        return self.get('/api/tags')
+
+    def generate(self, payload, stream=False):
+        return self.post('/api/generate', payload, stream=stream)
+
+    def chat(self, payload, stream=False):
+        return self.post('/api/chat', payload, stream=stream)
+
+    def show(self, model):
+        return self.post('/api/show', {"model": model})
+
+    def embeddings(self, model, prompt):
+        """Embedding vector for prompt as a list of floats"""
+        response = self.post('/api/embeddings', {"model": model, "prompt": prompt})
+        response.raise_for_status()
+        return response.json()['embedding']
+
+    def preload(self, model, keep_alive=None):
+        """Load model into memory without generating anything"""
+        payload = {"model": model, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return self.generate(payload)
+
+    def unload(self, model):
+        return self.generate({"model": model, "keep_alive": 0, "stream": False})
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Events yielded by StreamDecoder, as (kind, value) tuples
+TOKEN = 'token'  # Text of the answer
+DONE = 'done'    # The final object with the server timings, without the answer fields
+ERROR = 'error'  # Error message sent in place of an answer
+
+# Ollama sends one HTTP chunk per line and urllib3 returns at most one chunk per read, so
+# a size only adds buffering: chunk_size=None streams about three times faster than 64 KiB
+STREAM_CHUNK_SIZE = None
+
+
+def json_loader():
+    """orjson.loads if orjson is installed, else json.loads; both take bytes"""
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+
+class StreamDecoder:
+    """Turns the NDJSON body of a streamed /api/chat or /api/generate into events.
+
+    feed() takes bytes as they arrive and returns the events of every line it
+    completes, so tokens from one network read stay together. Only a line cut
+    off at the end of a read is copied to join it with the next one.
+    """
+
+    def __init__(self):
+        self.loads = json_loader()
+        self.pending = b''
+
+    def feed(self, data):
+        if self.pending:
+            data = self.pending + data
+        lines = data.split(b'\n')
+        self.pending = lines.pop()
+        loads = self.loads
+        events = []
+        for line in lines:
+            if line:
+                try:
+                    parsed = loads(line)
+                except ValueError:
+                    if line.strip():
+                        raise
+                else:
+                    self.add_events(parsed, events)
+        return events
+
+    def close(self):
+        """Events of a last line that had no newline after it"""
+        data, self.pending = self.pending, b''
+        return self.feed(data + b'\n') if data.strip() else []
+
+    @staticmethod
+    def add_events(line, events):
+        if 'error' in line:
+            events.append((ERROR, line['error']))
+            return
+        message = line.get('message')
+        content = message.get('content') if message else line.get('response')
+        if content:
+            events.append((TOKEN, content))
+        if line.get('done'):
+            for field in ('message', 'response', 'context'):
+                line.pop(field, None)
+            events.append((DONE, line))
+
+
+def iter_stream_events(response, chunk_size=STREAM_CHUNK_SIZE):
+    """Lists of StreamDecoder events, one list per network read of response"""
+    decoder = StreamDecoder()
+    for data in response.iter_content(chunk_size=chunk_size):
+        events = decoder.feed(data)
+        if events:
+            yield events
+    events = decoder.close()
+    if events:
+        yield events
+
+
+def normalize_base_url(url):
+    """Accept OLLAMA_HOST-style values such as '10.0.0.5:11434' as well as full URLs"""
+    url = url.strip().rstrip('/')
+    if '://' not in url:
+        url = 'http://' + url
+    return url
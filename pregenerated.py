@@ -0,0 +1,82 @@
+"""Answers to the suggestion prompts, generated ahead of time by `cli.py --pregenerate`.
+
+Each answer records the digest of the model that wrote it and a hash of the
+system prompt it was asked under. It's only used while both still match, so
+pulling a new version of a model retires its answers.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    model TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    digest TEXT NOT NULL,        -- Model digest from /api/tags
+    system_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (model, prompt)
+);
+"""
+
+
+def system_hash(system_prompt):
+    return hashlib.sha256(system_prompt.encode()).hexdigest()
+
+
+class PregeneratedAnswers:
+    """Stored answers, read into memory so a lookup never touches the disk"""
+
+    def __init__(self, path=config.PREGENERATED_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+        self._answers = {}  # (model, prompt) -> (digest, system hash, response)
+        for model, prompt, digest, system, response in self._connection.execute(
+                "SELECT model, prompt, digest, system_hash, response FROM answers"):
+            self._answers[(model, prompt)] = (digest, system, response)
+
+    def __len__(self):
+        return len(self._answers)
+
+    def get(self, model, prompt, digest, system_prompt):
+        """Stored answer if it came from this exact model and system prompt"""
+        entry = self._answers.get((model, prompt))
+        if entry is None or not digest or entry[0] != digest:
+            return None
+        if entry[1] != system_hash(system_prompt):
+            return None
+        return entry[2]
+
+    def put(self, model, prompt, digest, system_prompt, response):
+        system = system_hash(system_prompt)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answers"
+                " (model, prompt, digest, system_hash, response, created)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (model, prompt, digest, system, response, time.time()))
+        self._answers[(model, prompt)] = (digest, system, response)
+
+    def purge(self, digests):
+        """Delete answers written by an older version of a model
+
+        digests maps model names to their current digest; models that aren't
+        listed are left alone, since they may just be missing from this server.
+        """
+        stale = [key for key, entry in self._answers.items()
+                 if digests.get(key[0]) and entry[0] != digests[key[0]]]
+        if not stale:
+            return 0
+        with self._connection:
+            self._connection.executemany("DELETE FROM answers WHERE model = ? AND prompt = ?", stale)
+        for key in stale:
+            del self._answers[key]
+        return len(stale)
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,220 @@
+"""Cache of model answers for questions that were asked before.
+
+An answer is reused when the model, options, every earlier message (system
+prompt included) and the normalized question all match. With the semantic
+tier on, a question whose embedding is close enough to a cached one in the
+same context is answered too. Entries expire after a TTL and the least
+recently used ones are evicted once the cache passes its size cap.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    context TEXT NOT NULL,     -- Hash of everything except the question
+    prompt TEXT NOT NULL,      -- Normalized question
+    response TEXT NOT NULL,
+    embedding BLOB,            -- float32 vector of the question, for the semantic tier
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_context ON responses (context);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+EVICT_BATCH = 32
+
+
+def normalize_prompt(prompt):
+    """Case, spacing and trailing punctuation don't change the question"""
+    return re.sub(r'\s+', ' ', prompt).strip().rstrip('?.!').strip().lower()
+
+
+def digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class CacheRequest:
+    """Identifies one chat request in the cache"""
+
+    def __init__(self, model, messages, options=None):
+        self.prompt = normalize_prompt(messages[-1]['content'])
+        self.context = digest([model, options or {}, messages[:-1]])
+        self.key = digest([self.context, self.prompt])
+        self.embedding = None  # Filled in by a semantic lookup and stored with the answer
+
+
+class CacheHit:
+    def __init__(self, response, similarity=None):
+        self.response = response
+        self.similarity = similarity  # None for an exact match
+
+    def summary(self):
+        if self.similarity is None:
+            return "Cached answer"
+        return f"Cached answer to a similar question (similarity {self.similarity:.2f})"
+
+
+class ResponseCache:
+    """SQLite-backed answer cache that can be used from any thread"""
+
+    def __init__(self, path=config.RESPONSE_CACHE_DB, ttl=7 * 24 * 3600, max_bytes=50 * 2 ** 20,
+                 embedding_model=None, threshold=0.92):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.embedding_model = embedding_model
+        self.numpy = None
+        if embedding_model:
+            try:
+                import numpy
+                self.numpy = numpy
+            except ImportError:
+                print("Semantic response cache disabled: numpy is not installed")
+        self._vectors = {}  # Context -> (keys, normalized embedding matrix)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Must precede table creation; lets evictions give pages back to the file system
+        self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_settings(cls, settings, path=config.RESPONSE_CACHE_DB):
+        return cls(path, ttl=settings['response_cache_ttl'],
+                   max_bytes=int(settings['response_cache_max_mb'] * 2 ** 20),
+                   embedding_model=settings['embedding_model'] if settings['semantic_cache'] else None,
+                   threshold=settings['semantic_threshold'])
+
+    @property
+    def semantic(self):
+        return self.numpy is not None
+
+    def request(self, model, messages, options=None):
+        return CacheRequest(model, messages, options)
+
+    def lookup(self, request, client=None):
+        """CacheHit for request, or None
+
+        The semantic tier asks client for an embedding of the question, so
+        call this off the GUI thread.
+        """
+        hit = self.get(request)
+        if hit or not self.semantic or client is None:
+            return hit
+        try:
+            request.embedding = client.embeddings(self.embedding_model, request.prompt)
+        except Exception as e:
+            print(f"Error embedding prompt: {e}")
+            return None
+        return self.similar(request)
+
+    def get(self, request):
+        """Answer cached for exactly this request"""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT response FROM responses WHERE key = ? AND created > ?",
+                (request.key, time.time() - self.ttl)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?",
+                                     (time.time(), request.key))
+        return CacheHit(row[0])
+
+    def similar(self, request):
+        """Answer to the closest question in the same context, if it's close enough"""
+        np = self.numpy
+        query = np.asarray(request.embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        with self._lock:
+            keys, matrix = self._context_vectors(request.context, query.shape[0])
+            if not keys:
+                return None
+            scores = matrix @ (query / norm)
+            best = int(scores.argmax())
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                return None
+            with self._connection:
+                row = self._connection.execute(
+                    "SELECT response FROM responses WHERE key = ? AND created > ?",
+                    (keys[best], time.time() - self.ttl)).fetchone()
+                if row is None:
+                    self._vectors.pop(request.context, None)  # Expired since it was loaded
+                    return None
+                self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?",
+                                         (time.time(), keys[best]))
+        return CacheHit(row[0], similarity)
+
+    def _context_vectors(self, context, dimensions):
+        if context not in self._vectors:
+            np = self.numpy
+            rows = self._connection.execute(
+                "SELECT key, embedding FROM responses"
+                " WHERE context = ? AND embedding IS NOT NULL AND created > ?",
+                (context, time.time() - self.ttl)).fetchall()
+            rows = [(key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows]
+            # Vectors from another embedding model can't be compared
+            rows = [(key, vector) for key, vector in rows if vector.shape[0] == dimensions]
+            matrix = np.array([vector for _, vector in rows], dtype=np.float32).reshape(-1, dimensions)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+            self._vectors[context] = ([key for key, _ in rows], matrix)
+        return self._vectors[context]
+
+    def put(self, request, response):
+        embedding = None
+        if request.embedding is not None and self.semantic:
+            embedding = self.numpy.asarray(request.embedding, dtype=self.numpy.float32).tobytes()
+        size = len(request.prompt) + len(response.encode()) + len(embedding or b'')
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, context, prompt, response, embedding, created, last_used, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (request.key, request.context, request.prompt, response, embedding, now, now, size))
+            self._vectors.pop(request.context, None)
+            self._evict()
+
+    def _evict(self):
+        connection = self._connection
+        removed = connection.execute("DELETE FROM responses WHERE created <= ?",
+                                     (time.time() - self.ttl,)).rowcount
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            rows = connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT ?",
+                (EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        if removed:
+            self._vectors.clear()
+            connection.execute("PRAGMA incremental_vacuum").fetchall()
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+            self._vectors.clear()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
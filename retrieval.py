@@ -0,0 +1,652 @@
+"""Passages from local man pages and package docs, to ground answers.
+
+DocumentIndex splits man pages and the README-style files under
+/usr/share/doc into passages and keeps them in index.db under RETRIEVAL_DIR.
+Passages are found by BM25 over an inverted index or, once an embedding model
+has embedded them through /api/embeddings, by cosine similarity. Both indexes
+are .npy files that are memory-mapped, so opening them reads almost nothing.
+Weak matches are dropped rather than returned, so small talk and questions
+the documentation doesn't cover are sent without passages.
+
+update() only rereads files whose mtime changed and only embeds passages that
+have no vector yet, so after the first run it costs a directory scan.
+
+Needs numpy; without it retrieval is off.
+"""
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    title TEXT NOT NULL,       -- For example "tar(1) OPTIONS"
+    text TEXT NOT NULL,
+    embedding BLOB             -- float32 vector from the embedding model, if one is set
+);
+CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+DEFAULT_PATHS = ('/usr/share/man', '/usr/share/doc')
+PASSAGE_CHARS = 1200
+MIN_PASSAGE_CHARS = 200  # A passage cut to fit the context is dropped below this
+GROUNDING_HEADER = "Excerpts from the local documentation that may help:\n\n"
+QUESTION_LABEL = "\n\nQuestion: "
+MAX_FILE_BYTES = 2 * 2 ** 20
+# Vectors with more dimensions are searched in two steps: a product with a
+# projection onto the leading REDUCED_DIMENSIONS singular vectors finds
+# RERANK candidates, and the full vectors order those
+REDUCED_DIMENSIONS = 128
+RERANK = 200
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3  # A title word counts as often as this in BM25
+# A BM25 match needs this many query words and this share of their idf, so a
+# "thanks" or "hello" that happens to occur in some page doesn't pull it in
+MIN_MATCHED_TERMS = 2
+MIN_COVERAGE = 0.6
+MIN_SIMILARITY = 0.5  # Cosine a vector match needs; unrelated text scores lower
+PARSER_VERSION = '2'  # Bumped when parsing changes, so every file is read again
+
+TOKEN_RE = re.compile(r'[a-z0-9_]+(?:[.+-][a-z0-9_]+)*')
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from has have how i if in into is it its
+me my of on or so than that the their then there these this to use used using was what
+when where which while who why will with you your
+""".split())
+
+# Man page sections that add nothing an answer needs; a heading such as
+# "AUTHORS / CONTRIBUTORS" is skipped if any of its parts is
+SKIPPED_SECTIONS = frozenset(('AUTHOR', 'AUTHORS', 'COPYRIGHT', 'REPORTING BUGS', 'COLOPHON',
+                              'SEE ALSO', 'HISTORY', 'LICENSE', 'TRANSLATION', 'TRANSLATIONS',
+                              'THANKS', 'ACKNOWLEDGEMENTS', 'ACKNOWLEDGMENTS', 'CONTRIBUTORS',
+                              'CREDITS', 'MAINTAINERS', 'MANPAGE AUTHORS'))
+HEADING_SEPARATOR_RE = re.compile(r'\s*(?:/|&|,|\bAND\b)\s*')
+# Requests that format text rather than contain it
+SKIPPED_REQUESTS = frozenset((
+    'ad', 'bp', 'br', 'ce', 'de', 'ds', 'el', 'fi', 'ft', 'hy', 'ie', 'if', 'in', 'ig', 'll',
+    'na', 'ne', 'nf', 'nh', 'nr', 'ps', 'rm', 'rr', 'so', 'ta', 'ti', 'tr', 'vs',
+    'EE', 'EX', 'RE', 'RS', 'PD', 'UC', 'UE', 'ME', 'TA', 'TQ', 'DT', 'HP', 'IX',
+    'Dd', 'Os', 'Bl', 'El', 'Bd', 'Ed', 'Bf', 'Ef', 'Bk', 'Ek', 'Pp', 'Lp', 'Ns', 'Sm'))
+PARAGRAPH_REQUESTS = frozenset(('PP', 'P', 'LP', 'sp', 'TP', 'Pp', 'Lp', 'It'))
+GLYPHS = {'em': '—', 'en': '–', 'bu': '•', 'aq': "'", 'dq': '"', 'lq': '"', 'rq': '"',
+          'oq': "'", 'cq': "'", 'ga': '`', 'ti': '~', 'ha': '^', 'rs': '\\', 'co': '©',
+          'mi': '-', 'hy': '-', 'pl': '+', 'eq': '=', 'or': '|', 'da': '↓', 'ua': '↑',
+          '->': '→', '<-': '←', 'mu': '×', 'de': '°', 'ba': '|', 'at': '@', 'sh': '#'}
+ESCAPE_RE = re.compile(r"""\\(?:
+    f(?:\[[^\]]*\]|\(..|.)      # Font changes
+  | s[+-]?(?:\d|\(\d\d|\[\d+\]) # Size changes
+  | \((..)                      # Two-character glyphs
+  | \[([^\]]*)\]                # Named glyphs
+  | \*(?:\(..|\[[^\]]*\]|.)     # Strings
+  | [&|^%cdu]                   # Zero-width and motion
+  | (.)                         # \- \e \  and the rest
+)""", re.VERBOSE)
+DOC_NAME_RE = re.compile(r'^(readme|faq|howto|usage|quickstart|getting.?started)|'
+                         r'\.(md|txt|rst)$', re.IGNORECASE)
+# Release notes and credits match many words without explaining anything
+SKIPPED_DOC_RE = re.compile(r'^(changelog|changes|news|history|release.?notes|authors|thanks|'
+                            r'credits|contributors|copying|license)|^v?\d+(\.\d+)+\.',
+                            re.IGNORECASE)
+
+
+def tokenize(text, parts=False):
+    """Words of text; with parts, "tar.gz" also gives "tar" and "gz" """
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token not in STOPWORDS:
+            tokens.append(token)
+        if parts and ('.' in token or '-' in token or '+' in token):
+            tokens.extend(part for part in re.split(r'[.+-]', token) if part not in STOPWORDS)
+    return tokens
+
+
+def unescape_roff(text):
+    def replace(match):
+        glyph, named, other = match.group(1), match.group(2), match.group(3)
+        if glyph is not None:
+            return GLYPHS.get(glyph, '')
+        if named is not None:
+            return GLYPHS.get(named, '')
+        if other is not None:
+            return {'e': '\\', '~': ' ', '0': ' ', ' ': ' '}.get(other, other)
+        return ''
+    return ESCAPE_RE.sub(replace, text)
+
+
+def split_arguments(text):
+    """Arguments of a roff request; double quotes group words"""
+    return [quoted or plain for quoted, plain in re.findall(r'"([^"]*)"|(\S+)', text)]
+
+
+def read_text(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        data = f.read(MAX_FILE_BYTES + 1)
+    if len(data) > MAX_FILE_BYTES or b'\0' in data[:1024]:
+        return None
+    return data.decode('utf-8', errors='replace')
+
+
+def skipped_section(heading):
+    return any(part in SKIPPED_SECTIONS for part in HEADING_SEPARATOR_RE.split(heading))
+
+
+def parse_man_page(source, fallback_title):
+    """(title, [(section heading, text)]) of a man or mdoc page; None for a .so alias"""
+    title = fallback_title
+    sections = []
+    heading = ''
+    lines = []
+    for line in source.splitlines():
+        if line.startswith(('.\\"', "'\\\"", '.\\#')) or line == '.':
+            continue
+        if not line.startswith(('.', "'")):
+            lines.append(unescape_roff(line))
+            continue
+        request, _, rest = line[1:].strip().partition(' ')
+        arguments = split_arguments(rest)
+        if request == 'so':
+            return None
+        if request in ('TH', 'Dt') and arguments:
+            arguments = [unescape_roff(argument) for argument in arguments]
+            title = f"{arguments[0].lower()}({arguments[1]})" if len(arguments) > 1 else arguments[0]
+        elif request in ('SH', 'Sh', 'SS', 'Ss'):
+            if request in ('SH', 'Sh'):
+                sections.append((heading, '\n'.join(lines)))
+                heading = unescape_roff(' '.join(arguments)).upper()
+                lines = []
+            else:
+                lines.extend(('', unescape_roff(' '.join(arguments))))
+        elif request in PARAGRAPH_REQUESTS:
+            lines.append('')
+        elif request == 'IP':
+            lines.extend(('', unescape_roff(arguments[0]) if arguments else ''))
+        elif request == 'Fl':
+            lines.append(' '.join('-' + unescape_roff(argument) for argument in arguments))
+        elif request not in SKIPPED_REQUESTS and arguments:
+            # Font requests (.B, .BR, ...) and mdoc's semantic ones (.Nm, .Ar, ...) carry text
+            joiner = '' if len(request) == 2 and request.isupper() and request[0] in 'BIR' else ' '
+            lines.append(unescape_roff(joiner.join(arguments)))
+    sections.append((heading, '\n'.join(lines)))
+    return title, [(heading, text) for heading, text in sections
+                   if not skipped_section(heading) and text.strip()]
+
+
+def split_passages(text, size=PASSAGE_CHARS):
+    """Paragraphs of text packed into passages of about size characters"""
+    passages = []
+    current = []
+    length = 0
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = re.sub(r'[ \t]+', ' ', paragraph).strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > size:
+            cut = paragraph.rfind('\n', 0, size)
+            if cut < size // 2:
+                cut = paragraph.rfind(' ', 0, size)
+            if cut < size // 2:
+                cut = size
+            passages.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and length + len(paragraph) > size:
+            passages.append('\n\n'.join(current))
+            current, length = [], 0
+        current.append(paragraph)
+        length += len(paragraph) + 2
+    if current:
+        passages.append('\n\n'.join(current))
+    return passages
+
+
+def man_page_name(path):
+    name = os.path.basename(path)
+    if name.endswith('.gz'):
+        name = name[:-3]
+    base, _, section = name.rpartition('.')
+    return f"{base}({section})" if base else name
+
+
+def document_passages(path):
+    """(title, text) of every passage of the file at path"""
+    source = read_text(path)
+    if source is None:
+        return []
+    if '/man/' in path:
+        parsed = parse_man_page(source, man_page_name(path))
+        if parsed is None:
+            return []
+        title, sections = parsed
+        # The NAME line ("ls - list directory contents") says what every passage is about
+        summary = ' '.join(sections[0][1].split()) if sections and sections[0][0] == 'NAME' else ''
+        if len(sections) > 2:
+            # Every passage starts with the NAME line, and a synopsis alone explains nothing
+            sections = [section for section in sections if section[0] not in ('NAME', 'SYNOPSIS')]
+        passages = []
+        for heading, text in sections:
+            for passage in split_passages(text):
+                if summary and heading != 'NAME':
+                    passage = f"{summary}\n\n{passage}"
+                passages.append((f"{title} {heading}".strip(), passage))
+        return passages
+    parts = path.split(os.sep)
+    package = parts[parts.index('doc') + 1] if 'doc' in parts[:-1] else os.path.dirname(path)
+    title = f"{package}: {os.path.basename(path)}"
+    return [(title, passage) for passage in split_passages(source)]
+
+
+def find_documents(paths):
+    """(path, mtime) of every indexable file under paths
+
+    Under a man directory only the English manN sections are read; localized
+    pages would duplicate them. Symbolic links are aliases and are skipped.
+    """
+    for root in paths:
+        is_man = 'man' in root.rstrip(os.sep).split(os.sep)
+        for directory, subdirectories, files in os.walk(root):
+            if is_man and directory == root:
+                subdirectories[:] = [d for d in subdirectories if re.fullmatch(r'man\w+', d)]
+            for name in files:
+                path = os.path.join(directory, name)
+                if not is_man:
+                    stem = name[:-3] if name.endswith('.gz') else name
+                    if not DOC_NAME_RE.search(stem) or SKIPPED_DOC_RE.search(stem):
+                        continue
+                try:
+                    if os.path.islink(path):
+                        continue
+                    yield path, os.stat(path).st_mtime
+                except OSError:
+                    continue
+
+
+class Passage:
+    def __init__(self, title, text, score):
+        self.title = title
+        self.text = text
+        self.score = score
+
+
+def passage_room(budget, messages):
+    """Characters a ContextBudget leaves for passages in front of the last message
+
+    History is never trimmed to make room; passages get what is left under
+    the limit, so a long conversation is sent with fewer or shorter ones.
+    """
+    free = int((budget.limit - budget.estimate_messages(messages)) * budget.chars_per_token)
+    return max(0, free - len(GROUNDING_HEADER) - len(QUESTION_LABEL))
+
+
+def fit_passages(passages, room):
+    """The passages, best first, that fit in room characters; the last one may be cut short"""
+    fitted = []
+    for passage in passages:
+        room -= len(passage.title) + 4  # Brackets and line breaks
+        if len(passage.text) <= room:
+            fitted.append(passage)
+            room -= len(passage.text) + 2
+            continue
+        if room >= MIN_PASSAGE_CHARS:
+            text = passage.text[:room]
+            text = text[:text.rfind('\n')] if text.rfind('\n') >= MIN_PASSAGE_CHARS else text
+            fitted.append(Passage(passage.title, text.rstrip() + ' …', passage.score))
+        break
+    return fitted
+
+
+def ground_prompt(prompt, passages):
+    """prompt with the passages in front of it"""
+    if not passages:
+        return prompt
+    excerpts = '\n\n'.join(f"[{passage.title}]\n{passage.text}" for passage in passages)
+    return f"{GROUNDING_HEADER}{excerpts}{QUESTION_LABEL}{prompt}"
+
+
+class DocumentIndex:
+    """Passage store and search indexes in one directory, usable from any thread"""
+
+    def __init__(self, path=config.RETRIEVAL_DIR, embedding_model=None):
+        import numpy
+        self.numpy = numpy
+        self.path = path
+        self.embedding_model = embedding_model
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(path, 'index.db'),
+                                           check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        # Arrays of the last build; see load()
+        self.chunk_ids = None
+        self.terms = None
+        self.offsets = self.postings = self.weights = None
+        self.vectors = self.reduced = self.projection = None
+
+    @classmethod
+    def from_settings(cls, settings, path=config.RETRIEVAL_DIR):
+        model = settings['embedding_model'] if settings['retrieval_embeddings'] else None
+        return cls(path, embedding_model=model)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def __len__(self):
+        return 0 if self.chunk_ids is None else len(self.chunk_ids)
+
+    def meta(self, key):
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                 (key, value))
+
+    def update(self, paths=DEFAULT_PATHS, client=None, progress=None, should_stop=None):
+        """Bring the index up to date with the files under paths
+
+        Changed files are reread and their passages replaced; with an
+        embedding model and a client, passages without a vector are embedded.
+        progress is called with (stage, done, total). Returns False if
+        should_stop() asked to stop before the indexes were rebuilt.
+        """
+        should_stop = should_stop or (lambda: False)
+        connection = self._connection
+        with self._lock, connection:
+            if self.meta('parser_version') != PARSER_VERSION:
+                # Read every file again; files that are gone are still found and deleted
+                connection.execute("UPDATE files SET mtime = -1")
+                self.set_meta('parser_version', PARSER_VERSION)
+            known = dict(connection.execute("SELECT path, mtime FROM files"))
+        found = dict(find_documents(paths))
+        changed = [path for path, mtime in found.items() if known.get(path) != mtime]
+        removed = [path for path in known if path not in found]
+        for number, path in enumerate(changed):
+            if should_stop():
+                return False
+            if progress and number % 100 == 0:
+                progress('reading', number, len(changed))
+            try:
+                passages = document_passages(path)
+            except (OSError, EOFError, ValueError) as e:
+                print(f"Error reading {path}: {e}")
+                passages = []
+            self.replace_file(path, found[path], passages)
+        if removed:
+            with self._lock, connection:
+                connection.executemany("DELETE FROM chunks WHERE path = ?",
+                                       [(path,) for path in removed])
+                connection.executemany("DELETE FROM files WHERE path = ?",
+                                       [(path,) for path in removed])
+                self.set_meta('stale', '1')
+
+        if self.embedding_model and client is not None:
+            if self.embed_missing(client, progress, should_stop) is None:
+                return False
+        with self._lock:
+            stale = self.meta('stale') or not os.path.exists(self.file('chunk_ids.npy'))
+        if stale:
+            if should_stop():
+                return False
+            if progress:
+                progress('indexing', 0, 1)
+            return self.build(should_stop)
+        return True
+
+    def replace_file(self, path, mtime, passages):
+        """Store the (title, text) passages of a file in place of its old ones"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM chunks WHERE path = ?", (path,))
+            self._connection.executemany("INSERT INTO chunks (path, title, text) VALUES (?, ?, ?)",
+                                         [(path, title, text) for title, text in passages])
+            self._connection.execute("INSERT OR REPLACE INTO files (path, mtime) VALUES (?, ?)",
+                                     (path, mtime))
+            # Passages changed since the arrays were written; cleared by build()
+            self.set_meta('stale', '1')
+
+    def embed_missing(self, client, progress=None, should_stop=None):
+        """Embed passages without a vector; True if any were, None if stopped"""
+        should_stop = should_stop or (lambda: False)
+        connection = self._connection
+        with self._lock, connection:
+            if self.meta('embedding_model') != self.embedding_model:
+                connection.execute("UPDATE chunks SET embedding = NULL")
+                self.set_meta('embedding_model', self.embedding_model)
+            missing = connection.execute(
+                "SELECT id, title, text FROM chunks WHERE embedding IS NULL").fetchall()
+        batch = []
+        for number, (chunk_id, title, text) in enumerate(missing):
+            if should_stop():
+                self._store_embeddings(batch)
+                return None
+            if progress and number % 100 == 0:
+                progress('embedding', number, len(missing))
+            try:
+                vector = client.embeddings(self.embedding_model, f"{title}\n{text}")
+            except Exception as e:
+                # Searches use BM25 until every passage has a vector
+                print(f"Error embedding passages: {e}")
+                self._store_embeddings(batch)
+                return False
+            batch.append((self.numpy.asarray(vector, dtype=self.numpy.float32).tobytes(), chunk_id))
+            if len(batch) >= 64:
+                self._store_embeddings(batch)
+                batch = []
+        self._store_embeddings(batch)
+        return bool(missing)
+
+    def _store_embeddings(self, batch):
+        if batch:
+            with self._lock, self._connection:
+                self._connection.executemany("UPDATE chunks SET embedding = ? WHERE id = ?", batch)
+                self.set_meta('stale', '1')
+
+    def build(self, should_stop=None):
+        """Write the BM25 and vector arrays for every stored passage; False if stopped"""
+        should_stop = should_stop or (lambda: False)
+        np = self.numpy
+        with self._lock:
+            rows = self._connection.execute("SELECT id, title, text FROM chunks ORDER BY id").fetchall()
+        chunk_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+
+        # Inverted index with the BM25 weight of every posting worked out in advance. Postings
+        # are collected in flat arrays rather than per-term lists of tuples: millions of small
+        # objects would make the garbage collector stall the GUI thread
+        vocabulary = {}
+        term_ids, posting_rows, counts = array('i'), array('i'), array('f')
+        lengths = np.empty(len(rows), dtype=np.float32)
+        for number, (_id, title, text) in enumerate(rows):
+            if number % 1000 == 0 and should_stop():
+                return False
+            tokens = Counter(tokenize(title) * TITLE_WEIGHT + tokenize(text))
+            lengths[number] = sum(tokens.values())
+            term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in tokens)
+            posting_rows.extend([number] * len(tokens))
+            counts.extend(tokens.values())
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')  # By term, then by row
+        postings = np.frombuffer(posting_rows, dtype=np.int32)[order]
+        counts = np.frombuffer(counts, dtype=np.float32)[order]
+        frequencies = np.bincount(term_ids, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(frequencies, out=offsets[1:])
+        average = float(lengths.mean()) if len(rows) else 1.0
+        idf = np.log(1 + (len(rows) - frequencies + 0.5) / (frequencies + 0.5)).astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[postings] / average)
+        weights = np.repeat(idf, frequencies) * counts * (BM25_K1 + 1) / (counts + norm)
+        terms = list(vocabulary)
+        arrays = {
+            'chunk_ids.npy': chunk_ids,
+            'bm25_offsets.npy': offsets,
+            'bm25_postings.npy': postings,
+            'bm25_weights.npy': weights.astype(np.float32),
+        }
+
+        vectors = self._stored_vectors(chunk_ids)
+        if vectors is not None:
+            arrays['vectors.npy'] = vectors
+            if vectors.shape[1] > REDUCED_DIMENSIONS and len(vectors) > RERANK:
+                sample = vectors[np.random.default_rng(0).permutation(len(vectors))[:5000]]
+                projection = np.linalg.svd(sample, full_matrices=False)[2][:REDUCED_DIMENSIONS].T
+                arrays['projection.npy'] = np.ascontiguousarray(projection, dtype=np.float32)
+                arrays['reduced.npy'] = vectors @ arrays['projection.npy']
+        for name in ('vectors.npy', 'projection.npy', 'reduced.npy'):
+            if name not in arrays and os.path.exists(self.file(name)):
+                os.remove(self.file(name))
+
+        # Readers keep the old files mapped until they load the new ones
+        for name, values in arrays.items():
+            np.save(self.file(name + '.tmp.npy'), values)
+            os.replace(self.file(name + '.tmp.npy'), self.file(name))
+        with open(self.file('bm25_terms.json.tmp'), 'w') as f:
+            json.dump(terms, f)
+        os.replace(self.file('bm25_terms.json.tmp'), self.file('bm25_terms.json'))
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM meta WHERE key = 'stale'")
+        return True
+
+    def _stored_vectors(self, chunk_ids):
+        """Normalized embeddings in chunk_ids order, or None unless every passage has one"""
+        if not self.embedding_model or not len(chunk_ids):
+            return None
+        np = self.numpy
+        with self._lock:
+            if self.meta('embedding_model') != self.embedding_model:
+                return None
+            rows = self._connection.execute(
+                "SELECT embedding FROM chunks ORDER BY id").fetchall()
+        if any(row[0] is None for row in rows):
+            return None
+        vectors = np.vstack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (vectors / norms).astype(np.float32)
+
+    def load(self):
+        """Map the arrays of the last build; False if there is none yet"""
+        np = self.numpy
+        if not os.path.exists(self.file('chunk_ids.npy')):
+            return False
+        try:
+            chunk_ids = np.load(self.file('chunk_ids.npy'), mmap_mode='r')
+            with open(self.file('bm25_terms.json')) as f:
+                terms = {term: number for number, term in enumerate(json.load(f))}
+            offsets = np.load(self.file('bm25_offsets.npy'))
+            postings = np.load(self.file('bm25_postings.npy'), mmap_mode='r')
+            weights = np.load(self.file('bm25_weights.npy'), mmap_mode='r')
+            vectors = reduced = projection = None
+            if self.embedding_model and os.path.exists(self.file('vectors.npy')):
+                vectors = np.load(self.file('vectors.npy'), mmap_mode='r')
+                if os.path.exists(self.file('reduced.npy')):
+                    reduced = np.load(self.file('reduced.npy'), mmap_mode='r')
+                    projection = np.load(self.file('projection.npy'))
+        except (OSError, ValueError) as e:
+            print(f"Error loading document index: {e}")
+            return False
+        with self._lock:
+            self.chunk_ids, self.terms = chunk_ids, terms
+            self.offsets, self.postings, self.weights = offsets, postings, weights
+            self.vectors, self.reduced, self.projection = vectors, reduced, projection
+        return True
+
+    def search(self, query, k=3, client=None):
+        """The k passages that best match query
+
+        With vectors and a client the query is embedded, which is a request
+        to Ollama, so call this off the GUI thread. BM25 is used otherwise
+        and whenever embedding fails.
+        """
+        if not len(self):
+            return []
+        rows = scores = None
+        if self.vectors is not None and client is not None:
+            try:
+                embedding = client.embeddings(self.embedding_model, query)
+            except Exception as e:
+                print(f"Error embedding query: {e}")
+            else:
+                rows, scores = self.search_vectors(embedding, k)
+        if rows is None:
+            rows, scores = self.search_bm25(query, k)
+        return self.passages(rows, scores)
+
+    def search_bm25(self, query, k):
+        np = self.numpy
+        count = len(self.chunk_ids)
+        scores = np.zeros(count, dtype=np.float32)
+        matched = np.zeros(count, dtype=np.int32)
+        covered = np.zeros(count, dtype=np.float32)
+        total = 0.0
+        # Parts only on the query side: "ls" shouldn't match every git-ls-* page
+        for term in set(tokenize(query, parts=True)):
+            number = self.terms.get(term)
+            start, end = 0, 0
+            if number is not None:
+                start, end = self.offsets[number], self.offsets[number + 1]
+            # Words the documentation never uses count against coverage as the rarest
+            idf = float(np.log(1 + (count - (end - start) + 0.5) / (end - start + 0.5)))
+            total += idf
+            if number is None:
+                continue
+            rows = self.postings[start:end]
+            # A passage appears once per term, so this doesn't lose repeated indices
+            scores[rows] += self.weights[start:end]
+            matched[rows] += 1
+            covered[rows] += idf
+        scores[(matched < MIN_MATCHED_TERMS) | (covered < MIN_COVERAGE * total)] = 0
+        return self.top(scores, np.arange(count), k)
+
+    def search_vectors(self, embedding, k):
+        np = self.numpy
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm or query.shape[0] != self.vectors.shape[1]:
+            return None, None
+        query /= norm
+        if self.reduced is not None:
+            coarse = self.reduced @ (query @ self.projection)
+            candidates = np.sort(np.argpartition(coarse, -RERANK)[-RERANK:])
+            rows, scores = candidates, self.vectors[candidates] @ query
+        else:
+            rows, scores = np.arange(len(self.vectors)), self.vectors @ query
+        return self.top(np.where(scores >= MIN_SIMILARITY, scores, 0), rows, k)
+
+    def top(self, scores, rows, k):
+        np = self.numpy
+        if len(scores) > k:
+            best = np.argpartition(scores, -k)[-k:]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        best = best[scores[best] > 0]
+        return rows[best], scores[best]
+
+    def passages(self, rows, scores):
+        ids = [int(self.chunk_ids[row]) for row in rows]
+        if not ids:
+            return []
+        with self._lock:
+            found = {chunk_id: (title, text) for chunk_id, title, text in self._connection.execute(
+                f"SELECT id, title, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        return [Passage(*found[chunk_id], float(score))
+                for chunk_id, score in zip(ids, scores) if chunk_id in found]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
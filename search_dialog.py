@@ -0,0 +1,103 @@
+"""Dialog for searching the conversation history."""
+import time
+from html import escape
+
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtWidgets import QDialog, QLabel, QLineEdit, QListWidget, QListWidgetItem, QVBoxLayout
+
+from conversation_store import SNIPPET_START, SNIPPET_END
+from styles import SEARCH_MATCH_STYLE
+
+
+def snippet_html(snippet):
+    """Escape a search snippet and highlight the terms it matched"""
+    return (escape(snippet)
+            .replace(SNIPPET_START, f'<span style="{SEARCH_MATCH_STYLE}">')
+            .replace(SNIPPET_END, '</span>'))
+
+
+class SearchDialog(QDialog):
+    message_selected = Signal(str, int, str)  # Conversation id, turn, role
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("Search History")
+        self.resize(500, 600)
+
+        layout = QVBoxLayout(self)
+        self.query_field = QLineEdit()
+        self.query_field.setPlaceholderText("search past questions and answers")
+        self.query_field.setClearButtonEnabled(True)
+        self.query_field.textChanged.connect(lambda: self.search_timer.start())
+        self.query_field.returnPressed.connect(self.open_first_result)
+        layout.addWidget(self.query_field)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.results = QListWidget()
+        self.results.setWordWrap(True)
+        self.results.itemActivated.connect(self.open_result)
+        self.results.itemClicked.connect(self.open_result)
+        layout.addWidget(self.results)
+
+        # Queries are fast, but there's no point running one per keystroke while typing
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(self.run_search)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.query_field.setFocus()
+        self.query_field.selectAll()
+        if self.query_field.text():
+            self.run_search()  # Messages may have been added since the last search
+
+    def run_search(self):
+        self.results.clear()
+        text = self.query_field.text()
+        if not text.strip():
+            self.status_label.clear()
+            return
+        start = time.perf_counter()
+        try:
+            matches = self.store.search(text)
+        except Exception as e:
+            self.status_label.setText(f"Search failed: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.status_label.setText(f"{len(matches)} results in {elapsed:.1f} ms")
+        for match in matches:
+            self.add_result(match)
+
+    def add_result(self, match):
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(match['created']))
+        author = "You" if match['role'] == 'user' else "AI"
+        label = QLabel(f"<b>{author}</b> · {when} · <i>{escape(match['title'] or '')}</i>"
+                       f"<br>{snippet_html(match['snippet'])}")
+        label.setWordWrap(True)
+        label.setTextFormat(Qt.RichText)
+        label.setContentsMargins(4, 4, 4, 4)
+        label.setAttribute(Qt.WA_TransparentForMouseEvents)  # Let clicks select the row
+
+        item = QListWidgetItem()
+        item.setData(Qt.UserRole, (match['conversation_id'], match['turn'], match['role']))
+        self.results.addItem(item)
+        self.results.setItemWidget(item, label)
+        item.setSizeHint(label.sizeHint())
+
+    def open_first_result(self):
+        if self.search_timer.isActive():
+            self.search_timer.stop()
+            self.run_search()
+        if self.results.count():
+            self.open_result(self.results.item(0))
+
+    def open_result(self, item):
+        if not self.isVisible():
+            return  # Styles that activate on single click also report the click
+        conversation_id, turn, role = item.data(Qt.UserRole)
+        self.message_selected.emit(conversation_id, turn, role)
+        self.hide()
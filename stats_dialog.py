@@ -0,0 +1,90 @@
+"""Panel with rolling latency and throughput percentiles per model."""
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (QDialog, QFileDialog, QHBoxLayout, QHeaderView, QLabel, QPushButton,
+                               QSpinBox, QTableWidget, QTableWidgetItem, QVBoxLayout)
+
+from telemetry import METRICS, export
+
+PERCENTILES = (50, 90, 99)
+
+
+def format_value(value, unit):
+    if value is None:
+        return "–"
+    return f"{value:.2f}" if unit == 's' else f"{value:.1f}"
+
+
+class StatsDialog(QDialog):
+    def __init__(self, telemetry, window=100, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.setWindowTitle("Performance Stats")
+        self.resize(900, 400)
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Last"))
+        self.window_box = QSpinBox()
+        self.window_box.setRange(1, 100000)
+        self.window_box.setValue(window)
+        self.window_box.valueChanged.connect(self.refresh)
+        controls.addWidget(self.window_box)
+        controls.addWidget(QLabel("answers per model"))
+        controls.addStretch()
+        export_button = QPushButton("Export…")
+        export_button.clicked.connect(self.export)
+        controls.addWidget(export_button)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+        controls.addWidget(clear_button)
+        layout.addLayout(controls)
+
+        # One column per metric percentile; rates show the low percentiles, since low is slow
+        self.columns = []
+        for name, unit, _value, higher_is_better in METRICS:
+            for p in PERCENTILES:
+                shown = 100 - p if higher_is_better else p
+                self.columns.append((name, unit, shown))
+        self.table = QTableWidget(0, len(self.columns) + 2)
+        self.table.setHorizontalHeaderLabels(
+            ["model", "n"] + [f"{name} p{p}\n({unit})" for name, unit, p in self.columns])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def refresh(self):
+        shown = sorted({p for _name, _unit, p in self.columns})
+        summary = self.telemetry.summary(self.window_box.value(), shown)
+        self.table.setRowCount(len(summary))
+        for row, (model, entry) in enumerate(summary.items()):
+            cells = [model, str(entry['count'])]
+            cells += [format_value(entry[name].get(p), unit) for name, unit, p in self.columns]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.status_label.setText("" if summary else "No answers recorded yet")
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Stats", "ollama_stats.csv",
+                                              "CSV (*.csv);;JSON (*.json)")
+        if not path:
+            return
+        try:
+            export(self.telemetry.samples(), path)
+        except OSError as e:
+            self.status_label.setText(f"Export failed: {e}")
+            return
+        self.status_label.setText(f"Exported to {path}")
+
+    def clear(self):
+        self.telemetry.clear()
+        self.refresh()
@@ -0,0 +1,162 @@
+"""Per-answer latency and throughput samples, for spotting regressions.
+
+Every streamed answer records the server timings from the last object of
+the stream together with what the app measured itself: time to first
+token, wall-clock time and the GUI time spent rendering. Samples carry the
+model digest, so runs before and after a model or driver update can be
+told apart in an export.
+"""
+import csv
+import json
+import math
+import os
+import sqlite3
+import time
+
+import config
+
+# Server timings are nanoseconds, as Ollama reports them; client timings are seconds
+FIELDS = ('created', 'model', 'digest',
+          'total_duration', 'load_duration', 'prompt_eval_count', 'prompt_eval_duration',
+          'eval_count', 'eval_duration',
+          'first_token', 'wall_time', 'render_time', 'frames', 'update_latency_p95')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    model TEXT NOT NULL,
+    digest TEXT,
+    total_duration INTEGER,
+    load_duration INTEGER,
+    prompt_eval_count INTEGER,
+    prompt_eval_duration INTEGER,
+    eval_count INTEGER,
+    eval_duration INTEGER,
+    first_token REAL,          -- Request sent to first token received
+    wall_time REAL,            -- Request sent to stream closed
+    render_time REAL,          -- GUI time spent showing the answer
+    frames INTEGER,
+    update_latency_p95 REAL    -- Token arrival to screen update
+);
+CREATE INDEX IF NOT EXISTS samples_model ON samples (model, id);
+"""
+
+# Shown by the stats panel: name, unit, function of a sample, higher is better
+METRICS = (
+    ('first token', 's', lambda s: s['first_token'], False),
+    ('eval rate', 'tok/s',
+     lambda s: s['eval_count'] / (s['eval_duration'] / 1e9) if s['eval_duration'] else None, True),
+    ('prompt eval rate', 'tok/s',
+     lambda s: (s['prompt_eval_count'] / (s['prompt_eval_duration'] / 1e9)
+                if s['prompt_eval_duration'] else None), True),
+    ('load', 's', lambda s: s['load_duration'] / 1e9 if s['load_duration'] is not None else None,
+     False),
+    ('total', 's', lambda s: s['wall_time'], False),
+    ('render', 'ms', lambda s: s['render_time'] * 1000 if s['render_time'] is not None else None,
+     False),
+)
+
+
+def percentile(values, p):
+    """p-th percentile of sorted values, interpolating between neighbours"""
+    if not values:
+        return None
+    position = (len(values) - 1) * p / 100
+    low = math.floor(position)
+    high = math.ceil(position)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def sample_from(model, digest, stats, worker, render_scheduler=None):
+    """Sample of one finished stream
+
+    stats is the TurnStats of the answer, worker the GenerationWorker that
+    streamed it and render_scheduler the RenderScheduler that showed it.
+    """
+    sample = {'created': time.time(), 'model': model, 'digest': digest}
+    for field in ('total_duration', 'load_duration', 'prompt_eval_count',
+                  'prompt_eval_duration', 'eval_count', 'eval_duration'):
+        sample[field] = getattr(stats, field)
+    started = worker.request_started_at
+    sample['first_token'] = (worker.first_token_at - started
+                             if started is not None and worker.first_token_at is not None else None)
+    sample['wall_time'] = (worker.finished_at - started
+                           if started is not None and worker.finished_at is not None else None)
+    sample['render_time'] = sample['frames'] = sample['update_latency_p95'] = None
+    if render_scheduler is not None and render_scheduler.render_times:
+        sample['render_time'] = sum(render_scheduler.render_times)
+        sample['frames'] = len(render_scheduler.render_times)
+        sample['update_latency_p95'] = percentile(sorted(render_scheduler.latencies), 95)
+    return sample
+
+
+class Telemetry:
+    """Samples kept in TELEMETRY_DB"""
+
+    def __init__(self, path=config.TELEMETRY_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def add(self, sample):
+        with self._connection:
+            self._connection.execute(
+                f"INSERT INTO samples ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                [sample.get(field) for field in FIELDS])
+
+    def models(self):
+        return [row[0] for row in self._connection.execute(
+            "SELECT DISTINCT model FROM samples ORDER BY model")]
+
+    def samples(self, model=None, limit=None):
+        """Samples oldest first; with a limit, the newest `limit` of them"""
+        query = f"SELECT {', '.join(FIELDS)} FROM samples"
+        params = []
+        if model is not None:
+            query += " WHERE model = ?"
+            params.append(model)
+        query += " ORDER BY id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = [dict(row) for row in self._connection.execute(query, params)]
+        rows.reverse()
+        return rows
+
+    def summary(self, window=100, percentiles=(50, 90, 99)):
+        """Rolling percentiles of every metric over the last `window` samples of each model
+
+        Returns {model: {'count': n, metric name: {p: value}}}; a metric
+        without values in the window maps to an empty dict.
+        """
+        result = {}
+        for model in self.models():
+            samples = self.samples(model, window)
+            entry = {'count': len(samples)}
+            for name, _unit, value, _higher in METRICS:
+                values = sorted(v for v in map(value, samples) if v is not None)
+                entry[name] = {p: percentile(values, p) for p in percentiles} if values else {}
+            result[model] = entry
+        return result
+
+    def clear(self):
+        with self._connection:
+            self._connection.execute("DELETE FROM samples")
+
+    def close(self):
+        self._connection.close()
+
+
+def export(samples, path):
+    """Write samples to path as JSON or, for any other extension, CSV"""
+    with open(path, 'w', newline='') as f:
+        if path.lower().endswith('.json'):
+            json.dump(samples, f, indent=1)
+        else:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(samples)
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+from chat_engine import Conversation, turns_from_messages
+from conversation_store import ConversationStore
+
+
+class InterleavedTurnsTest(unittest.TestCase):
+    """A follow-up queued while an answer streams is stored before that answer"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ConversationStore(os.path.join(self.directory.name, 'history.db'))
+        for turn, role, content in ((1, 'user', 'Q1'), (2, 'user', 'Q2'),
+                                    (1, 'assistant', 'A1'), (2, 'assistant', 'A2')):
+            self.store.add_message('c', turn, role, content)
+        self.store.flush()
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_load_messages_puts_each_answer_after_its_prompt(self):
+        messages = self.store.load_messages('c')
+        self.assertEqual([(m['turn'], m['role']) for m in messages],
+                         [(1, 'user'), (1, 'assistant'), (2, 'user'), (2, 'assistant')])
+
+    def test_turns_keep_both_answers(self):
+        turns = turns_from_messages(self.store.load_messages('c'))
+        self.assertEqual([(t.id, t.prompt, t.response) for t in turns],
+                         [(1, 'Q1', 'A1'), (2, 'Q2', 'A2')])
+
+    def test_answers_matched_by_turn_in_write_order(self):
+        messages = [{'turn': 1, 'role': 'user', 'content': 'Q1', 'stats': None},
+                    {'turn': 2, 'role': 'user', 'content': 'Q2', 'stats': None},
+                    {'turn': 1, 'role': 'assistant', 'content': 'A1', 'stats': None},
+                    {'turn': 2, 'role': 'assistant', 'content': 'A2', 'stats': None}]
+        conversation = Conversation("system")
+        conversation.restore_turns(turns_from_messages(messages))
+        messages, _dropped = conversation.messages_for(conversation.add_turn('Q3'))
+        roles = [m['role'] for m in messages]
+        self.assertEqual(roles, ['system', 'user', 'assistant', 'user', 'assistant', 'user'])
+
+
+if __name__ == '__main__':
+    unittest.main()
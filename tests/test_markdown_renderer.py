@@ -0,0 +1,37 @@
+import unittest
+
+from markdown_renderer import IncrementalMarkdownRenderer, render_markdown
+
+
+def streamed(text, chunk_size=3):
+    renderer = IncrementalMarkdownRenderer()
+    for start in range(0, len(text), chunk_size):
+        renderer.append(text[start:start + chunk_size])
+        renderer.html()
+    return renderer.html()
+
+
+class ReferenceLinksTest(unittest.TestCase):
+    """A definition that arrives after its reference still makes it a link"""
+
+    def assertRendersLikeFullText(self, text):
+        # Blocks are converted separately, so only the whitespace between them differs
+        self.assertEqual(streamed(text).split(), render_markdown(text).split())
+
+    def test_definition_after_the_reference(self):
+        self.assertRendersLikeFullText("Use [link][1].\n\n[1]: http://x.org")
+        self.assertRendersLikeFullText("Use [link][1].\n\n[1]: http://x.org\n")
+
+    def test_definition_between_blocks(self):
+        self.assertRendersLikeFullText(
+            "See [the docs][docs].\n\n[docs]: https://example.org/docs\n\n- one\n- [two][docs]\n")
+
+    def test_definition_inside_fenced_code_is_code(self):
+        self.assertRendersLikeFullText("Use [link][1].\n\n```\n[1]: http://x.org\n```\n")
+
+    def test_definition_only_block_renders_nothing(self):
+        self.assertEqual(streamed("Text.\n\n[1]: http://x.org\n"), "<p>Text.</p>\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import importlib.util
+import tempfile
+import unittest
+
+import retrieval
+from chat_engine import ContextBudget, Conversation
+
+MAN_PAGE = """.TH LS 1
+.SH NAME
+ls \\- list directory contents
+.SH DESCRIPTION
+List information about the FILEs, including hidden files with -a.
+.SH OPTIONS
+.TP
+-a
+do not ignore entries starting with .
+.SH AUTHORS / CONTRIBUTORS
+Written by many people; thanks to all of them.
+"""
+
+
+class SkippedSectionsTest(unittest.TestCase):
+    def test_compound_headings_are_skipped(self):
+        title, sections = retrieval.parse_man_page(MAN_PAGE, 'ls(1)')
+        self.assertEqual(title, 'ls(1)')
+        self.assertEqual([heading for heading, _text in sections], ['NAME', 'DESCRIPTION', 'OPTIONS'])
+
+    def test_changelogs_are_not_indexed(self):
+        for name in ('CHANGELOG_V20.md', 'NEWS.md', '1.7.10.txt', 'THANKS'):
+            self.assertTrue(retrieval.SKIPPED_DOC_RE.search(name), name)
+        self.assertIsNone(retrieval.SKIPPED_DOC_RE.search('README.md'))
+
+
+class PassageRoomTest(unittest.TestCase):
+    """Passages take what the budget leaves; history isn't dropped for them"""
+
+    def setUp(self):
+        self.budget = ContextBudget(2048)
+        self.conversation = Conversation("system")
+        first = self.conversation.add_turn("how do I list files?")
+        # 1600 characters: with room kept for three full passages this turn was dropped
+        self.conversation.complete_turn(first, "Use ls. " * 200)
+        self.turn = self.conversation.add_turn("and hidden ones?")
+        self.passages = [retrieval.Passage(f"ls(1) PART{n}", ("x" * 70 + "\n") * 17, 1.0)
+                         for n in range(3)]
+
+    def test_history_is_kept(self):
+        messages, dropped = self.conversation.messages_for(self.turn, self.budget)
+        self.assertEqual(dropped, [])
+        self.assertEqual(len(messages), 4)
+
+    def test_passages_fit_under_the_limit(self):
+        messages, _ = self.conversation.messages_for(self.turn, self.budget)
+        passages = retrieval.fit_passages(self.passages, retrieval.passage_room(self.budget, messages))
+        self.assertTrue(passages)
+        messages[-1] = {'role': 'user', 'content': retrieval.ground_prompt(self.turn.prompt, passages)}
+        self.assertLessEqual(self.budget.estimate_messages(messages), self.budget.limit)
+
+    def test_no_room_sends_no_passages(self):
+        self.assertEqual(retrieval.fit_passages(self.passages, 100), [])
+
+    def test_last_passage_is_cut_at_a_line(self):
+        passages = retrieval.fit_passages(self.passages, 1600)
+        self.assertEqual(len(passages), 2)
+        self.assertTrue(passages[1].text.endswith('x …'))
+        self.assertLess(len(passages[1].text), len(self.passages[1].text))
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), "numpy is not installed")
+class RelevanceCutoffTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = retrieval.DocumentIndex(self.directory.name)
+        self.index.replace_file('/man/man1/ls.1', 0, [
+            ('ls(1) DESCRIPTION', "ls - list directory contents\n\nShow hidden files with -a."),
+            ('ls(1) OPTIONS', "ls - list directory contents\n\n-l  use a long listing format")])
+        self.index.replace_file('/man/man1/curl.1', 0, [
+            ('curl(1) EXAMPLES', "curl - transfer a URL\n\nThanks to this it worked for me.")])
+        self.index.build()
+        self.index.load()
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def test_question_finds_its_page(self):
+        passages = self.index.search("how do I list hidden files", 3)
+        self.assertEqual(passages[0].title, 'ls(1) DESCRIPTION')
+
+    def test_small_talk_finds_nothing(self):
+        self.assertEqual(self.index.search("thanks!", 3), [])
+        self.assertEqual(self.index.search("thanks, that worked great", 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,621 @@
+"""Virtualized chat transcript: a list model, a delegate that paints messages and a view.
+
+No widgets are created per message and only the rows inside the viewport are
+painted. Each message caches its rendered height per width, and the
+QTextDocuments used for layout and painting are kept in a small LRU, so memory
+and relayout cost stay flat as the transcript grows.
+"""
+from collections import OrderedDict
+from html import escape
+
+from PySide6.QtCore import (Qt, QAbstractListModel, QModelIndex, QPersistentModelIndex, QEvent,
+                            QPoint, QRect, QSize, QTimer, Signal)
+from PySide6.QtGui import QColor, QFont, QPainter, QPainterPath, QTextDocument
+from PySide6.QtWidgets import (QAbstractScrollArea, QStyledItemDelegate, QStyleOptionViewItem,
+                               QToolTip)
+
+from markdown_renderer import render_markdown
+from styles import (USER_MESSAGE_COLOR, AI_MESSAGE_COLOR, SYSTEM_MESSAGE_COLOR,
+                    STOP_BUTTON_COLORS, RELOAD_BUTTON_COLORS, MESSAGE_DOCUMENT_CSS)
+
+MessageRole = Qt.UserRole + 1
+
+
+class MessageItem:
+    """One entry in the transcript"""
+
+    def __init__(self, role, text='', html=None, turn=None, markdown=False):
+        self.role = role  # 'user', 'ai' or 'system'
+        self.text = text  # Source text, used for copying
+        # Markdown is converted on first paint, so restored history costs nothing until seen
+        self.markdown = markdown and html is None
+        self._html = html if html is not None or markdown else escape(text).replace('\n', '<br>')
+        self.turn = turn
+        self.generating = False
+        self.stats_text = ''
+        self.tooltip = ''
+        self.version = 0  # Bumped on every change; invalidates cached layout
+        self.heights = {}  # Content width -> (version, body height, exact)
+
+    @property
+    def html(self):
+        if self._html is None:
+            self._html = render_markdown(self.text)
+        return self._html
+
+    @property
+    def rendered(self):
+        return self._html is not None
+
+    def set_html(self, html, text=None):
+        self._html = html
+        if text is not None:
+            self.text = text
+        self.version += 1
+
+
+class TranscriptModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.items[index.row()]
+        if role == MessageRole:
+            return item
+        if role == Qt.DisplayRole:
+            return item.text
+        if role == Qt.ToolTipRole:
+            return item.tooltip or None
+        return None
+
+    def append(self, item):
+        row = len(self.items)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.items.append(item)
+        self.endInsertRows()
+        return item
+
+    def prepend(self, items):
+        if not items:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(items) - 1)
+        self.items[:0] = items
+        self.endInsertRows()
+
+    def row_of(self, item):
+        for row in range(len(self.items) - 1, -1, -1):
+            if self.items[row] is item:
+                return row
+        return -1
+
+    def clear(self):
+        self.beginResetModel()
+        self.items = []
+        self.endResetModel()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """Paints a message bubble with its header, buttons, body and stats line"""
+    stop_requested = Signal(object)
+    reload_requested = Signal(object)
+
+    MARGIN = 10
+    SPACING = 5
+    HEADER_HEIGHT = 25
+    STOP_SIZE = QSize(60, 25)
+    RELOAD_SIZE = QSize(25, 25)
+    DOCUMENT_CACHE_SIZE = 64
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.documents = OrderedDict()  # item -> (version, width, QTextDocument)
+        self.hovered = None  # (item, 'stop' | 'reload') under the mouse
+        self.stats_font = QFont(view.font())
+        self.stats_font.setPointSizeF(9)
+
+    # Layout
+
+    def content_width(self):
+        return max(50, self.view.viewport().width() - 2 * self.view.spacing() - 2 * self.MARGIN)
+
+    def document(self, item, width):
+        entry = self.documents.get(item)
+        if entry and entry[0] == item.version and entry[1] == width:
+            self.documents.move_to_end(item)
+            return entry[2]
+        document = QTextDocument()
+        document.setDefaultFont(self.view.font())
+        document.setDefaultStyleSheet(MESSAGE_DOCUMENT_CSS)
+        document.setDocumentMargin(0)
+        highlighter = self.view.highlighter
+        document.setHtml(highlighter.apply(item.html) if highlighter else item.html)
+        document.setTextWidth(width)
+        self.documents[item] = (item.version, width, document)
+        self.documents.move_to_end(item)
+        while len(self.documents) > self.DOCUMENT_CACHE_SIZE:
+            self.documents.popitem(last=False)
+        return document
+
+    def body_height(self, item, width, exact):
+        """Height of the message body at width
+
+        Rows that are only being laid out may get an estimate scaled from a
+        height measured at another width, so a resize doesn't lay out every
+        document; paint() replaces the estimate once the row is visible.
+        """
+        cached = item.heights.get(width)
+        if cached and cached[0] == item.version and (cached[2] or not exact):
+            return cached[1]
+        if not exact:
+            for other_width, (version, height, was_exact) in item.heights.items():
+                if version == item.version and was_exact:
+                    estimate = max(1, int(height * other_width / width))
+                    item.heights[width] = (item.version, estimate, False)
+                    return estimate
+            if not item.rendered:
+                estimate = self.estimate_text_height(item.text, width)
+                item.heights[width] = (item.version, estimate, False)
+                return estimate
+        height = int(self.document(item, width).size().height())
+        # Keep exact heights for a few widths so toggling the window size stays cheap
+        for stale in [w for w, h in item.heights.items() if h[0] != item.version or not h[2]]:
+            del item.heights[stale]
+        if len(item.heights) >= 3:
+            item.heights.pop(next(iter(item.heights)))
+        item.heights[width] = (item.version, height, True)
+        return height
+
+    def estimate_text_height(self, text, width):
+        """Height of plain wrapped text, for rows whose Markdown hasn't been converted yet"""
+        metrics = self.view.fontMetrics()
+        chars_per_line = max(1, width // max(1, metrics.averageCharWidth()))
+        lines = sum(len(line) // chars_per_line + 1 for line in text.split('\n'))
+        return lines * metrics.lineSpacing()
+
+    def header_height(self, item):
+        return 0 if item.role == 'system' else self.HEADER_HEIGHT + self.SPACING
+
+    def stats_height(self, item):
+        if not item.stats_text:
+            return 0
+        return self.SPACING + self.view.fontMetrics().height()
+
+    def sizeHint(self, option, index):
+        item = index.data(MessageRole)
+        width = self.content_width()
+        height = (2 * self.MARGIN + self.header_height(item)
+                  + self.body_height(item, width, exact=False) + self.stats_height(item))
+        return QSize(width + 2 * self.MARGIN, height)
+
+    def button_rects(self, item, rect):
+        """Stop and reload button rectangles for an AI message at rect"""
+        top = rect.top() + self.MARGIN
+        left = rect.left() + self.MARGIN + self.view.fontMetrics().horizontalAdvance("AI:") + 12
+        stop = QRect(left, top, self.STOP_SIZE.width(), self.STOP_SIZE.height())
+        reload = QRect(stop.right() + 1 + self.SPACING, top,
+                       self.RELOAD_SIZE.width(), self.RELOAD_SIZE.height())
+        return stop, reload
+
+    # Painting
+
+    def paint(self, painter, option, index):
+        item = index.data(MessageRole)
+        rect = option.rect
+        width = self.content_width()
+
+        cached = item.heights.get(width)
+        if cached and not cached[2]:
+            estimate = cached[1]
+            if self.body_height(item, width, exact=True) != estimate:
+                # Relayout outside of paint so the row gets its real height
+                persistent = QPersistentModelIndex(index)
+                QTimer.singleShot(0, lambda: self.relayout(persistent))
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        background = {'user': USER_MESSAGE_COLOR, 'ai': AI_MESSAGE_COLOR}.get(
+            item.role, SYSTEM_MESSAGE_COLOR)
+        path = QPainterPath()
+        path.addRoundedRect(rect, 8, 8)
+        painter.fillPath(path, QColor(background))
+
+        top = rect.top() + self.MARGIN
+        left = rect.left() + self.MARGIN
+        if item.role != 'system':
+            header_font = QFont(option.font)
+            header_font.setBold(True)
+            painter.setFont(header_font)
+            painter.setPen(QColor('#000000'))
+            painter.drawText(QRect(left, top, width, self.HEADER_HEIGHT),
+                             Qt.AlignLeft | Qt.AlignVCenter, "You" if item.role == 'user' else "AI:")
+            if item.role == 'ai':
+                self.paint_buttons(painter, option, item)
+            top += self.HEADER_HEIGHT + self.SPACING
+
+        document = self.document(item, width)
+        painter.translate(left, top)
+        document.drawContents(painter)
+        painter.translate(-left, -top)
+
+        if item.stats_text:
+            painter.setFont(self.stats_font)
+            painter.setPen(QColor('#666666'))
+            stats_top = top + int(document.size().height()) + self.SPACING
+            painter.drawText(QRect(left, stats_top, width, self.view.fontMetrics().height()),
+                             Qt.AlignLeft | Qt.AlignVCenter, item.stats_text)
+        painter.restore()
+
+    def paint_buttons(self, painter, option, item):
+        stop_rect, reload_rect = self.button_rects(item, option.rect)
+        button_font = QFont(option.font)
+        for name, rect, colors, label, enabled in (
+                ('stop', stop_rect, STOP_BUTTON_COLORS, "Stop", item.generating),
+                ('reload', reload_rect, RELOAD_BUTTON_COLORS, "↻", not item.generating)):
+            if not enabled:
+                color = colors['disabled']
+            elif self.hovered == (item, name):
+                color = colors['hover']
+            else:
+                color = colors['normal']
+            path = QPainterPath()
+            path.addRoundedRect(rect, 4, 4)
+            painter.fillPath(path, QColor(color))
+            button_font.setBold(name == 'reload')
+            painter.setFont(button_font)
+            painter.setPen(QColor('#ffffff'))
+            painter.drawText(rect, Qt.AlignCenter, label)
+
+    def relayout(self, persistent):
+        if persistent.isValid():
+            self.sizeHintChanged.emit(QModelIndex(persistent))
+
+    # Interaction
+
+    def button_at(self, item, rect, pos):
+        if item.role != 'ai':
+            return None
+        stop_rect, reload_rect = self.button_rects(item, rect)
+        if stop_rect.contains(pos) and item.generating:
+            return 'stop'
+        if reload_rect.contains(pos) and not item.generating:
+            return 'reload'
+        return None
+
+    def editorEvent(self, event, model, option, index):
+        item = index.data(MessageRole)
+        if event.type() == QEvent.MouseMove:
+            button = self.button_at(item, option.rect, event.position().toPoint())
+            hovered = (item, button) if button else None
+            if hovered != self.hovered:
+                self.hovered = hovered
+                self.view.viewport().update()
+            return False
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            button = self.button_at(item, option.rect, event.position().toPoint())
+            if button == 'stop':
+                self.stop_requested.emit(item)
+                return True
+            if button == 'reload':
+                self.reload_requested.emit(item)
+                return True
+        return False
+
+    def forget(self):
+        self.documents.clear()
+        self.hovered = None
+
+
+class HeightIndex:
+    """Row heights in a Fenwick tree: O(log n) updates, offsets and row lookup by y"""
+
+    def __init__(self, heights=()):
+        self.rebuild(heights)
+
+    def rebuild(self, heights):
+        self.heights = list(heights)
+        self.tree = [0] * (len(self.heights) + 1)
+        for i, height in enumerate(self.heights, 1):
+            self.tree[i] += height
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def __len__(self):
+        return len(self.heights)
+
+    def append(self, height):
+        self.heights.append(height)
+        i = len(self.heights)
+        # A new node covers (i - lowbit(i), i]; everything before i is already in the tree
+        self.tree.append(height + self.offset(i - 1) - self.offset(i - (i & -i)))
+
+    def set(self, row, height):
+        delta = height - self.heights[row]
+        self.heights[row] = height
+        i = row + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def offset(self, row):
+        """Sum of the heights of the rows before row"""
+        total = 0
+        i = row
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self.offset(len(self.heights))
+
+    def row_at(self, y):
+        """Row whose vertical span contains y (clamped to the last row)"""
+        row = 0
+        remaining = y
+        step = 1 << len(self.heights).bit_length()
+        while step:
+            nxt = row + step
+            if nxt < len(self.tree) and self.tree[nxt] <= remaining:
+                row = nxt
+                remaining -= self.tree[nxt]
+            step >>= 1
+        return min(row, len(self.heights) - 1)
+
+
+class TranscriptView(QAbstractScrollArea):
+    """Scrolling transcript that only measures changed rows and paints visible ones
+
+    QListView lays out every row whenever one row's size changes, which makes
+    each streamed frame O(n) in the transcript length. Here row heights live
+    in a HeightIndex, so a streaming update, an append or a scroll costs
+    O(log n) plus the rows on screen.
+    """
+    context_menu_requested = Signal(object, QPoint)  # Item, global position
+    top_reached = Signal()  # Scrolled to the first row; a chance to load older messages
+
+    SPACING = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.transcript = TranscriptModel(self)
+        self.message_delegate = MessageDelegate(self)
+        self.heights = HeightIndex()
+        self.layout_width = None
+        self.highlighter = None  # Optional highlight.CodeHighlighter for code blocks
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)  # Hide vertical scrollbar
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.viewport().setMouseTracking(True)
+        self.verticalScrollBar().setSingleStep(20)
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+
+        self.transcript.rowsInserted.connect(self.on_rows_inserted)
+        self.transcript.rowsRemoved.connect(self.relayout)
+        self.transcript.modelReset.connect(self.relayout)
+        self.transcript.dataChanged.connect(self.on_data_changed)
+        self.message_delegate.sizeHintChanged.connect(lambda index: self.update_row(index.row()))
+
+    def set_highlighter(self, highlighter):
+        self.highlighter = highlighter
+        highlighter.highlighted.connect(self.on_highlighted)
+        self.on_highlighted()
+
+    def on_highlighted(self):
+        # Row heights don't change, only colors, so repainting the cached documents is enough
+        self.message_delegate.forget()
+        self.viewport().update()
+
+    def spacing(self):
+        return self.SPACING
+
+    # Layout
+
+    def row_height(self, row):
+        option = self.view_option(QRect())
+        hint = self.message_delegate.sizeHint(option, self.transcript.index(row))
+        return hint.height() + self.SPACING
+
+    def relayout(self):
+        """Measure every row again; only needed when the width or many rows change"""
+        self.layout_width = self.viewport().width()
+        self.heights.rebuild(self.row_height(row) for row in range(self.transcript.rowCount()))
+        self.update_scroll_range()
+        self.viewport().update()
+
+    def on_rows_inserted(self, parent, first, last):
+        follow = self.at_bottom()
+        if first == len(self.heights):
+            for row in range(first, last + 1):
+                self.heights.append(self.row_height(row))
+            self.update_scroll_range()
+        else:
+            # Rows inserted above keep the rows on screen where they were
+            before = self.heights.total()
+            self.relayout()
+            if not follow:
+                bar = self.verticalScrollBar()
+                bar.setValue(bar.value() + self.heights.total() - before)
+        if follow:
+            self.scrollToBottom()
+        self.viewport().update()
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self.update_row(row)
+
+    def update_row(self, row):
+        if not 0 <= row < len(self.heights):
+            return
+        old = self.heights.heights[row]
+        new = self.row_height(row)
+        if new != old:
+            bar = self.verticalScrollBar()
+            value = bar.value()
+            above_view = self.heights.offset(row + 1) <= value
+            self.heights.set(row, new)
+            self.update_scroll_range()
+            if above_view:
+                # Keep the visible rows still when something above them grows
+                bar.setValue(value + new - old)
+        self.viewport().update()
+
+    def update_scroll_range(self):
+        bar = self.verticalScrollBar()
+        page = self.viewport().height()
+        bar.setPageStep(page)
+        bar.setRange(0, max(0, self.heights.total() + self.SPACING - page))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        follow = self.at_bottom()
+        if self.viewport().width() != self.layout_width:
+            self.relayout()
+        else:
+            self.update_scroll_range()
+        if follow:
+            self.scrollToBottom()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    # Geometry
+
+    def view_option(self, rect):
+        option = QStyleOptionViewItem()
+        option.initFrom(self)
+        option.rect = rect
+        option.font = self.font()
+        return option
+
+    def row_rect(self, row):
+        top = self.heights.offset(row) + self.SPACING - self.verticalScrollBar().value()
+        return QRect(self.SPACING, top, self.viewport().width() - 2 * self.SPACING,
+                     self.heights.heights[row] - self.SPACING)
+
+    def row_at(self, pos):
+        if not len(self.heights):
+            return -1
+        row = self.heights.row_at(pos.y() + self.verticalScrollBar().value())
+        return row if self.row_rect(row).contains(pos) else -1
+
+    def item_at(self, pos):
+        row = self.row_at(pos)
+        return self.transcript.items[row] if row >= 0 else None
+
+    # Painting
+
+    def paintEvent(self, event):
+        if not len(self.heights):
+            return
+        painter = QPainter(self.viewport())
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        row = self.heights.row_at(top)
+        while row < len(self.heights) and self.heights.offset(row) < bottom:
+            rect = self.row_rect(row)
+            if rect.intersects(event.rect()):
+                self.message_delegate.paint(painter, self.view_option(rect),
+                                            self.transcript.index(row))
+            row += 1
+        painter.end()
+
+    # Interaction
+
+    def forward_mouse_event(self, event):
+        row = self.row_at(event.position().toPoint())
+        if row < 0:
+            if self.message_delegate.hovered:
+                self.message_delegate.hovered = None
+                self.viewport().update()
+            return False
+        return self.message_delegate.editorEvent(event, self.transcript,
+                                                 self.view_option(self.row_rect(row)),
+                                                 self.transcript.index(row))
+
+    def mouseMoveEvent(self, event):
+        self.forward_mouse_event(event)
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if not self.forward_mouse_event(event):
+            super().mouseReleaseEvent(event)
+
+    def leaveEvent(self, event):
+        if self.message_delegate.hovered:
+            self.message_delegate.hovered = None
+            self.viewport().update()
+        super().leaveEvent(event)
+
+    def viewportEvent(self, event):
+        if event.type() == QEvent.ToolTip:
+            row = self.row_at(event.pos())
+            text = self.transcript.data(self.transcript.index(row), Qt.ToolTipRole) if row >= 0 else None
+            if text:
+                QToolTip.showText(event.globalPos(), text, self.viewport())
+            else:
+                QToolTip.hideText()
+            return True
+        return super().viewportEvent(event)
+
+    def contextMenuEvent(self, event):
+        item = self.item_at(event.pos())
+        if item is not None:
+            self.context_menu_requested.emit(item, event.globalPos())
+
+    # Scrolling
+
+    def on_scrolled(self, value):
+        if value == 0 and len(self.heights):
+            self.top_reached.emit()
+
+    def wheelEvent(self, event):
+        # With nothing to scroll the bar never moves, so ask for older rows directly
+        if self.verticalScrollBar().value() == 0 and event.angleDelta().y() > 0:
+            self.top_reached.emit()
+        super().wheelEvent(event)
+
+    def at_bottom(self):
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum() - 4
+
+    def scrollToBottom(self):
+        bar = self.verticalScrollBar()
+        bar.setValue(bar.maximum())
+
+    def scroll_to_item(self, item):
+        row = self.transcript.row_of(item)
+        if row >= 0:
+            self.verticalScrollBar().setValue(self.heights.offset(row))
+
+    # Items
+
+    def update_item(self, item):
+        """Re-measure and repaint a changed message, following the stream at the bottom"""
+        follow = self.at_bottom()
+        row = self.transcript.row_of(item)
+        if row < 0:
+            return
+        index = self.transcript.index(row)
+        self.transcript.dataChanged.emit(index, index)
+        if follow:
+            self.scrollToBottom()
+
+    def append(self, item):
+        self.transcript.append(item)
+        self.scrollToBottom()
+        return item
+
+    def prepend(self, items):
+        """Insert older messages above the current ones without moving the view"""
+        self.transcript.prepend(items)
+
+    def clear(self):
+        self.message_delegate.forget()
+        self.transcript.clear()